@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+AI Flavor Lexicon
+The phrase lists of SKILL.md, references/zhuque-detection.md and
+references/wikipedia-ai-features.md as data, compiled once at import into a
+single PhraseMatcher and one regex for patterns with a gap (不仅...而且).
+
+A positive weight is an AI signal, a negative weight a human one (人味信号).
+"""
+
+import re
+from typing import Dict, NamedTuple, Tuple
+
+from matcher import PhraseMatcher
+
+# The six detection dimensions of SKILL.md
+DIMENSIONS = {
+    'structure': '句式结构',
+    'vocabulary': '词汇特征',
+    'voice': '主语和语气',
+    'specificity': '具体性和真实性',
+    'colloquial': '网络用语和口语',
+    'openings': '句子开头模式',
+}
+
+PRIORITY_LABELS = {'high': '高优先级', 'medium': '中优先级', 'low': '低优先级'}
+
+
+class Category(NamedTuple):
+    """A group of phrases that are scored and reported the same way."""
+    dimension: str
+    weight: float
+    priority: str
+    message: str
+    zhuque: bool = False  # one of the 朱雀 high-priority connectors or banned features
+
+
+# Earlier categories win when a phrase is listed twice
+CATEGORIES: Dict[str, Tuple[Category, Tuple[str, ...]]] = {
+    # 朱雀重点检测的连接词
+    'zhuque-structure': (
+        Category('structure', 1.0, 'high', '结构连接词', True),
+        ('首先', '其次', '再次', '此外', '总之', '总而言之'),
+    ),
+    'zhuque-sequence': (
+        Category('structure', 0.4, 'medium', '结构连接词，口语中也常用', True),
+        ('然后', '最后'),
+    ),
+    'zhuque-turning': (
+        Category('vocabulary', 1.0, 'high', '转折连接词', True),
+        ('然而',),
+    ),
+    'zhuque-turning-common': (
+        Category('vocabulary', 0.3, 'low', '转折连接词，频率过高时像 AI', True),
+        ('但是', '其实', '实际上'),
+    ),
+    'zhuque-supplement': (
+        Category('vocabulary', 1.0, 'high', '补充连接词', True),
+        ('值得注意的是', '还有啊', '其实啊', '需要注意的是', '值得一提的是'),
+    ),
+    'zhuque-tense': (
+        Category('structure', 1.0, 'high', '时态连接词，开篇使用像 AI', True),
+        ('随着',),
+    ),
+    'zhuque-tense-common': (
+        Category('structure', 0.3, 'low', '时态连接词', True),
+        ('发展',),
+    ),
+    'zhuque-summary': (
+        Category('structure', 1.0, 'high', '总结连接词', True),
+        ('综上所述', '由此可见', '可以说', '总的来说'),
+    ),
+    # 朱雀禁用特征：括号和破折号
+    'zhuque-bracket': (
+        Category('structure', 0.8, 'high', '括号补充说明', True),
+        ('（', '(', '[', '【', '〔'),
+    ),
+    'zhuque-dash': (
+        Category('structure', 0.8, 'high', '破折号补充说明', True),
+        ('——', '—'),
+    ),
+
+    # 词汇特征
+    'connector': (
+        Category('vocabulary', 0.8, 'medium', '高频连接词'),
+        ('与此同时', '另外', '因此'),
+    ),
+    'explanatory': (
+        Category('vocabulary', 0.8, 'medium', '过多的连接性短语'),
+        ('换句话说', '也就是说', '具体来说', '简而言之', '归根结底', '换言之'),
+    ),
+    'quantifier': (
+        Category('vocabulary', 0.6, 'medium', '量化词汇'),
+        ('大大', '显著', '广泛', '全面', '深入', '切实', '极大地', '有效地'),
+    ),
+    'buzzword': (
+        Category('vocabulary', 1.0, 'high', 'AI 特有词汇（商业黑话）'),
+        ('赋能', '抓手', '闭环', '赛道', '矩阵', '底层逻辑', '对齐', '复盘', '颗粒度', '生态'),
+    ),
+    'abstract': (
+        Category('vocabulary', 0.4, 'low', '抽象名词'),
+        ('层面', '维度', '视角', '格局', '趋势', '范式'),
+    ),
+    'grandiose': (
+        Category('vocabulary', 1.0, 'medium', '夸大的象征意义'),
+        ('代表了', '标志着', '里程碑', '开创了', '先河', '新纪元', '新篇章', '新时代'),
+    ),
+    'promotional': (
+        Category('vocabulary', 1.0, 'medium', '宣传性语言'),
+        ('无疑是', '绝对值得', '完美解决方案', '无与伦比', '最佳选择', '不可或缺', '至关重要'),
+    ),
+    'attribution': (
+        Category('vocabulary', 1.0, 'medium', '模糊的归因'),
+        ('专家表示', '研究表明', '众所周知', '一般认为', '有研究指出', '业内人士认为'),
+    ),
+    'filler-adverb': (
+        Category('vocabulary', 0.5, 'low', '填充式副词'),
+        ('日益', '令人惊讶地', '显著地', '不断地', '逐渐'),
+    ),
+    'banned': (
+        Category('vocabulary', 0.0, 'high', '小红书禁用词'),
+        ('绝绝子', 'yyds', '无敌', '巨好用'),
+    ),
+
+    # 主语和语气
+    'collective': (
+        Category('voice', 1.0, 'medium', '"让我们"式号召'),
+        ('让我们', '我们应该', '我们需要'),
+    ),
+    'we': (
+        Category('voice', 0.3, 'low', '主语用"我们"而非"我"'),
+        ('我们',),
+    ),
+    'imperative': (
+        Category('voice', 0.4, 'low', '祈使语气'),
+        ('建议', '应该', '必须', '务必'),
+    ),
+    'first-person': (
+        Category('voice', -0.5, 'low', '第一人称'),
+        ('我', '俺'),
+    ),
+    'question': (
+        Category('voice', -0.6, 'low', '疑问/反问'),
+        ('？', '?', '难道', '咋'),
+    ),
+    'exclamation': (
+        Category('voice', -0.4, 'low', '情绪表达'),
+        ('！', '!', '哈哈', '唉', '卧槽', '天哪'),
+    ),
+
+    # 具体性和真实性
+    'vague': (
+        Category('specificity', 0.3, 'low', '模糊量词'),
+        ('大约', '大概', '左右', '诸多', '各种各样', '一系列'),
+    ),
+    'experience': (
+        Category('specificity', -1.0, 'low', '个人经历'),
+        ('我记得', '我遇到过', '那天', '那次', '当时', '我之前', '上周', '昨天', '前几天', '去年'),
+    ),
+
+    # 网络用语和口语
+    'colloquial': (
+        Category('colloquial', -0.6, 'low', '口语化表达'),
+        (
+            '好家伙', '绝了', '新坑', '这玩意儿', '说真的', '真是', '对了', '突然想起',
+            '说实话', '讲真', '瞅', '咱', '啥', '嘛', '呗', '啦', '吧', '呀', '这事儿',
+        ),
+    ),
+
+    # 句子开头模式
+    'passive': (
+        Category('openings', 0.3, 'low', '被动语态'),
+        ('被', '受到', '得到了'),
+    ),
+    'nominalization': (
+        Category('openings', 0.5, 'low', '名词化（进行/加以/予以）'),
+        ('进行', '加以', '予以', '作出'),
+    ),
+}
+
+# Patterns with a gap, which a phrase matcher can't express
+GAP_CATEGORIES: Dict[str, Tuple[Category, str]] = {
+    'zhuque-era': (
+        Category('structure', 1.0, 'high', '时态连接词"在...时代/今天"', True),
+        r'在[^，。！？,!?\n]{1,12}?(?:时代|今天)',
+    ),
+    'negative-parallel': (
+        Category('vocabulary', 1.0, 'medium', '否定式排比'),
+        r'(?:不是|并非|不仅|不只是|不仅仅是)[^。！？!?\n]{1,40}?(?:而是|而且|更是|也是)',
+    ),
+    'concrete': (
+        Category('specificity', -0.6, 'low', '具体时间/数字'),
+        r'\d+(?:[.:：]\d+)?\s*(?:年|月|日|号|点|分|秒|岁|块|元|公里|斤|次|天|小时|个月|%)',
+    ),
+}
+
+# 朱雀禁用特征：序号和列表, checked at the start of each line
+NUMBERING_RE = re.compile(
+    r'^\s*(?:#+\s*)?(?:[一二三四五六七八九十]+[、.．]|[（(][一二三四五六七八九十\d]+[)）]|'
+    r'\d+[.、．)）]\s*|[A-Da-d][.、．]\s|[-*•+]\s)'
+)
+NUMBERING = 'zhuque-numbering'
+NUMBERING_CATEGORY = Category('structure', 1.0, 'high', '序号/列表', True)
+
+SENTENCE_END = frozenset('。！？!?；;…\n')
+PARAGRAPH_END = frozenset('。！？!?.…；;')
+
+
+def _compile():
+    phrases = {}
+    for name, (_, words) in CATEGORIES.items():
+        for word in words:
+            phrases.setdefault(word.lower(), name)
+    gap_re = re.compile('|'.join(
+        f'(?P<g{i}>{pattern})' for i, (_, pattern) in enumerate(GAP_CATEGORIES.values())
+    ))
+    return PhraseMatcher(phrases), list(phrases.values()), gap_re, list(GAP_CATEGORIES)
+
+
+# Compiled once per process
+MATCHER, PHRASE_CATEGORIES, GAP_RE, GAP_NAMES = _compile()
+
+
+def category(name: str) -> Category:
+    """Scoring info of a phrase or gap category name."""
+    if name in CATEGORIES:
+        return CATEGORIES[name][0]
+    if name in GAP_CATEGORIES:
+        return GAP_CATEGORIES[name][0]
+    if name == NUMBERING:
+        return NUMBERING_CATEGORY
+    raise KeyError(name)
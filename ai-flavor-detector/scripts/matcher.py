@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Aho-Corasick Phrase Matcher
+Finds every occurrence of a fixed set of phrases in one pass over the text,
+however many phrases there are. Pure Python, no dependencies.
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+
+class PhraseMatcher:
+    """
+    Automaton over `phrases`, built once. `find(text)` returns
+    (start, phrase index) pairs; `find_longest(text)` drops matches that
+    overlap a longer (or earlier) one, so 让我们 doesn't also count as 我们 and 我.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases: List[str] = list(phrases)
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+
+        # Trie of all phrases
+        for index, phrase in enumerate(self.phrases):
+            if not phrase:
+                raise ValueError('empty phrase')
+            state = 0
+            for ch in phrase:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(index)
+
+        # Failure links, breadth first; each state also reports its suffixes' phrases
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                outputs[nxt].extend(outputs[fail[nxt]])
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [tuple(out) for out in outputs]
+        self._lengths = [len(phrase) for phrase in self.phrases]
+
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        """All (start offset, phrase index) matches, overlapping ones included."""
+        goto, fail, outputs, lengths = self._goto, self._fail, self._outputs, self._lengths
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if outputs[state]:
+                for index in outputs[state]:
+                    matches.append((i - lengths[index] + 1, index))
+        return matches
+
+    def find_longest(self, text: str) -> List[Tuple[int, int]]:
+        """Non-overlapping matches, preferring the leftmost, then the longest."""
+        lengths = self._lengths
+        matches = sorted(self.find(text), key=lambda m: (m[0], -lengths[m[1]]))
+        kept = []
+        end = 0
+        for start, index in matches:
+            if start >= end:
+                kept.append((start, index))
+                end = start + lengths[index]
+        return kept
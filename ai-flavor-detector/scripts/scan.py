@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+AI Flavor Corpus Scanner
+Score whole content archives before publishing: files are streamed
+paragraph by paragraph and scored in a process pool, paragraph scores are
+cached by content hash so unchanged paragraphs are never scored twice, and
+results are written as JSONL with a score histogram at the end.
+
+Usage:
+    python3 scan.py posts/ --output report.jsonl
+    python3 scan.py "archive/**/*.md" --jobs 8 --flag 6 > report.jsonl
+    python3 scan.py posts/ --full --no-cache --output report.jsonl
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from score import (
+    VERDICTS, Annotation, Paragraph, ParagraphScore, iter_paragraphs, score_paragraph,
+    summarize, to_dict
+)
+
+EXTENSIONS = ('.md', '.markdown', '.txt')
+DEFAULT_FLAG = 7.0
+HISTOGRAM_WIDTH = 40
+
+
+def scorer_version() -> str:
+    """Hash of the scoring code and lexicon; cached scores from other versions are dropped."""
+    digest = hashlib.sha256()
+    here = Path(__file__).resolve().parent
+    for name in ('lexicon.py', 'matcher.py', 'score.py'):
+        digest.update((here / name).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def get_default_cache_path() -> Path:
+    """Get the paragraph cache (~/.cache/ai-flavor-detector/paragraphs.sqlite)"""
+    # Use XDG cache directory if set, otherwise ~/.cache/ai-flavor-detector/
+    xdg_cache = os.environ.get('XDG_CACHE_HOME')
+    base = Path(xdg_cache) if xdg_cache else Path.home() / '.cache'
+    return base / 'ai-flavor-detector' / 'paragraphs.sqlite'
+
+
+class ParagraphCache:
+    """
+    Scores of single paragraphs in SQLite, keyed on a hash of the scorer
+    version and the paragraph text. Scores are stored as if the paragraph
+    started on line 1, so a paragraph that moved within a file still hits.
+    Worker processes only read; the parent process writes.
+    """
+
+    def __init__(self, path: Path, version: str):
+        self.path = Path(path)
+        self.version = version
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS paragraphs ('
+            'key TEXT PRIMARY KEY, version TEXT NOT NULL, score TEXT NOT NULL)'
+        )
+        self._conn.commit()
+
+    def key(self, paragraph: Paragraph) -> str:
+        text = ('#' if paragraph.heading else '') + paragraph.text
+        return hashlib.sha1(f'{self.version}\0{text}'.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn.execute('SELECT score FROM paragraphs WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def put_many(self, entries: Iterable[Tuple[str, str]]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO paragraphs (key, version, score) VALUES (?, ?, ?)',
+                ((key, self.version, score) for key, score in entries)
+            )
+
+    def prune(self) -> int:
+        """Drop scores computed by other scorer versions. Returns rows removed."""
+        with self._conn:
+            return self._conn.execute('DELETE FROM paragraphs WHERE version != ?', (self.version,)).rowcount
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def pack(score: ParagraphScore) -> str:
+    """Compact JSON of a paragraph scored at line 1."""
+    return json.dumps(score, ensure_ascii=False, separators=(',', ':'))
+
+
+def unpack(data: str) -> ParagraphScore:
+    fields = json.loads(data)
+    fields[8] = [tuple(o) for o in fields[8]]
+    fields[9] = [Annotation(*a) for a in fields[9]]
+    return ParagraphScore(*fields)
+
+
+def place(score: ParagraphScore, paragraph: Paragraph) -> ParagraphScore:
+    """Move a paragraph scored at line 1 to where `paragraph` really is."""
+    shift = paragraph.line - 1
+    return score._replace(
+        index=paragraph.index,
+        line=paragraph.line,
+        openings=[(text, line + shift, column) for text, line, column in score.openings],
+        annotations=[a._replace(line=a.line + shift) for a in score.annotations]
+    )
+
+
+# Set in each worker process by _init_worker
+_cache: Optional[ParagraphCache] = None
+_flag = DEFAULT_FLAG
+_full = False
+
+
+def _init_worker(cache_path: Optional[str], version: str, flag: float, full: bool) -> None:
+    global _cache, _flag, _full
+    _cache = ParagraphCache(Path(cache_path), version) if cache_path else None
+    _flag = flag
+    _full = full
+
+
+def scan_file(path: str) -> Tuple[Dict, List[Tuple[str, str]], int, int]:
+    """
+    Score one file in a worker. Returns its JSONL record (compact unless
+    --full), new cache entries for the parent to store, and the paragraph
+    and cache-hit counts.
+    """
+    start = time.perf_counter()
+    scores = []
+    new_entries = []
+    hits = 0
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for paragraph in iter_paragraphs(f):
+                key = _cache.key(paragraph) if _cache is not None else None
+                cached = _cache.get(key) if key is not None else None
+                if cached is not None:
+                    scored = unpack(cached)
+                    hits += 1
+                else:
+                    scored = score_paragraph(paragraph._replace(index=1, line=1))
+                    if key is not None:
+                        new_entries.append((key, pack(scored)))
+                scores.append(place(scored, paragraph))
+    except OSError as e:
+        return {'file': path, 'error': str(e)}, [], 0, 0
+
+    report = dict(file=path, **to_dict(summarize(scores, (time.perf_counter() - start) * 1000)))
+    return report if _full else compact_record(report, _flag), new_entries, len(scores), hits
+
+
+def collect_files(inputs: List[str]) -> List[str]:
+    """Expand input files, directories and glob patterns into text file paths."""
+    files = []
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = sorted(str(p) for p in Path(item).rglob('*') if p.suffix.lower() in EXTENSIONS and p.is_file())
+        elif os.path.isfile(item):
+            matches = [item]
+        else:
+            matches = sorted(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+
+        for path in matches:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                files.append(path)
+
+    return files
+
+
+def compact_record(report: Dict, flag: float) -> Dict:
+    """One JSONL line: file scores plus the paragraphs scoring `flag` or more."""
+    if 'error' in report:
+        return report
+    flagged = []
+    for p in report['paragraphs']:
+        if p['heading'] or p['score'] < flag:
+            continue
+        flagged.append({
+            'index': p['index'],
+            'line': p['line'],
+            'score': p['score'],
+            'issues': [
+                [a['line'], a['keyword'], a['priority'], a['message']]
+                for a in p['annotations'] if a['weight'] > 0 and a['priority'] != 'low'
+            ],
+        })
+    return {
+        'file': report['file'],
+        'score': report['score'],
+        'verdict': report['verdict'],
+        'chars': report['chars'],
+        'paragraphs': sum(1 for p in report['paragraphs'] if not p['heading']),
+        'dimensions': {key: dim['score'] for key, dim in report['dimensions'].items()},
+        'zhuque': report['zhuque']['verdict'],
+        'zhuque_features': report['zhuque']['ai_features'],
+        'flagged': flagged,
+    }
+
+
+def print_histogram(scores: List[float], stream) -> None:
+    """Files per score bucket (0-1, 1-2, ..., 9-10) and per verdict."""
+    buckets = Counter(min(int(score), 9) for score in scores)
+    peak = max(buckets.values(), default=0)
+    print('AI 味评分分布：', file=stream)
+    for bucket in range(10):
+        count = buckets.get(bucket, 0)
+        bar = '█' * (round(count / peak * HISTOGRAM_WIDTH) if peak else 0)
+        print(f'  {bucket:>2}-{bucket + 1:<2} | {bar} {count}', file=stream)
+
+    print(file=stream)
+    lower = 0.0
+    for limit, label in VERDICTS:
+        count = sum(1 for score in scores if lower <= score < limit)
+        share = count / len(scores) * 100 if scores else 0.0
+        print(f'  {label}：{count}（{share:.1f}%）', file=stream)
+        lower = limit
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan a corpus of articles for AI flavor in parallel')
+    parser.add_argument('input', nargs='+', help='Files, directories or glob patterns (.md, .markdown, .txt in directories)')
+    parser.add_argument('--output', '-o', help='Write the JSONL report here (default: stdout)')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='Worker processes (default: CPU count)')
+    parser.add_argument('--flag', type=float, default=DEFAULT_FLAG, help='List paragraphs scoring at least this (default: 7)')
+    parser.add_argument('--full', action='store_true', help='Write the complete report of each file instead of the compact record')
+    parser.add_argument('--cache', help='Paragraph cache file (default: ~/.cache/ai-flavor-detector/paragraphs.sqlite)')
+    parser.add_argument('--no-cache', action='store_true', help='Score every paragraph, without reading or writing the cache')
+
+    args = parser.parse_args()
+
+    files = collect_files(args.input)
+    if not files:
+        print('Error: No input files found', file=sys.stderr)
+        sys.exit(1)
+
+    version = scorer_version()
+    cache = None
+    if not args.no_cache:
+        cache = ParagraphCache(Path(args.cache) if args.cache else get_default_cache_path(), version)
+        cache.prune()
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    scores = []
+    errors = 0
+    paragraphs = 0
+    hits = 0
+    start = time.perf_counter()
+
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max(1, args.jobs),
+            initializer=_init_worker,
+            initargs=(str(cache.path) if cache else None, version, args.flag, args.full)
+        ) as pool:
+            # Results come back in input order; chunks keep IPC overhead low for small files
+            chunksize = max(1, min(32, len(files) // (max(1, args.jobs) * 4)))
+            for record, new_entries, count, cached in pool.map(scan_file, files, chunksize=chunksize):
+                if cache is not None and new_entries:
+                    cache.put_many(new_entries)
+                if 'error' in record:
+                    errors += 1
+                    print(f"Warning: Cannot read {record['file']}: {record['error']}", file=sys.stderr)
+                else:
+                    scores.append(record['score'])
+                paragraphs += count
+                hits += cached
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if cache is not None:
+            cache.close()
+
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    print(
+        f'Scanned {len(scores)} file(s), {paragraphs} paragraph(s) '
+        f'({hits} cached) in {elapsed:.1f}s', file=sys.stderr
+    )
+    if errors:
+        print(f'Errors: {errors} file(s) could not be read', file=sys.stderr)
+    print_histogram(scores, sys.stderr)
+    if args.output:
+        print(f'\nReport written to: {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+AI Flavor Scorer
+Deterministic scoring of the six detection dimensions and the 朱雀 checks of
+SKILL.md: overall and per-paragraph 0-10 scores with line/keyword
+annotations, in milliseconds, so the model only has to write the rewrites.
+
+Usage:
+    python3 score.py article.md
+    python3 score.py article.md --zhuque --all
+    pbpaste | python3 score.py --json
+"""
+
+import argparse
+import bisect
+import json
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from lexicon import (
+    DIMENSIONS, GAP_NAMES, GAP_RE, MATCHER, NUMBERING, NUMBERING_RE, PARAGRAPH_END,
+    PHRASE_CATEGORIES, PRIORITY_LABELS, SENTENCE_END, category
+)
+
+BASELINE = 3.0          # score of a paragraph with no signal either way
+SLOPE = 2.0             # score points per unit of net signal weight per 100 characters
+NO_HUMAN_PENALTY = 1.0  # 缺乏个人细节 × 缺乏情绪表达: a long paragraph without any human signal
+MIN_CHARS = 60          # shorter paragraphs are scored as if this long
+CAP = 3                 # hits of one category counted per paragraph, plus one per 100 characters
+
+VERDICTS = (
+    (3.5, '人味很浓，几乎看不出 AI 痕迹'),
+    (6.5, '人味为主，偶有 AI 特征'),
+    (10.1, 'AI 味明显，需要改写'),
+)
+
+# Inline code, link targets, bare URLs and HTML tags aren't prose
+MASK_RE = re.compile(r'(`[^`\n]*`)|!?\[([^\]\n]*)\]\([^)\n]*\)|(https?://\S+)|(<[^>\n]+>)')
+ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+HEADING_RE = re.compile(r'#{1,6}(?:\s|$)')
+OPENING_SKIP = ' #\t"“”\'‘’「」『』，,：:'
+
+
+class Paragraph(NamedTuple):
+    """A block of prose; `line` is the 1-based line it starts on. Headings have index 0."""
+    index: int
+    line: int
+    text: str
+    heading: bool = False
+
+
+class Annotation(NamedTuple):
+    """One matched keyword or feature. Negative `weight` is a human signal."""
+    line: int
+    column: int
+    keyword: str
+    category: str
+    dimension: str
+    priority: str
+    message: str
+    weight: float
+
+
+class ParagraphScore(NamedTuple):
+    index: int
+    line: int
+    chars: int
+    sentences: int
+    score: float
+    heading: bool
+    ends_with_punctuation: bool
+    net: Dict[str, float]                   # AI minus human weight per dimension
+    openings: List[Tuple[str, int, int]]    # first two characters, line, column of each sentence
+    annotations: List[Annotation]
+
+
+class Report(NamedTuple):
+    score: float
+    verdict: str
+    chars: int
+    paragraphs: List[ParagraphScore]
+    document: List[Annotation]              # findings across paragraphs (repeated openings, ...)
+    dimensions: Dict[str, Dict]
+    zhuque: Dict
+    elapsed_ms: float
+
+
+def clamp(score: float) -> float:
+    return round(min(10.0, max(0.0, score)), 1)
+
+
+def verdict(score: float) -> str:
+    for limit, label in VERDICTS:
+        if score < limit:
+            return label
+    return VERDICTS[-1][1]
+
+
+def iter_paragraphs(lines: Iterable[str]) -> Iterator[Paragraph]:
+    """
+    Split Markdown or plain text into paragraphs at blank lines. Code blocks,
+    front matter, block quotes and tables are skipped: standardized code and
+    quoted text are not AI flavor. Headings are their own paragraphs.
+    """
+    block: List[str] = []
+    start = 0
+    index = 0
+    fence = None
+
+    for number, raw in enumerate(lines, 1):
+        line = raw.rstrip('\r\n')
+        stripped = line.strip()
+
+        if fence is not None:
+            if stripped.startswith(fence):
+                fence = None
+            continue
+        if number == 1 and stripped == '---':
+            fence = '---'
+            continue
+        if stripped.startswith('```') or stripped.startswith('~~~'):
+            fence = stripped[:3]
+        elif stripped and not stripped.startswith(('>', '|')) and not HEADING_RE.match(stripped):
+            if not block:
+                start = number
+            block.append(line)
+            continue
+
+        if block:
+            index += 1
+            yield Paragraph(index, start, '\n'.join(block))
+            block = []
+        if fence is None and HEADING_RE.match(stripped):
+            yield Paragraph(0, number, line, heading=True)
+
+    if block:
+        index += 1
+        yield Paragraph(index, start, '\n'.join(block))
+
+
+def _mask(text: str) -> str:
+    """Blank out non-prose spans, keeping every other character where it is."""
+    def blank(match):
+        if match.group(2) is not None:
+            # Keep a link's text in place, blank its brackets and target
+            before = match.group(0).index('[') + 1
+            return ' ' * before + match.group(2) + ' ' * (len(match.group(0)) - before - len(match.group(2)))
+        return ' ' * len(match.group(0))
+    return MASK_RE.sub(blank, text)
+
+
+def _find(text: str) -> List[Tuple[int, int, str]]:
+    """(offset, length, category) of every lexicon hit, in one matcher pass plus one regex pass."""
+    phrases = MATCHER.phrases
+    hits = [
+        (start, len(phrases[index]), PHRASE_CATEGORIES[index])
+        for start, index in MATCHER.find_longest(text.translate(ASCII_LOWER))
+    ]
+    for match in GAP_RE.finditer(text):
+        hits.append((match.start(), match.end() - match.start(), GAP_NAMES[int(match.lastgroup[1:])]))
+
+    offset = 0
+    for line in text.split('\n'):
+        match = NUMBERING_RE.match(line)
+        if match:
+            hits.append((offset + len(line) - len(line.lstrip()), len(match.group(0).strip()), NUMBERING))
+        offset += len(line) + 1
+
+    hits.sort()
+    return hits
+
+
+def score_paragraph(paragraph: Paragraph) -> ParagraphScore:
+    """Score one paragraph on its own; document-level checks happen in summarize()."""
+    text = _mask(paragraph.text)
+    line_starts = [0] + [i + 1 for i, ch in enumerate(text) if ch == '\n']
+
+    def position(offset: int) -> Tuple[int, int]:
+        row = bisect.bisect_right(line_starts, offset) - 1
+        return paragraph.line + row, offset - line_starts[row] + 1
+
+    annotations = []
+    for offset, length, name in _find(text):
+        info = category(name)
+        line, column = position(offset)
+        annotations.append(Annotation(
+            line, column, paragraph.text[offset:offset + length].strip(), name,
+            info.dimension, info.priority, info.message, info.weight
+        ))
+
+    chars = sum(1 for ch in text if not ch.isspace())
+    cap = CAP + chars // 100
+    counts = Counter(a.category for a in annotations)
+    net = dict.fromkeys(DIMENSIONS, 0.0)
+    human = 0.0
+    for name, count in counts.items():
+        info = category(name)
+        weight = info.weight * min(count, cap)
+        net[info.dimension] += weight
+        if weight < 0:
+            human -= weight
+
+    scale = max(chars, MIN_CHARS) / 100
+    score = BASELINE + SLOPE * sum(net.values()) / scale
+    if not human and chars >= MIN_CHARS and not paragraph.heading:
+        score += NO_HUMAN_PENALTY
+
+    # Sentences and the two characters each one opens with
+    openings = []
+    sentences = 0
+    start = 0
+    for i, ch in enumerate(text + '\n'):
+        if ch in SENTENCE_END:
+            sentence = text[start:i]
+            body = sentence.lstrip(OPENING_SKIP)
+            if len(body.strip()) >= 4:
+                line, column = position(start + len(sentence) - len(body))
+                openings.append((body[:2], line, column))
+            if sentence.strip():
+                sentences += 1
+            start = i + 1
+
+    stripped = text.rstrip()
+    return ParagraphScore(
+        paragraph.index, paragraph.line, chars, sentences, clamp(score), paragraph.heading,
+        bool(stripped) and stripped[-1] in PARAGRAPH_END, net, openings, annotations
+    )
+
+
+def summarize(paragraphs: List[ParagraphScore], elapsed_ms: float = 0.0) -> Report:
+    """Overall score, per-dimension scores and the 朱雀 report of scored paragraphs."""
+    body = [p for p in paragraphs if not p.heading]
+    chars = sum(p.chars for p in body)
+    weight = sum(max(p.chars, MIN_CHARS) for p in body)
+    mean = sum(p.score * max(p.chars, MIN_CHARS) for p in body) / weight if weight else 0.0
+    scale = weight / 100 if weight else 1.0
+    annotations = [a for p in paragraphs for a in p.annotations]
+
+    document = []
+    # 句首重复: the same two characters opening many sentences
+    openings = [o for p in body for o in p.openings]
+    for opening, count in Counter(o[0] for o in openings).items():
+        if count >= 3 and count >= 0.2 * len(openings):
+            for _, line, column in [o for o in openings if o[0] == opening][1:]:
+                document.append(Annotation(
+                    line, column, opening, 'repeated-opening', 'openings', 'medium',
+                    f'句首重复（{count} 句以"{opening}"开头）', 0.5
+                ))
+
+    # 段落规整度 and 段落结尾标点
+    lengths = [p.chars for p in body]
+    uniformity = statistics.pstdev(lengths) / statistics.mean(lengths) if len(lengths) >= 3 and any(lengths) else None
+    uniform = uniformity is not None and uniformity < 0.3
+    ended = sum(1 for p in body if p.ends_with_punctuation)
+    all_ended = len(body) >= 3 and ended == len(body)
+
+    score = mean + (1.0 if uniform else 0.0) + (0.5 if all_ended else 0.0) + (0.5 if document else 0.0)
+
+    dimensions = {}
+    for key, label in DIMENSIONS.items():
+        net = sum(p.net[key] for p in body) + sum(a.weight for a in document if a.dimension == key)
+        found = Counter(a.keyword for a in annotations if a.dimension == key)
+        found.update(a.keyword for a in document if a.dimension == key)
+        dimensions[key] = {
+            'label': label,
+            'score': clamp(BASELINE + SLOPE * net / scale),
+            'hits': dict(found.most_common()),
+        }
+
+    return Report(
+        clamp(score), verdict(clamp(score)), chars, paragraphs, document, dimensions,
+        _zhuque(body, annotations, chars, uniformity, uniform, ended), round(elapsed_ms, 2)
+    )
+
+
+def _zhuque(body, annotations, chars, uniformity, uniform, ended) -> Dict:
+    """The 朱雀专项检测 report of references/zhuque-detection.md, with its 评分标准."""
+    per_300 = 300 / chars if chars else 0.0
+    zhuque = [a for a in annotations if category(a.category).zhuque]
+    connectors = [a for a in zhuque if a.category not in (NUMBERING, 'zhuque-bracket', 'zhuque-dash')]
+    numbering = [a for a in zhuque if a.category == NUMBERING]
+    brackets = [a for a in zhuque if a.category == 'zhuque-bracket']
+    dashes = [a for a in zhuque if a.category == 'zhuque-dash']
+    density = len(connectors) * per_300
+    human = -sum(a.weight for a in annotations if a.weight < 0) * per_300
+
+    if not body:
+        endings = '无正文'
+    elif ended == len(body):
+        endings = '全部使用'
+    elif ended * 2 >= len(body):
+        endings = '部分使用'
+    else:
+        endings = '基本不用'
+
+    features = {
+        'connectors': density > 5,
+        'numbering': bool(numbering),
+        'brackets': len(brackets) > 3,
+        'dashes': len(dashes) > 2,
+        'uniform_paragraphs': uniform,
+        'paragraph_endings': len(body) >= 3 and ended == len(body),
+    }
+    count = sum(features.values())
+
+    def at(items):
+        return [{'keyword': a.keyword, 'line': a.line} for a in items]
+
+    return {
+        'connector_density': {
+            'per_300_chars': round(density, 2),
+            'level': '高' if density > 5 else '中' if density >= 2 else '低',
+            'keywords': at(connectors),
+        },
+        'numbering': at(numbering),
+        'brackets': at(brackets),
+        'dashes': at(dashes),
+        'paragraph_uniformity': {
+            'cv': round(uniformity, 2) if uniformity is not None else None,
+            'level': '过高' if uniform else '正常' if uniformity is not None else '段落太少',
+        },
+        'paragraph_endings': endings,
+        'human_signals': '强' if human >= 4 else '中' if human >= 1.5 else '弱',
+        'ai_features': [name for name, present in features.items() if present],
+        'verdict': 'AI 味明显' if count >= 4 else '有 AI 痕迹' if count >= 2 else '人味很浓',
+    }
+
+
+def score_lines(lines: Iterable[str]) -> Report:
+    start = time.perf_counter()
+    paragraphs = [score_paragraph(p) for p in iter_paragraphs(lines)]
+    return summarize(paragraphs, (time.perf_counter() - start) * 1000)
+
+
+def score_text(text: str) -> Report:
+    """Score a whole text. Returns a Report; to_dict() makes it JSON-ready."""
+    return score_lines(text.split('\n'))
+
+
+def to_dict(value):
+    """Report (or any part of it) as plain dicts and lists."""
+    if isinstance(value, tuple) and hasattr(value, '_asdict'):
+        return {k: to_dict(v) for k, v in value._asdict().items()}
+    if isinstance(value, (list, tuple)):
+        return [to_dict(v) for v in value]
+    if isinstance(value, dict):
+        return {k: to_dict(v) for k, v in value.items()}
+    return value
+
+
+def print_report(report: Report, name: Optional[str] = None, show_all: bool = False, zhuque: bool = False) -> None:
+    def describe(a: Annotation) -> str:
+        return f'[{PRIORITY_LABELS[a.priority]}] 第 {a.line} 行："{a.keyword}" - {a.message}'
+
+    if name:
+        print(f'== {name}')
+    print(f'AI 味评分：{report.score}/10（{report.verdict}）')
+    print(f'正文 {report.chars} 字，{sum(1 for p in report.paragraphs if not p.heading)} 段，用时 {report.elapsed_ms} ms')
+
+    print('\n维度评分：')
+    for dim in report.dimensions.values():
+        hits = '、'.join(f'{k}×{v}' for k, v in list(dim['hits'].items())[:6])
+        print(f"  {dim['label']}：{dim['score']}/10" + (f'（{hits}）' if hits else ''))
+
+    print('\n逐段分析：')
+    for p in report.paragraphs:
+        issues = [a for a in p.annotations if a.weight > 0 or (a.weight == 0 and a.priority == 'high')]
+        if not show_all:
+            issues = [a for a in issues if a.priority != 'low']
+        human = Counter(a.keyword for a in p.annotations if a.weight < 0)
+        if p.heading and not issues:
+            continue
+        label = '标题' if p.heading else f'第 {p.index} 段'
+        print(f'{label}（第 {p.line} 行）：{p.score}/10')
+        for a in issues:
+            print(f'  {describe(a)}')
+        if human:
+            print('  人味信号：' + '、'.join(f'{k}×{v}' for k, v in human.most_common(6)))
+
+    if report.document:
+        print('\n全文：')
+        for a in report.document:
+            print(f'  {describe(a)}')
+
+    issues = [a for p in report.paragraphs for a in p.annotations if a.weight > 0] + report.document
+    print('\n问题汇总：')
+    for priority, label in PRIORITY_LABELS.items():
+        found = Counter(a.keyword for a in issues if a.priority == priority)
+        if found:
+            print(f'  {label}：' + '、'.join(f'"{k}"×{v}' for k, v in found.most_common()))
+
+    if zhuque:
+        z = report.zhuque
+        print('\n朱雀专项检测：')
+        print(f"  连接词密度：{z['connector_density']['level']}（{z['connector_density']['per_300_chars']} 处/300 字）")
+        print(f"  序号列表：{len(z['numbering'])} 处")
+        print(f"  括号使用：{len(z['brackets'])} 处")
+        print(f"  破折号使用：{len(z['dashes'])} 处")
+        print(f"  段落规整度：{z['paragraph_uniformity']['level']}")
+        print(f"  段落结尾标点：{z['paragraph_endings']}")
+        print(f"  人味信号：{z['human_signals']}")
+        print(f"  判定：{z['verdict']}（{len(z['ai_features'])} 项 AI 特征）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score the AI flavor of a text (0-10) without an LLM pass')
+    parser.add_argument('files', nargs='*', default=['-'], help='Text or Markdown files (default: stdin)')
+    parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+    parser.add_argument('--zhuque', action='store_true', help='Add the 朱雀专项检测 section')
+    parser.add_argument('--all', action='store_true', help='Also list low-priority annotations')
+
+    args = parser.parse_args()
+
+    reports = []
+    for path in args.files:
+        if path == '-':
+            report = score_lines(sys.stdin)
+        else:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    report = score_lines(f)
+            except (OSError, UnicodeDecodeError) as e:
+                print(f'Error: Cannot read {path}: {e}', file=sys.stderr)
+                sys.exit(1)
+        reports.append((path, report))
+
+    if args.json:
+        result = [dict(file=path, **to_dict(report)) for path, report in reports]
+        json.dump(result[0] if len(result) == 1 else result, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+
+    for i, (path, report) in enumerate(reports):
+        if i:
+            print()
+        print_report(report, path if len(reports) > 1 else None, args.all, args.zhuque)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Mermaid to PNG Library API
+Render Mermaid diagrams in-process and get the image bytes back. Diagrams are
+piped to the renderer and images read back from it, so nothing is written to
+disk (apart from the optional render cache). convert.py is built on this.
+
+Usage:
+    from api import MermaidConverter
+
+    with MermaidConverter(style='dark-tech') as converter:
+        result = converter.render('graph TD\n    A --> B')
+        result.data        # PNG bytes
+        result.cached      # True if served from the render cache
+
+    async with MermaidConverter(fmt='svg') as converter:
+        results = await converter.arender_many([code_a, code_b])
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, List, NamedTuple, Optional, Union
+
+from cache import RenderCache, make_cache_key
+from renderer import LazyRenderer, RenderError, Renderer, renderer_version
+from styles import get_style_config, inject_style_into_diagram
+from validate import ValidationError, validate_diagram
+
+
+class DiagramSyntaxError(RenderError):
+    """Raised when a diagram fails the pre-render syntax checks."""
+
+    def __init__(self, errors: List[ValidationError]):
+        super().__init__('; '.join(f"line {e.line}: {e.message}" for e in errors))
+        self.errors = errors
+
+
+class RenderedDiagram(NamedTuple):
+    """Rendered image data and how it was produced."""
+    data: bytes
+    format: str
+    width: int
+    background: str
+    source: str       # diagram source sent to the renderer, style included
+    cache_key: str
+    renderer: str     # mermaid-cli version, e.g. mermaid-cli@11.4.0
+    cached: bool
+    seconds: float
+
+
+class MermaidConverter:
+    """
+    Render Mermaid source to image bytes with a shared renderer and cache.
+
+    Constructor arguments are defaults for every call; `render()` and friends
+    accept the same keyword arguments to override them per diagram. Pass a
+    backend name ('auto', 'persistent', 'cli') or a Renderer instance as
+    `renderer`; a named backend is started on first use and closed with the
+    converter. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        style: Optional[str] = None,
+        chart_type: str = "flowchart",
+        width: int = 1200,
+        background: str = "white",
+        fmt: str = "png",
+        renderer: Union[str, Renderer] = "auto",
+        cache: Optional[RenderCache] = None,
+        validate: bool = True,
+        jobs: Optional[int] = None
+    ):
+        if style and get_style_config(style) is None:
+            raise ValueError(f"Unknown style: {style}")
+
+        self.style = style
+        self.chart_type = chart_type
+        self.width = width
+        self.background = background
+        self.fmt = fmt
+        self.cache = cache
+        self.validate = validate
+        self.jobs = jobs or os.cpu_count() or 1
+
+        self._owns_renderer = isinstance(renderer, str)
+        self.renderer = LazyRenderer(renderer) if isinstance(renderer, str) else renderer
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @functools.cached_property
+    def version(self) -> str:
+        """Renderer identity used in cache keys and result metadata."""
+        return renderer_version() if self._owns_renderer else self.renderer.version
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        """Worker threads for render_many() and the asyncio methods, started on first use."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.jobs)
+            return self._pool
+
+    def prepare(
+        self,
+        code: str,
+        style: Optional[str] = None,
+        chart_type: Optional[str] = None,
+        html_labels: bool = True
+    ) -> str:
+        """Diagram source as it will be sent to the renderer, with the style injected."""
+        style = self.style if style is None else style
+        chart_type = chart_type or self.chart_type
+        if style or not html_labels:
+            return inject_style_into_diagram(code, style, chart_type, html_labels)
+        return code
+
+    def resolve_background(self, style: Optional[str] = None, background: Optional[str] = None) -> str:
+        """A style's own background wins over the requested one."""
+        style = self.style if style is None else style
+        background = background or self.background
+        if style:
+            return get_style_config(style).get("background", background)
+        return background
+
+    def lookup(
+        self,
+        source: str,
+        width: int,
+        background: str,
+        fmt: str,
+        version: Optional[str] = None
+    ) -> Optional[RenderedDiagram]:
+        """Cached render of prepared `source`, or None on a miss or without a cache."""
+        if self.cache is None:
+            return None
+        start = time.perf_counter()
+        version = version or self.version
+        key = make_cache_key(source, width, background, fmt, version)
+        data = self.cache.get(key, fmt)
+        if data is None:
+            return None
+        return RenderedDiagram(data, fmt, width, background, source, key, version, True, time.perf_counter() - start)
+
+    def render_source(
+        self,
+        source: str,
+        width: int,
+        background: str,
+        fmt: str,
+        check_cache: bool = True,
+        store: bool = True
+    ) -> RenderedDiagram:
+        """
+        Render prepared `source`, going through the cache. Raises RenderError.
+        With `store=False` the caller decides what goes into the cache.
+        """
+        if check_cache:
+            hit = self.lookup(source, width, background, fmt)
+            if hit is not None:
+                return hit
+
+        start = time.perf_counter()
+        data = self.renderer.render_bytes(source, width, background, fmt)
+        key = make_cache_key(source, width, background, fmt, self.version)
+        if store and self.cache is not None:
+            self.cache.put(key, fmt, data)
+        return RenderedDiagram(data, fmt, width, background, source, key, self.version, False, time.perf_counter() - start)
+
+    def render(
+        self,
+        code: str,
+        style: Optional[str] = None,
+        chart_type: Optional[str] = None,
+        width: Optional[int] = None,
+        background: Optional[str] = None,
+        fmt: Optional[str] = None
+    ) -> RenderedDiagram:
+        """
+        Style and render one diagram.
+        Raises DiagramSyntaxError when validation is on and the diagram fails
+        it, RenderError when rendering fails.
+        """
+        source = self.prepare(code, style, chart_type)
+        if self.validate:
+            errors = validate_diagram(code, 1, source)
+            if errors:
+                raise DiagramSyntaxError(errors)
+
+        return self.render_source(
+            source,
+            width or self.width,
+            self.resolve_background(style, background),
+            fmt or self.fmt
+        )
+
+    def render_many(self, codes: Iterable[str], **options: Any) -> List[RenderedDiagram]:
+        """Render diagrams in parallel; results are in input order. Raises the first error."""
+        return list(self.pool.map(lambda code: self.render(code, **options), codes))
+
+    async def arender(self, code: str, **options: Any) -> RenderedDiagram:
+        """asyncio version of render(); runs on the converter's worker threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, functools.partial(self.render, code, **options))
+
+    async def arender_many(self, codes: Iterable[str], **options: Any) -> List[RenderedDiagram]:
+        """asyncio version of render_many()."""
+        return list(await asyncio.gather(*(self.arender(code, **options) for code in codes)))
+
+    def start(self) -> None:
+        """Start the renderer now (e.g. a long-running service) instead of on the first miss."""
+        self.renderer.start()
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+        if self._owns_renderer:
+            self.renderer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
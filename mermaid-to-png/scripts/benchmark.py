@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Mermaid to PNG Benchmark
+Time convert.py's real pipeline (process_files) against a stub renderer,
+without mermaid-cli, Chromium or network access.
+
+Usage:
+    python3 benchmark.py                          # 1, 100 and 10k diagrams
+    python3 benchmark.py --scales 100 --renderer stub-worker --json run.json
+    python3 benchmark.py --compare run.json       # diff against an earlier run
+"""
+
+import argparse
+import base64
+import contextlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+from api import MermaidConverter
+from cache import open_cache
+from convert import ConversionSession, build_parser, process_files
+from fences import scan_mermaid_blocks
+from profiling import Profiler
+from renderer import LazyRenderer, PersistentRenderer, Renderer
+from styles import get_available_styles
+
+SAMPLES_DIR = Path(__file__).resolve().parent.parent / 'evals' / 'files'
+PASSES = ['cold', 'warm']
+STAGES = ['extract', 'validate', 'style', 'cache', 'render', 'write', 'rewrite']
+FILE_STAGES = {'extract', 'validate', 'rewrite'}
+
+# 1x1 transparent PNG returned by the stub renderers
+STUB_PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+STUB_INDEX_JS = """\
+const latency = Number(process.env.MERMAID_STUB_LATENCY_MS || 0);
+const png = Buffer.from('%s', 'base64');
+export async function renderMermaid(browser, definition, format, options) {
+  await new Promise((resolve) => setTimeout(resolve, latency));
+  return { data: png };
+}
+""" % base64.b64encode(STUB_PNG).decode('ascii')
+
+STUB_PUPPETEER_JS = """\
+const startup = Number(process.env.MERMAID_STUB_STARTUP_MS || 0);
+module.exports = {
+  launch: () => new Promise((resolve) => setTimeout(() => resolve({ close: async () => {} }), startup)),
+};
+"""
+
+
+class StubRenderer(Renderer):
+    """In-process stand-in for mermaid-cli with fixed startup and per-diagram latency."""
+
+    name = "stub"
+    version = "stub"
+
+    def __init__(self, startup_ms: float = 0, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        time.sleep(startup_ms / 1000)
+
+    def render_bytes(
+        self,
+        code: str,
+        width: int = 1200,
+        background: str = "white",
+        fmt: str = "png"
+    ) -> bytes:
+        time.sleep(self.latency)
+        return STUB_PNG
+
+
+def write_stub_cli_package(root: Path) -> Path:
+    """Create a fake @mermaid-js/mermaid-cli package for the persistent worker."""
+    (root / 'src').mkdir(parents=True, exist_ok=True)
+    (root / 'node_modules' / 'puppeteer').mkdir(parents=True, exist_ok=True)
+    (root / 'package.json').write_text(
+        json.dumps({'name': '@mermaid-js/mermaid-cli', 'version': '0.0.0-stub', 'type': 'module'})
+    )
+    (root / 'src' / 'index.js').write_text(STUB_INDEX_JS)
+    (root / 'node_modules' / 'puppeteer' / 'package.json').write_text(
+        json.dumps({'name': 'puppeteer', 'main': 'index.js'})
+    )
+    (root / 'node_modules' / 'puppeteer' / 'index.js').write_text(STUB_PUPPETEER_JS)
+    return root
+
+
+def build_corpus(path: Path, diagram_count: int) -> None:
+    """
+    Write a Markdown document with `diagram_count` diagrams by repeating the
+    eval samples. Each diagram gets a unique comment so no two hash the same.
+    """
+    samples = []
+    for sample in sorted(SAMPLES_DIR.glob('*.md')):
+        with open(sample, 'rb') as f:
+            blocks = list(scan_mermaid_blocks(f))
+        samples.extend(block.code for block in blocks)
+
+    if not samples:
+        raise RuntimeError(f"No Mermaid samples found in {SAMPLES_DIR}")
+
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(diagram_count):
+            f.write(f"## Section {i + 1}\n\nSome prose before the diagram.\n\n")
+            f.write(f"```mermaid\n{samples[i % len(samples)]}\n%% bench {i}\n```\n\n")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """High-water RSS of this process and its children so far, in MB."""
+    if not HAS_RESOURCE:
+        return None
+    self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is bytes on macOS, KB elsewhere
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return max(self_kb, children_kb) / scale
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(count: int, elapsed: float, latencies: List[float]) -> Dict[str, Optional[float]]:
+    p50 = percentile(latencies, 50)
+    p99 = percentile(latencies, 99)
+    return {
+        'diagrams': count,
+        'seconds': elapsed,
+        'diagrams_per_sec': count / elapsed if elapsed > 0 else None,
+        'p50_ms': p50 * 1000 if p50 is not None else None,
+        'p99_ms': p99 * 1000 if p99 is not None else None
+    }
+
+
+def create_stub_renderer(args: argparse.Namespace, work_dir: Path) -> LazyRenderer:
+    """A stub backend behind LazyRenderer, so cached passes never start it, as in real runs."""
+    if args.renderer == 'stub':
+        renderer = LazyRenderer(factory=lambda: StubRenderer(args.startup_ms, args.latency_ms))
+    else:
+        os.environ['MERMAID_STUB_STARTUP_MS'] = str(args.startup_ms)
+        os.environ['MERMAID_STUB_LATENCY_MS'] = str(args.latency_ms)
+        package = write_stub_cli_package(work_dir / 'stub-cli')
+        renderer = LazyRenderer(factory=lambda: PersistentRenderer(package))
+    # Cache keys include the renderer version; keep stub renders apart from real ones
+    renderer.version = StubRenderer.version
+    return renderer
+
+
+def run_pass(corpus: Path, convert_args: argparse.Namespace, args: argparse.Namespace) -> Dict[str, Dict]:
+    """
+    Convert the corpus once through convert.process_files and break the
+    profiler's spans down by stage. Renderer startup counts towards render.
+    """
+    cache = open_cache(convert_args.cache_dir, convert_args.cache_max_size)
+    converter = MermaidConverter(
+        style=convert_args.style,
+        chart_type=convert_args.chart_type,
+        background=convert_args.background,
+        renderer=create_stub_renderer(args, corpus.parent),
+        cache=cache,
+        validate=False,
+        jobs=convert_args.jobs
+    )
+    profiler = Profiler(enabled=True)
+
+    with converter, open(os.devnull, 'w') as devnull:
+        session = ConversionSession(convert_args, converter, profiler=profiler)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(devnull):
+            converted, total = process_files([str(corpus)], str(corpus.parent), session)
+        elapsed = time.perf_counter() - start
+        converter.renderer.close()
+
+    if converted != total:
+        raise RuntimeError(f"Only {converted}/{total} benchmark diagrams converted")
+
+    report = profiler.report()
+    diagrams = report['per_diagram']
+    results = {}
+    for stage in STAGES:
+        if stage in FILE_STAGES:
+            # One span per file: throughput only
+            latencies = []
+            seconds = report['stage_seconds'].get(stage, 0.0)
+        else:
+            latencies = [d['stages'][stage] for d in diagrams if stage in d['stages']]
+            seconds = sum(latencies)
+        results[stage] = summarize(total, seconds, latencies)
+
+    results['total'] = summarize(total, elapsed, [d['seconds'] for d in diagrams])
+    results['total']['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def run_scale(diagram_count: int, args: argparse.Namespace) -> Dict[str, Dict]:
+    """
+    Convert a corpus of `diagram_count` diagrams twice with convert.py's own
+    code path: cold (empty cache) and warm (every diagram a cache hit).
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='mermaid-bench-') as tmp:
+        work_dir = Path(tmp)
+        corpus = work_dir / 'corpus.md'
+        build_corpus(corpus, diagram_count)
+
+        convert_args = build_parser().parse_args([
+            str(corpus),
+            '--output-dir', str(work_dir / 'output'),
+            '--replace',
+            '--style', args.style,
+            '--jobs', str(args.jobs),
+            '--cache-dir', str(work_dir / 'cache')
+        ])
+        for name in PASSES:
+            results[name] = run_pass(corpus, convert_args, args)
+
+    return results
+
+
+def format_value(value: Optional[float], fmt: str) -> str:
+    if value is not None:
+        return format(value, fmt)
+    width = int(fmt.lstrip('+').split('.')[0])
+    return '-'.rjust(width)
+
+
+def print_report(report: Dict[str, Dict[str, Dict]], baseline: Optional[Dict] = None) -> None:
+    header = (
+        f"{'scale':>7} {'pass':<5} {'stage':<8} {'diagrams/s':>12} "
+        f"{'p50 ms':>9} {'p99 ms':>9} {'peak RSS MB*':>13}"
+    )
+    if baseline:
+        header += f" {'vs baseline':>12}"
+    print(header)
+    print('-' * len(header))
+
+    for scale, passes in report.items():
+        for name in PASSES:
+            for stage in STAGES + ['total']:
+                row = passes[name][stage]
+                line = (
+                    f"{scale:>7} {name:<5} {stage:<8} "
+                    f"{format_value(row['diagrams_per_sec'], '12.1f')} "
+                    f"{format_value(row['p50_ms'], '9.3f')} "
+                    f"{format_value(row['p99_ms'], '9.3f')} "
+                    f"{format_value(row.get('peak_rss_mb'), '13.1f')}"
+                )
+                if baseline:
+                    old = baseline.get(scale, {}).get(name, {}).get(stage, {}).get('diagrams_per_sec')
+                    new = row['diagrams_per_sec']
+                    change = (new - old) / old * 100 if old and new else None
+                    line += f" {format_value(change, '+11.1f')}%" if change is not None else f" {'-':>12}"
+                print(line)
+
+    print(
+        "\nStage diagrams/s is per worker (summed span time across threads); "
+        "total is end to end.\n"
+        "* Peak RSS is cumulative: the high-water mark of the scale's process "
+        "so far, not a per-stage figure."
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the mermaid-to-png pipeline with a stub renderer')
+    parser.add_argument('--scales', default='1,100,10000', help='Comma-separated diagram counts (default: 1,100,10000)')
+    parser.add_argument('--renderer', default='stub', choices=['stub', 'stub-worker'], help='In-process stub, or the persistent Node worker driving a stub mermaid-cli')
+    parser.add_argument('--startup-ms', type=float, default=500, help='Simulated renderer startup latency')
+    parser.add_argument('--latency-ms', type=float, default=10, help='Simulated per-diagram render latency')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='Parallel renders (default: CPU count)')
+    parser.add_argument('--style', default='fresh-business', choices=get_available_styles(), help='Style passed to convert.py --style')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Earlier --json report to compare diagrams/sec against')
+
+    args = parser.parse_args()
+
+    if args.renderer == 'stub-worker' and shutil.which('node') is None:
+        print("Error: node not found (required for --renderer stub-worker)")
+        sys.exit(1)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('results')
+
+    report = {}
+    for scale in (int(s) for s in args.scales.split(',') if s.strip()):
+        print(f"Running {scale} diagram(s)...", file=sys.stderr)
+        # A fresh process per scale keeps peak RSS from carrying over between runs
+        with multiprocessing.Pool(1) as pool:
+            report[str(scale)] = pool.apply(run_scale, (scale, args))
+
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'settings': {
+                    'renderer': args.renderer,
+                    'startup_ms': args.startup_ms,
+                    'latency_ms': args.latency_ms,
+                    'jobs': args.jobs,
+                    'style': args.style
+                },
+                'results': report
+            }, f, indent=2)
+        print(f"\nResults written to: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Mermaid Render Cache
+Content-addressed on-disk cache of rendered diagrams for mermaid-to-png.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_MAX_SIZE_MB = 512
+
+
+def get_default_cache_dir() -> Path:
+    """Get the cache directory (~/.cache/mermaid-to-png)"""
+    # Use XDG cache directory if set, otherwise ~/.cache/mermaid-to-png/
+    xdg_cache = os.environ.get('XDG_CACHE_HOME')
+    if xdg_cache:
+        return Path(xdg_cache) / 'mermaid-to-png'
+    return Path.home() / '.cache' / 'mermaid-to-png'
+
+
+def make_cache_key(
+    code: str,
+    width: int,
+    background: str,
+    fmt: str,
+    renderer_version: str
+) -> str:
+    """
+    Hash every input that affects the rendered image.
+    `code` must be the final (style-injected) diagram source.
+    """
+    inputs = json.dumps({
+        'code': code,
+        'width': width,
+        'background': background,
+        'format': fmt,
+        'renderer': renderer_version
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(inputs.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """
+    Rendered images stored as <cache_dir>/<key[:2]>/<key>.<fmt>.
+
+    An entry's mtime is its last use; `evict()` removes least recently used
+    entries until the cache fits in `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_SIZE_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key: str, fmt: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.{fmt}"
+
+    def get(self, key: str, fmt: str) -> Optional[bytes]:
+        """Cached image data, or None on a miss."""
+        entry = self._entry_path(key, fmt)
+        try:
+            with open(entry, 'rb') as f:
+                data = f.read()
+            os.utime(entry)
+        except OSError:
+            # Missing, or unreadable: either way render it again
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, fmt: str, data: bytes) -> None:
+        """Add a freshly rendered image to the cache."""
+        entry = self._entry_path(key, fmt)
+        temp_path = None
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file first so readers never see a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=entry.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, entry)
+        except OSError as e:
+            print(f"Warning: Could not write render cache entry: {e}")
+            if temp_path is not None:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+
+    def evict(self) -> int:
+        """Remove least recently used entries beyond max_bytes. Returns bytes freed."""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob('*/*'):
+            # Skip entries another process is still writing
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        freed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            freed += size
+        return freed
+
+
+def open_cache(cache_dir: Optional[str], max_size_mb: int, enabled: bool = True) -> Optional[RenderCache]:
+    """Build the render cache from CLI options, or None when caching is off."""
+    if not enabled:
+        return None
+    path = Path(cache_dir) if cache_dir else get_default_cache_dir()
+    return RenderCache(path, max_size_mb * 1024 * 1024)
@@ -7,35 +7,41 @@ GitHub Repository: https://github.com/haiyuan-ai/agent-skills
 """
 
 import argparse
+import glob
 import hashlib
+import html
 import os
-import re
-import subprocess
 import sys
-import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Dict, List, Optional, Set, Tuple
 
 from styles import (
+    add_theme_dir,
     get_available_styles,
-    inject_style_into_diagram,
+    get_style_config,
     get_style_info
 )
+from api import MermaidConverter
+from renderer import BACKENDS, CliRenderer, RenderError, RenderTimeout
+from cache import DEFAULT_MAX_SIZE_MB, make_cache_key, open_cache
+from profiling import DiagramProfile, Profiler
+from server import main as serve
+from optimize import HAS_PIL, optimize_png
+from rasterize import HAS_CAIROSVG, rasterize_svg
+from validate import ValidationError, ValidationFailed, validate_diagram
+from fences import (
+    MermaidBlock,
+    extract_mermaid_diagrams,
+    replace_mermaid_with_images,
+    scan_mermaid_blocks,
+    splice_images
+)
 
 
-def extract_mermaid_diagrams(content: str) -> List[Tuple[str, str, int]]:
-    """Extract Mermaid diagrams from Markdown content."""
-    pattern = r'```mermaid\n(.*?)```'
-    matches = re.finditer(pattern, content, re.DOTALL)
-
-    diagrams = []
-    for idx, match in enumerate(matches):
-        code = match.group(1).strip()
-        lines = code.split('\n')
-        title = lines[0] if lines else f"diagram_{idx}"
-        diagrams.append((code, title, idx))
-
-    return diagrams
+FORMATS = ['png', 'svg']
 
 
 def generate_diagram_hash(code: str) -> str:
@@ -50,93 +56,514 @@ def convert_mermaid_to_image(
     background: str = "white",
     fmt: str = "png"
 ) -> bool:
-    """Convert Mermaid code to image using mermaid-cli."""
-
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.mmd', delete=False) as f:
-        f.write(code)
-        temp_mmd_path = f.name
-
+    """Convert Mermaid code to image using a one-off mermaid-cli process."""
     try:
-        cmd = [
-            'npx', '@mermaid-js/mermaid-cli',
-            '-i', temp_mmd_path,
-            '-o', output_path,
-            '-b', background,
-            '-w', str(width)
+        CliRenderer().render(code, output_path, width, background, fmt)
+    except RenderError as e:
+        print(f"Error: {e}")
+        return False
+    return True
+
+
+class ConversionSession:
+    """Shared state for one run: options, converter, worker pools and profiler."""
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        converter: MermaidConverter,
+        process_pool: Optional[ProcessPoolExecutor] = None,
+        rendered: Optional[Set[str]] = None,
+        profiler: Optional[Profiler] = None
+    ):
+        self.args = args
+        self.converter = converter
+        self.process_pool = process_pool
+        self.rendered = rendered
+        self.profiler = profiler or Profiler()
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        return self.converter.pool
+
+    @property
+    def variants(self) -> List[Tuple[str, int]]:
+        """(format, width) for every requested output; SVG is width-independent."""
+        widths = self.args.width
+        return [
+            (fmt, width)
+            for fmt in self.args.format
+            for width in (widths if fmt == 'png' else [max(widths)])
         ]
 
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=60
+    @property
+    def rasterize_locally(self) -> bool:
+        """Lay out once to SVG and rasterize PNG variants in the process pool."""
+        return self.process_pool is not None and HAS_CAIROSVG and len(self.variants) > 1
+
+    @property
+    def optimize_colors(self) -> Optional[int]:
+        """None when PNG optimization is off, else the palette size (0 = lossless only)."""
+        if self.process_pool is None or not (self.args.optimize or self.args.quantize):
+            return None
+        return self.args.quantize if HAS_PIL else 0
+
+    def variant_version(self, fmt: str) -> str:
+        """
+        Renderer identity for cache keys: locally rasterized and optimized
+        PNGs differ from mermaid-cli's output.
+        """
+        version = self.converter.version
+        if fmt == 'png' and self.rasterize_locally:
+            version += "+cairosvg"
+        if fmt == 'png' and self.optimize_colors is not None:
+            version += f"+optimized{self.optimize_colors or ''}"
+        return version
+
+    def add_saved(self, count: int) -> None:
+        with self._lock:
+            self.bytes_saved += count
+
+
+def variant_filename(idx: int, hash_str: str, fmt: str, width: int, multi_width: bool) -> str:
+    """Output file name; PNGs get a width suffix when several widths are requested."""
+    if fmt == 'png' and multi_width:
+        return f"diagram_{idx + 1}_{hash_str}_{width}w.png"
+    return f"diagram_{idx + 1}_{hash_str}.{fmt}"
+
+
+def write_output(path: str, data: bytes) -> None:
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def format_size(count: int) -> str:
+    return f"{count / 1024:.1f} KB"
+
+
+def render_variants(
+    source: str,
+    pending: List[Tuple[str, int, str]],
+    background: str,
+    session: ConversionSession,
+    profile: DiagramProfile
+) -> List[Tuple[str, int, str, bytes]]:
+    """
+    Produce image data for the pending (format, width, path) outputs from
+    prepared `source`. With local rasterization the diagram is laid out once
+    to SVG and PNGs are rasterized from it in memory; otherwise each output is
+    rendered separately. Raises RenderError on failure.
+    """
+    converter = session.converter
+    results = []
+    if not session.rasterize_locally:
+        for fmt, width, path in pending:
+            with profile.stage("render"):
+                result = converter.render_source(source, width, background, fmt, check_cache=False, store=False)
+            results.append((fmt, width, path, result.data))
+        return results
+
+    # A pending SVG output already missed the cache in render_diagram;
+    # a scratch SVG used only for rasterizing is cached here
+    svg_pending = any(fmt == 'svg' for fmt, _, _ in pending)
+    with profile.stage("render"):
+        svg = converter.render_source(
+            source, max(session.args.width), background, 'svg',
+            check_cache=not svg_pending, store=not svg_pending
         )
+    results.extend((fmt, width, path, svg.data) for fmt, width, path in pending if fmt == 'svg')
 
-        if result.returncode != 0:
-            print(f"Error: {result.stderr}")
-            return False
-
-        return True
-
-    except subprocess.TimeoutExpired:
-        print("Error: Conversion timed out")
-        return False
-    except FileNotFoundError:
-        print("Error: mermaid-cli not found")
-        print("Install with: npm install -g @mermaid-js/mermaid-cli")
-        return False
-    finally:
-        if os.path.exists(temp_mmd_path):
-            os.unlink(temp_mmd_path)
-
-
-def replace_mermaid_with_images(content: str, image_mapping: dict) -> str:
-    """Replace Mermaid code blocks with image references."""
-    pattern = r'```mermaid\n(.*?)```'
+    pngs = [(width, path) for fmt, width, path in pending if fmt == 'png']
+    with profile.stage("rasterize"):
+        futures = [
+            session.process_pool.submit(rasterize_svg, svg.data, width, background)
+            for width, _ in pngs
+        ]
+        errors = []
+        for (width, path), future in zip(pngs, futures):
+            try:
+                results.append(('png', width, path, future.result()))
+            except Exception as e:
+                errors.append(str(e))
+        if errors:
+            raise RenderError(f"Rasterization failed: {errors[0]}")
+    return results
+
+
+def optimize_outputs(
+    results: List[Tuple[str, int, str, bytes]],
+    session: ConversionSession,
+    profile: DiagramProfile
+) -> Tuple[List[Tuple[str, int, str, bytes]], int, int]:
+    """
+    Optimize the PNG results in the process pool.
+    Returns the results plus total PNG bytes before and after.
+    """
+    colors = session.optimize_colors
+    pngs = [i for i, (fmt, _, _, _) in enumerate(results) if fmt == 'png']
+    before = sum(len(results[i][3]) for i in pngs)
+
+    with profile.stage("optimize"):
+        futures = {i: session.process_pool.submit(optimize_png, results[i][3], colors) for i in pngs}
+        optimized = list(results)
+        for i, future in futures.items():
+            fmt, width, path, data = results[i]
+            try:
+                optimized[i] = (fmt, width, path, future.result())
+            except Exception as e:
+                # Keep the unoptimized image rather than failing the diagram
+                print(f"Warning: Could not optimize {path}: {e}")
+
+    after = sum(len(optimized[i][3]) for i in pngs)
+    return optimized, before, after
+
+
+def render_diagram(
+    idx: int,
+    code: str,
+    title: str,
+    output_dir: str,
+    session: ConversionSession,
+    profile: Optional[DiagramProfile] = None
+) -> Tuple[List[Tuple[str, int, str]], List[str]]:
+    """
+    Style, render, optimize and cache every output variant of one diagram.
+    Returns the (format, width, path) outputs (empty on failure) and the
+    console lines to print, so callers running diagrams in parallel can keep
+    output in order. Outputs already produced in this session (watch mode)
+    are left untouched.
+    """
+    args = session.args
+    converter = session.converter
+    if profile is None:
+        profile = session.profiler.diagram('', idx, title)
+
+    # Inject style if specified
+    html_labels = not session.rasterize_locally
+    if args.style or not html_labels:
+        with profile.stage("style"):
+            code = converter.prepare(code, html_labels=html_labels)
+
+    hash_str = generate_diagram_hash(code)
+    multi_width = len(args.width) > 1
+    outputs = [
+        (fmt, width, os.path.join(output_dir, variant_filename(idx, hash_str, fmt, width, multi_width)))
+        for fmt, width in session.variants
+    ]
+
+    log = [f"\nConverting diagram {idx + 1}: {title}"]
+    log.extend(f"  Output: {path}" for _, _, path in outputs)
+
+    # Use style background if available, otherwise use args.background
+    background = converter.resolve_background()
+
+    pending = []
+    unchanged = 0
+    for fmt, width, path in outputs:
+        if session.rendered is not None and path in session.rendered and os.path.exists(path):
+            unchanged += 1
+            continue
+        if converter.cache is not None:
+            with profile.stage("cache"):
+                hit = converter.lookup(code, width, background, fmt, session.variant_version(fmt))
+            if hit is not None:
+                with profile.stage("write"):
+                    write_output(path, hit.data)
+                continue
+        pending.append((fmt, width, path))
+
+    paths = [path for _, _, path in outputs]
+    if not pending:
+        status = "unchanged" if unchanged == len(outputs) else "cached"
+        log.append("  Unchanged" if status == "unchanged" else "  Success (cached)")
+        profile.finish(status, paths)
+        return outputs, log
 
-    idx_counter = [0]
-    def replace_func(match):
-        current_idx = idx_counter[0]
-        idx_counter[0] += 1
+    try:
+        results = render_variants(code, pending, background, session, profile)
+    except RenderError as e:
+        log.append(f"Error: {e}")
+        log.append("  Failed")
+        profile.finish("failed", timed_out=isinstance(e, RenderTimeout))
+        return [], log
+
+    if session.optimize_colors is not None and any(fmt == 'png' for fmt, _, _, _ in results):
+        results, before, after = optimize_outputs(results, session, profile)
+        profile.bytes_saved = before - after
+        session.add_saved(before - after)
+        percent = (before - after) / before * 100 if before else 0
+        log.append(f"  Optimized: {format_size(before)} -> {format_size(after)} (saved {percent:.0f}%)")
+
+    for fmt, width, path, data in results:
+        with profile.stage("write"):
+            write_output(path, data)
+        if converter.cache is not None:
+            with profile.stage("cache"):
+                converter.cache.put(
+                    make_cache_key(code, width, background, fmt, session.variant_version(fmt)), fmt, data
+                )
+        if session.rendered is not None:
+            session.rendered.add(path)
+    log.append("  Success")
+    profile.finish("converted", paths)
+    return outputs, log
+
+
+def image_markup(index: int, outputs: List[Tuple[str, int, str]], picture: bool = False) -> str:
+    """
+    Markdown image link for the first output, or with `picture` a single-line
+    <picture> element offering the SVG and every PNG width via srcset.
+    """
+    alt_text = f"Diagram {index + 1}"
+    if not picture or len(outputs) == 1:
+        return f"![{alt_text}]({outputs[0][2]})"
+
+    svgs = [path for fmt, _, path in outputs if fmt == 'svg']
+    pngs = [(width, path) for fmt, width, path in outputs if fmt == 'png']
+
+    parts = ['<picture>']
+    if svgs and pngs:
+        parts.append(f'<source type="image/svg+xml" srcset="{html.escape(svgs[0])}">')
+    if pngs:
+        srcset = ', '.join(f"{html.escape(path)} {width}w" for width, path in pngs)
+        parts.append(f'<img src="{html.escape(pngs[0][1])}" srcset="{srcset}" alt="{alt_text}">')
+    else:
+        parts.append(f'<img src="{html.escape(svgs[0])}" alt="{alt_text}">')
+    parts.append('</picture>')
+    return ''.join(parts)
+
+
+def collect_markdown_files(inputs: List[str]) -> List[str]:
+    """Expand input files, directories and glob patterns into Markdown file paths."""
+    files = []
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = sorted(str(p) for p in Path(item).rglob('*.md'))
+        elif os.path.isfile(item):
+            matches = [item]
+        else:
+            matches = sorted(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+
+        for path in matches:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                files.append(path)
+
+    return files
+
+
+def get_common_base(files: List[str]) -> str:
+    """Deepest directory containing all input files; outputs mirror the tree below it."""
+    return os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in files])
+
+
+def check_diagram(block: MermaidBlock, session: ConversionSession) -> List[ValidationError]:
+    """Run the pre-render syntax checks on a block, styled the way render_diagram will style it."""
+    styled = session.converter.prepare(block.code, html_labels=not session.rasterize_locally)
+    return validate_diagram(block.code, block.line, styled)
+
+
+def invalid_result(block: MermaidBlock, errors: List[ValidationError], profile: DiagramProfile) -> Future:
+    """A finished future reporting a diagram rejected by validation, as render_diagram would."""
+    log = [f"\nConverting diagram {block.index + 1}: {block.title}"]
+    log.extend(f"Error: line {e.line}: {e.message}" for e in errors)
+    log.append("  Skipped (invalid syntax, left as a code block)")
+    profile.finish("invalid")
+
+    future = Future()
+    future.set_result(([], log))
+    return future
+
+
+def process_files(files: List[str], base_dir: str, session: ConversionSession) -> Tuple[int, int]:
+    """
+    Convert every diagram in `files` on the session's shared pool.
+    Every file is scanned and validated first; with --strict any syntax error
+    raises ValidationFailed before a single diagram is rendered. Valid
+    diagrams are then queued up front so small files don't leave workers
+    idle, and results are reported file by file in diagram order.
+    Returns (converted, total) diagram counts.
+    """
+    args = session.args
+    profiler = session.profiler
+
+    scanned = []
+    problems = []
+    for input_path in files:
+        unclosed = []
+        with profiler.span("extract", source=input_path), open(input_path, 'rb') as f:
+            blocks = list(scan_mermaid_blocks(f, unclosed))
+            source_stat = os.fstat(f.fileno())
+
+        errors = {}
+        if args.validate:
+            with profiler.span("validate", source=input_path):
+                for block in blocks:
+                    block_errors = check_diagram(block, session)
+                    if block_errors:
+                        errors[block.index] = block_errors
+                        problems.extend(f"{input_path}:{e.line}: {e.message}" for e in block_errors)
+        problems.extend(f"{input_path}:{line}: unclosed mermaid code fence" for line in unclosed)
+        scanned.append((input_path, blocks, source_stat, errors))
+
+    if problems:
+        print(f"\n{len(problems)} Mermaid syntax problem(s):")
+        for problem in problems:
+            print(f"  {problem}")
+        if args.strict:
+            raise ValidationFailed(problems)
+        print("Diagrams with problems are skipped (--no-validate renders them anyway).")
+
+    jobs = []
+    for input_path, blocks, source_stat, errors in scanned:
+        rel_dir = os.path.relpath(os.path.dirname(os.path.abspath(input_path)), base_dir)
+        output_dir = os.path.normpath(os.path.join(args.output_dir, rel_dir))
+        os.makedirs(output_dir, exist_ok=True)
+
+        futures = []
+        for block in blocks:
+            profile = profiler.diagram(input_path, block.index, block.title)
+            if block.index in errors:
+                # Rejected before the renderer (and its browser) is ever started
+                futures.append(invalid_result(block, errors[block.index], profile))
+            else:
+                futures.append(session.pool.submit(
+                    render_diagram, block.index, block.code, block.title, output_dir, session, profile
+                ))
+        jobs.append((input_path, blocks, source_stat, output_dir, futures))
+
+    converted = 0
+    total = 0
+    for input_path, blocks, source_stat, output_dir, futures in jobs:
+        if len(files) > 1:
+            print(f"\n=== {input_path}")
+
+        if not futures:
+            print("No Mermaid diagrams found.")
+            continue
+
+        print(f"Found {len(futures)} diagram(s)")
+
+        image_mapping = {}
+        for idx, future in enumerate(futures):
+            outputs, log = future.result()
+            print('\n'.join(log))
+            if outputs:
+                image_mapping[idx] = image_markup(idx, outputs, args.picture)
+
+        if args.replace and image_mapping:
+            output_md_path = os.path.join(
+                output_dir,
+                f"{os.path.splitext(os.path.basename(input_path))[0]}_converted.md"
+            )
+
+            with open(input_path, 'rb') as src:
+                current = os.fstat(src.fileno())
+                # Block offsets are only valid for the version of the file that was scanned
+                if (current.st_mtime, current.st_size) != (source_stat.st_mtime, source_stat.st_size):
+                    print(f"\nWarning: {input_path} changed during conversion, skipping rewrite")
+                else:
+                    with profiler.span("rewrite", source=input_path), open(output_md_path, 'wb') as dst:
+                        splice_images(src, dst, blocks, image_mapping, markup=True)
+                        profiler.add_bytes(dst.tell())
+                    print(f"\nConverted Markdown: {output_md_path}")
+
+        converted += len(image_mapping)
+        total += len(futures)
+
+    return converted, total
+
+
+def snapshot_files(files: List[str]) -> Dict[str, Tuple[float, int]]:
+    """Record (mtime, size) for each file so watch mode can detect changes."""
+    state = {}
+    for path in files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        state[path] = (stat.st_mtime, stat.st_size)
+    return state
+
+
+def parse_widths(value: str) -> List[int]:
+    """argparse type for --width: one or more comma-separated pixel widths."""
+    try:
+        widths = [int(w) for w in value.split(',') if w.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid width list: {value}")
+    if not widths or any(w <= 0 for w in widths):
+        raise argparse.ArgumentTypeError(f"invalid width list: {value}")
+    return list(dict.fromkeys(widths))
 
-        if current_idx in image_mapping:
-            image_path = image_mapping[current_idx]
-            alt_text = f"Diagram {current_idx + 1}"
-            return f"![{alt_text}]({image_path})"
-        return match.group(0)
 
-    return re.sub(pattern, replace_func, content, flags=re.DOTALL)
+def parse_formats(value: str) -> List[str]:
+    """argparse type for --format: one or more of png/svg, comma-separated."""
+    formats = [f.strip().lower() for f in value.split(',') if f.strip()]
+    if not formats or any(f not in FORMATS for f in formats):
+        raise argparse.ArgumentTypeError(f"invalid format list: {value} (choose from {', '.join(FORMATS)})")
+    return list(dict.fromkeys(formats))
 
 
-def main():
+def build_parser() -> argparse.ArgumentParser:
+    """Command-line options of convert.py (also used by benchmark.py)."""
     parser = argparse.ArgumentParser(description='Convert Mermaid to PNG with style themes')
-    parser.add_argument('input', help='Input Markdown file')
+    parser.add_argument('input', nargs='+', help='Input Markdown files, directories or glob patterns')
     parser.add_argument('-o', '--output-dir', default='./output', help='Output directory')
-    parser.add_argument('-w', '--width', type=int, default=1200, help='Image width')
+    parser.add_argument('-w', '--width', type=parse_widths, default=[1200], help='Image width, or comma-separated widths (e.g. 900,1800)')
     parser.add_argument('-b', '--background', default='white', help='Background color')
-    parser.add_argument('-f', '--format', default='png', choices=['png', 'svg'], help='Output format')
+    parser.add_argument('-f', '--format', type=parse_formats, default=['png'], help='Output format: png, svg, or both (e.g. png,svg)')
     parser.add_argument('--replace', action='store_true', help='Replace code blocks with images')
-    parser.add_argument('--style', choices=get_available_styles(), help='Apply a built-in style theme')
+    parser.add_argument('--strict', action='store_true', help='Abort before rendering anything if any diagram fails the syntax checks')
+    parser.add_argument('--no-validate', dest='validate', action='store_false', help='Skip the pre-render syntax checks')
+    parser.add_argument('--optimize', action='store_true', help='Losslessly recompress PNGs and strip metadata')
+    parser.add_argument('--quantize', type=int, metavar='COLORS', default=0, help='Also reduce PNGs to a palette of at most COLORS colours (2-256, lossy, needs Pillow)')
+    parser.add_argument('--picture', action='store_true', help='With --replace, emit <picture>/srcset markup referencing every output variant')
+    parser.add_argument('--style', help='Apply a style theme (built-in: dark-tech, fresh-business, hand-drawn, gradient-modern, or a theme file name)')
+    parser.add_argument('--theme-dir', action='append', default=[], help='Extra directory of JSON/YAML theme files (repeatable)')
     parser.add_argument('--chart-type', default='flowchart', choices=['flowchart', 'sequence', 'gantt', 'class', 'state'], help='Optimize for specific chart type')
+    parser.add_argument('--renderer', default='auto', choices=BACKENDS, help='Rendering backend: persistent worker, per-diagram npx, or auto')
+    parser.add_argument('--no-cache', action='store_true', help='Always re-render, bypassing the render cache')
+    parser.add_argument('--cache-dir', help='Render cache directory (default: ~/.cache/mermaid-to-png)')
+    parser.add_argument('--cache-max-size', type=int, default=DEFAULT_MAX_SIZE_MB, help='Render cache size limit in MB')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='Number of diagrams to render in parallel (default: CPU count)')
+    parser.add_argument('--watch', action='store_true', help='Keep running and re-convert Markdown files when they change')
+    parser.add_argument('--watch-interval', type=float, default=1.0, help='Seconds between change checks in watch mode')
+    parser.add_argument('--profile', metavar='REPORT_JSON', help='Write per-diagram stage timings and a run summary as JSON')
+    parser.add_argument('--trace', metavar='TRACE_JSON', help='Write stage timings in Chrome trace-event format')
+    return parser
 
-    args = parser.parse_args()
 
-    if not os.path.exists(args.input):
-        print(f"Error: File not found: {args.input}")
-        sys.exit(1)
+def main():
+    # `convert.py serve ...` runs the local render server instead
+    if sys.argv[1:2] == ['serve']:
+        serve(sys.argv[2:])
+        return
 
-    os.makedirs(args.output_dir, exist_ok=True)
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.quantize and not 2 <= args.quantize <= 256:
+        parser.error("--quantize must be between 2 and 256")
 
-    with open(args.input, 'r', encoding='utf-8') as f:
-        content = f.read()
+    for theme_dir in args.theme_dir:
+        add_theme_dir(theme_dir)
 
-    diagrams = extract_mermaid_diagrams(content)
+    if args.style and get_style_config(args.style) is None:
+        parser.error(f"unknown style '{args.style}' (available: {', '.join(get_available_styles())})")
 
-    if not diagrams:
-        print("No Mermaid diagrams found.")
-        sys.exit(0)
+    files = collect_markdown_files(args.input)
+    if not files:
+        print(f"Error: No Markdown files found: {' '.join(args.input)}")
+        sys.exit(1)
 
-    print(f"Found {len(diagrams)} diagram(s)")
+    os.makedirs(args.output_dir, exist_ok=True)
 
     # Get style info for display
     if args.style:
@@ -144,53 +571,98 @@ def main():
         if style_info:
             print(f"Using style: {style_info['name']} - {style_info['description']}")
 
-    image_mapping = {}
-    for idx, (code, title, _) in enumerate(diagrams):
-        # Inject style if specified
-        if args.style:
-            code = inject_style_into_diagram(code, args.style, args.chart_type)
-
-        hash_str = generate_diagram_hash(code)
-        filename = f"diagram_{idx + 1}_{hash_str}.{args.format}"
-        output_path = os.path.join(args.output_dir, filename)
-
-        print(f"\nConverting diagram {idx + 1}: {title}")
-        print(f"  Output: {output_path}")
-
-        # Use style background if available, otherwise use args.background
-        background = args.background
-        if args.style:
-            from styles import STYLES
-            background = STYLES.get(args.style, {}).get("background", args.background)
-
-        success = convert_mermaid_to_image(
-            code=code,
-            output_path=output_path,
-            width=args.width,
-            background=background,
-            fmt=args.format
-        )
+    cache = open_cache(args.cache_dir, args.cache_max_size, enabled=not args.no_cache)
+    rendered = set() if args.watch else None
+    profiler = Profiler(enabled=bool(args.profile or args.trace))
+
+    # More than one output per diagram: lay out once, rasterize PNGs in a process pool
+    multi_output = len(args.width) * ('png' in args.format) + ('svg' in args.format) > 1
+    if multi_output and not HAS_CAIROSVG:
+        print("Warning: cairosvg not installed, rendering each output variant separately (pip install cairosvg)")
+    if args.quantize and not HAS_PIL:
+        print("Warning: Pillow not installed, skipping palette quantization (pip install Pillow)")
+
+    process_pool = None
+    if (multi_output and HAS_CAIROSVG) or args.optimize or args.quantize:
+        process_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+
+    # The renderer is started on the first cache miss, so fully cached runs never start Node.
+    # Diagrams were already validated per file, so the converter doesn't check them again.
+    converter = MermaidConverter(
+        style=args.style,
+        chart_type=args.chart_type,
+        background=args.background,
+        renderer=args.renderer,
+        cache=cache,
+        validate=False,
+        jobs=args.jobs
+    )
+    with converter:
+        session = ConversionSession(args, converter, process_pool, rendered, profiler)
+        try:
+            run_session(files, session)
+        finally:
+            if process_pool is not None:
+                process_pool.shutdown()
+
+
+def run_session(files: List[str], session: ConversionSession) -> None:
+    """Convert `files` once, then keep re-converting changes in watch mode."""
+    args = session.args
+    cache = session.converter.cache
+    profiler = session.profiler
 
-        if success:
-            image_mapping[idx] = output_path
-            print(f"  Success")
-        else:
-            print(f"  Failed")
+    try:
+        converted, total = process_files(files, get_common_base(files), session)
+    except ValidationFailed as e:
+        print(f"\nAborted (--strict): {len(e.problems)} syntax problem(s), nothing rendered.")
+        if not args.watch:
+            sys.exit(1)
+        converted, total = 0, 0
 
-    if args.replace and image_mapping:
-        output_md_path = os.path.join(
-            args.output_dir,
-            f"{os.path.splitext(os.path.basename(args.input))[0]}_converted.md"
-        )
+    if cache:
+        cache.evict()
+        print(f"\nCache: {cache.hits} hit(s), {cache.misses} miss(es)")
 
-        new_content = replace_mermaid_with_images(content, image_mapping)
+    if session.optimize_colors is not None:
+        print(f"\nOptimized PNGs: saved {format_size(session.bytes_saved)}")
 
-        with open(output_md_path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
+    print(f"\nDone! {converted}/{total} diagrams converted.")
 
-        print(f"\nConverted Markdown: {output_md_path}")
+    if profiler.enabled:
+        renderer = session.converter.renderer
+        if renderer.startup:
+            profiler.add_span("renderer_startup", *renderer.startup, backend=args.renderer)
+        profiler.write(args.profile, args.trace)
 
-    print(f"\nDone! {len(image_mapping)}/{len(diagrams)} diagrams converted.")
+    if not args.watch:
+        return
+
+    print(f"\nWatching {len(files)} file(s) for changes (Ctrl+C to stop)...")
+    state = snapshot_files(files)
+    try:
+        while True:
+            time.sleep(args.watch_interval)
+            files = collect_markdown_files(args.input)
+            current = snapshot_files(files)
+            changed = [p for p in files if p in current and current[p] != state.get(p)]
+            state = current
+            if not changed or not files:
+                continue
+
+            print(f"\nChanged: {', '.join(changed)}")
+            try:
+                converted, total = process_files(changed, get_common_base(files), session)
+            except ValidationFailed as e:
+                print(f"\nAborted (--strict): {len(e.problems)} syntax problem(s), nothing rendered.")
+                continue
+            if cache:
+                cache.evict()
+            print(f"\nUpdated {len(changed)} file(s): {converted}/{total} diagrams converted.")
+            if profiler.enabled:
+                profiler.write(args.profile, args.trace)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
 
 
 if __name__ == '__main__':
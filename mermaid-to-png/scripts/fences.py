@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Mermaid Fence Scanner
+Find Mermaid code blocks in Markdown by streaming over the file, and splice
+image links in their place. Used by convert.py and the render server.
+"""
+
+import io
+import re
+import shutil
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Tuple
+
+# Opening code fence: up to 3 spaces of indent, 3+ backticks or tildes, info string
+FENCE_OPEN_RE = re.compile(rb'^( {0,3})(`{3,}|~{3,})(.*)$')
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class MermaidBlock(NamedTuple):
+    """A Mermaid code block and its byte span in the source document."""
+    code: str
+    title: str
+    index: int
+    start: int  # offset of the opening fence (after indentation)
+    end: int    # offset just past the closing fence, before the line break
+    line: int   # 1-based line number of the first line of `code`
+
+
+def scan_mermaid_blocks(stream: BinaryIO, unclosed: Optional[List[int]] = None) -> Iterator[MermaidBlock]:
+    """
+    Find Mermaid fenced code blocks in one streaming pass over a binary file.
+
+    Follows CommonMark fence rules: ``` or ~~~ fences indented up to 3 spaces,
+    closed by a fence of the same character at least as long. The info string's
+    first word must be `mermaid` (e.g. `mermaid title="x"`). LF and CRLF line
+    endings are supported. Only Mermaid block bodies are held in memory;
+    unclosed blocks are skipped, and the line numbers of unclosed Mermaid
+    fences are appended to `unclosed` when given.
+    """
+    offset = 0
+    index = 0
+    line_no = 0
+    fence = None  # (char, length, indent, is_mermaid, start, open_line, lines)
+
+    for raw in stream:
+        line_start = offset
+        offset += len(raw)
+        line_no += 1
+        line = raw[:-1] if raw.endswith(b'\n') else raw
+        if line.endswith(b'\r'):
+            line = line[:-1]
+
+        if fence is None:
+            match = FENCE_OPEN_RE.match(line)
+            if not match:
+                continue
+            indent, marker, info = match.groups()
+            # Backtick fences may not have backticks in their info string
+            if marker[:1] == b'`' and b'`' in info:
+                continue
+            words = info.split()
+            is_mermaid = bool(words) and words[0] == b'mermaid'
+            fence = (marker[:1], len(marker), len(indent), is_mermaid, line_start + len(indent), line_no, [])
+            continue
+
+        char, length, indent, is_mermaid, start, open_line, lines = fence
+        stripped = line.lstrip(b' ')
+        body = stripped.rstrip(b' \t')
+        if len(line) - len(stripped) <= 3 and len(body) >= length and body == char * len(body):
+            if is_mermaid:
+                code = b'\n'.join(lines).decode('utf-8').strip()
+                title = code.split('\n')[0] if code else f"diagram_{index}"
+                end = line_start + len(line) - (len(stripped) - len(body))
+                # `code` is stripped, so skip leading blank lines when numbering
+                blank = next((i for i, l in enumerate(lines) if l.strip()), 0)
+                yield MermaidBlock(code, title, index, start, end, open_line + 1 + blank)
+                index += 1
+            fence = None
+        elif is_mermaid:
+            # Content lines lose up to as much indentation as the opening fence had
+            content = line.lstrip(b' ')
+            removed = min(len(line) - len(content), indent)
+            lines.append(line[removed:])
+
+    if fence is not None and fence[3] and unclosed is not None:
+        unclosed.append(fence[5])
+
+
+def extract_mermaid_diagrams(content: str) -> List[Tuple[str, str, int]]:
+    """Extract Mermaid diagrams from Markdown content."""
+    return [
+        (block.code, block.title, block.index)
+        for block in scan_mermaid_blocks(io.BytesIO(content.encode('utf-8')))
+    ]
+
+
+def splice_images(
+    src: BinaryIO,
+    dst: BinaryIO,
+    blocks: List[MermaidBlock],
+    image_mapping: dict,
+    markup: bool = False
+) -> None:
+    """
+    Copy `src` to `dst`, replacing converted Mermaid blocks with image links.
+    Works on the byte spans from scan_mermaid_blocks, copying in chunks.
+    With `markup`, image_mapping values are complete replacement strings
+    instead of image paths.
+    """
+    pos = 0
+    for block in blocks:
+        if block.index not in image_mapping:
+            continue
+
+        remaining = block.start - pos
+        while remaining > 0:
+            chunk = src.read(min(COPY_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            dst.write(chunk)
+            remaining -= len(chunk)
+
+        if markup:
+            replacement = image_mapping[block.index]
+        else:
+            replacement = f"![Diagram {block.index + 1}]({image_mapping[block.index]})"
+        dst.write(replacement.encode('utf-8'))
+
+        src.seek(block.end)
+        pos = block.end
+
+    shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+def replace_mermaid_with_images(content: str, image_mapping: dict) -> str:
+    """Replace Mermaid code blocks with image references."""
+    data = content.encode('utf-8')
+    blocks = list(scan_mermaid_blocks(io.BytesIO(data)))
+    output = io.BytesIO()
+    splice_images(io.BytesIO(data), output, blocks, image_mapping)
+    return output.getvalue().decode('utf-8')
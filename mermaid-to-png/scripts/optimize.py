@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+PNG Optimization
+Shrink rendered PNGs before they are written: strip metadata chunks,
+recompress image data at the highest zlib level and, optionally, quantize to
+a palette (needs Pillow). Runs in worker processes.
+"""
+
+import io
+import struct
+import zlib
+from typing import List, Tuple
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Text, timestamp and EXIF chunks; colour management (iCCP, sRGB, gAMA, cHRM) and pHYs are kept
+METADATA_CHUNKS = {b'tEXt', b'zTXt', b'iTXt', b'tIME', b'eXIf'}
+
+ZLIB_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED)
+
+
+def read_chunks(data: bytes) -> List[Tuple[bytes, bytes]]:
+    """Split PNG data into (type, body) chunks. Raises ValueError if it isn't a PNG."""
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+
+    chunks = []
+    pos = len(PNG_SIGNATURE)
+    while pos < len(data):
+        if pos + 8 > len(data):
+            raise ValueError("truncated PNG chunk header")
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        if len(body) != length:
+            raise ValueError("truncated PNG chunk")
+        chunks.append((chunk_type, body))
+        pos += 12 + length
+        if chunk_type == b'IEND':
+            break
+    return chunks
+
+
+def write_chunk(out: io.BytesIO, chunk_type: bytes, body: bytes) -> None:
+    out.write(struct.pack('>I', len(body)))
+    out.write(chunk_type)
+    out.write(body)
+    out.write(struct.pack('>I', zlib.crc32(chunk_type + body) & 0xffffffff))
+
+
+def recompress(data: bytes) -> bytes:
+    """
+    Losslessly rebuild a PNG: drop metadata chunks and deflate the image data
+    again at level 9, keeping whichever zlib strategy gives the smallest result.
+    """
+    chunks = read_chunks(data)
+    idat = b''.join(body for chunk_type, body in chunks if chunk_type == b'IDAT')
+    raw = zlib.decompress(idat)
+
+    best = idat
+    for strategy in ZLIB_STRATEGIES:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        candidate = compressor.compress(raw) + compressor.flush()
+        if len(candidate) < len(best):
+            best = candidate
+
+    out = io.BytesIO()
+    out.write(PNG_SIGNATURE)
+    wrote_idat = False
+    for chunk_type, body in chunks:
+        if chunk_type in METADATA_CHUNKS:
+            continue
+        if chunk_type == b'IDAT':
+            # All IDAT chunks are consecutive; write the merged stream once
+            if not wrote_idat:
+                write_chunk(out, b'IDAT', best)
+                wrote_idat = True
+            continue
+        write_chunk(out, chunk_type, body)
+    return out.getvalue()
+
+
+def quantize(data: bytes, colors: int) -> bytes:
+    """Reduce a PNG to a palette of at most `colors` colours without dithering (needs Pillow)."""
+    image = Image.open(io.BytesIO(data))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    # Fast octree is the quantizer that keeps alpha
+    method = Image.Quantize.FASTOCTREE if hasattr(Image, 'Quantize') else Image.FASTOCTREE
+    dither = Image.Dither.NONE if hasattr(Image, 'Dither') else Image.NONE
+    paletted = image.quantize(colors=colors, method=method, dither=dither)
+
+    out = io.BytesIO()
+    paletted.save(out, format='PNG', optimize=True)
+    return out.getvalue()
+
+
+def optimize_png(data: bytes, colors: int = 0) -> bytes:
+    """
+    Smallest of the original PNG and its optimized versions.
+    With `colors` (2-256) the image is also palette-quantized, which is lossy.
+    Data that isn't a valid PNG is returned unchanged.
+    """
+    best = data
+    try:
+        candidates = [recompress(data)]
+        if colors and HAS_PIL:
+            candidates.append(recompress(quantize(data, colors)))
+    except (ValueError, zlib.error, OSError):
+        return data
+
+    for candidate in candidates:
+        if len(candidate) < len(best):
+            best = candidate
+    return best
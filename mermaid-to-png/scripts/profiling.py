@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Mermaid Conversion Profiling
+Per-diagram stage timings and run reports for mermaid-to-png (--profile/--trace).
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+SLOWEST_COUNT = 10
+
+
+class DiagramProfile:
+    """Stage timings and outcome for one diagram."""
+
+    def __init__(self, profiler: 'Profiler', source: str, index: int, title: str):
+        self.profiler = profiler
+        self.source = source
+        self.index = index
+        self.title = title
+        self.stages: Dict[str, float] = {}
+        self.status = "pending"
+        self.timed_out = False
+        self.bytes = 0
+        self.bytes_saved = 0
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a pipeline stage for this diagram."""
+        with self.profiler.span(name, source=self.source, diagram=self.index + 1) as elapsed:
+            yield
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed[0]
+
+    def finish(self, status: str, output_paths: Sequence[str] = (), timed_out: bool = False) -> None:
+        self.status = status
+        self.timed_out = timed_out
+        if status in ("converted", "cached"):
+            for path in output_paths:
+                try:
+                    self.bytes += os.path.getsize(path)
+                except OSError:
+                    pass
+            self.profiler.add_bytes(self.bytes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'source': self.source,
+            'diagram': self.index + 1,
+            'title': self.title,
+            'status': self.status,
+            'timed_out': self.timed_out,
+            'bytes': self.bytes,
+            'bytes_saved': self.bytes_saved,
+            'seconds': sum(self.stages.values()),
+            'stages': self.stages
+        }
+
+
+class Profiler:
+    """
+    Collects timed spans from any thread.
+    When disabled, spans and diagram records are still handed out but nothing
+    is kept, so call sites don't need to check.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.bytes_written = 0
+        self._events: List[Dict[str, Any]] = []
+        self._diagrams: List[DiagramProfile] = []
+        self._lock = threading.Lock()
+        self._threads: Dict[int, int] = {}
+
+    def _thread_id(self) -> int:
+        ident = threading.get_ident()
+        if ident not in self._threads:
+            self._threads[ident] = len(self._threads) + 1
+        return self._threads[ident]
+
+    def add_span(self, name: str, start: float, duration: float, **meta: Any) -> None:
+        """Record a span measured elsewhere with time.perf_counter()."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._events.append({
+                'name': name,
+                'start': start - self.started,
+                'duration': duration,
+                'thread': self._thread_id(),
+                'args': meta
+            })
+
+    @contextmanager
+    def span(self, name: str, **meta: Any) -> Iterator[List[float]]:
+        """Time a block; yields a one-item list that holds the duration afterwards."""
+        elapsed = [0.0]
+        start = time.perf_counter()
+        try:
+            yield elapsed
+        finally:
+            elapsed[0] = time.perf_counter() - start
+            self.add_span(name, start, elapsed[0], **meta)
+
+    def diagram(self, source: str, index: int, title: str) -> DiagramProfile:
+        record = DiagramProfile(self, source, index, title)
+        if self.enabled:
+            with self._lock:
+                self._diagrams.append(record)
+        return record
+
+    def add_bytes(self, count: int) -> None:
+        if self.enabled:
+            with self._lock:
+                self.bytes_written += count
+
+    def report(self) -> Dict[str, Any]:
+        """Run summary plus every diagram's stage timings."""
+        with self._lock:
+            diagrams = [d.to_dict() for d in self._diagrams]
+            events = list(self._events)
+
+        stage_seconds: Dict[str, float] = {}
+        for event in events:
+            stage_seconds[event['name']] = stage_seconds.get(event['name'], 0.0) + event['duration']
+
+        statuses: Dict[str, int] = {}
+        for d in diagrams:
+            statuses[d['status']] = statuses.get(d['status'], 0) + 1
+
+        return {
+            'total_seconds': time.perf_counter() - self.started,
+            'diagrams': len(diagrams),
+            'statuses': statuses,
+            'bytes_written': self.bytes_written,
+            'bytes_saved': sum(d['bytes_saved'] for d in diagrams),
+            'stage_seconds': stage_seconds,
+            'timeouts': [
+                {'source': d['source'], 'diagram': d['diagram'], 'title': d['title']}
+                for d in diagrams if d['timed_out']
+            ],
+            'slowest': sorted(diagrams, key=lambda d: d['seconds'], reverse=True)[:SLOWEST_COUNT],
+            'per_diagram': diagrams
+        }
+
+    def trace_events(self) -> Dict[str, Any]:
+        """Spans in Chrome trace-event format (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+        return {
+            'traceEvents': [
+                {
+                    'name': event['name'],
+                    'cat': 'mermaid-to-png',
+                    'ph': 'X',
+                    'ts': event['start'] * 1e6,
+                    'dur': event['duration'] * 1e6,
+                    'pid': pid,
+                    'tid': event['thread'],
+                    'args': event['args']
+                }
+                for event in events
+            ],
+            'displayTimeUnit': 'ms'
+        }
+
+    def write(self, report_path: Optional[str] = None, trace_path: Optional[str] = None) -> None:
+        """Write the JSON run report and/or Chrome trace."""
+        if report_path:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(self.report(), f, indent=2, ensure_ascii=False)
+            print(f"Profile report: {report_path}")
+        if trace_path:
+            with open(trace_path, 'w', encoding='utf-8') as f:
+                json.dump(self.trace_events(), f, ensure_ascii=False)
+            print(f"Trace: {trace_path}")
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+SVG Rasterization
+Turn one rendered SVG into PNG variants locally, without another Mermaid layout.
+"""
+
+try:
+    import cairosvg
+    HAS_CAIROSVG = True
+except ImportError:
+    HAS_CAIROSVG = False
+
+
+def rasterize_svg(svg_data: bytes, width: int, background: str = "white") -> bytes:
+    """
+    Rasterize SVG data to a PNG `width` pixels wide.
+    Runs in worker processes; returns the PNG data.
+    """
+    if not HAS_CAIROSVG:
+        raise RuntimeError("cairosvg is required for local rasterization (pip install cairosvg)")
+
+    return cairosvg.svg2png(
+        bytestring=svg_data,
+        output_width=width,
+        background_color=background
+    )
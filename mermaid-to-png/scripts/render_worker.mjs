@@ -0,0 +1,93 @@
+#!/usr/bin/env node
+// Long-lived mermaid-cli worker for mermaid-to-png.
+//
+// Usage: node render_worker.mjs <mermaid-cli package dir> [timeout ms]
+//
+// Launches one headless browser, then reads one JSON request per line on
+// stdin ({id, code, format, width, background}) and answers each with one
+// JSON line on stdout ({id, ok, data | error, timeout}); data is base64-encoded.
+// Requests are handled concurrently, so answers may arrive out of order.
+
+import { createRequire } from 'node:module';
+import { createInterface } from 'node:readline';
+import fs from 'node:fs';
+import path from 'node:path';
+import { pathToFileURL } from 'node:url';
+
+const cliRoot = process.argv[2];
+const timeoutMs = Number(process.argv[3] || 60000);
+
+function send(message) {
+  process.stdout.write(JSON.stringify(message) + '\n');
+}
+
+class TimeoutError extends Error {}
+
+function withTimeout(promise, ms) {
+  let timer;
+  const timeout = new Promise((_, reject) => {
+    timer = setTimeout(() => reject(new TimeoutError('Conversion timed out')), ms);
+  });
+  return Promise.race([promise, timeout]).finally(() => clearTimeout(timer));
+}
+
+let browser;
+let renderMermaid;
+let version;
+
+try {
+  const pkg = JSON.parse(fs.readFileSync(path.join(cliRoot, 'package.json'), 'utf8'));
+  version = pkg.version;
+  const require = createRequire(path.join(cliRoot, 'package.json'));
+  const puppeteer = require('puppeteer');
+  ({ renderMermaid } = await import(pathToFileURL(path.join(cliRoot, 'src', 'index.js')).href));
+  browser = await puppeteer.launch({ headless: true });
+} catch (err) {
+  send({ ready: false, error: String(err && err.message || err) });
+  process.exit(1);
+}
+
+send({ ready: true, version });
+
+const inflight = new Set();
+
+async function handle(line) {
+  let request;
+  try {
+    request = JSON.parse(line);
+  } catch {
+    return;
+  }
+
+  try {
+    const { data } = await withTimeout(
+      renderMermaid(browser, request.code, request.format, {
+        viewport: { width: request.width, height: 600, deviceScaleFactor: 1 },
+        backgroundColor: request.background,
+      }),
+      timeoutMs,
+    );
+    send({ id: request.id, ok: true, data: Buffer.from(data).toString('base64') });
+  } catch (err) {
+    send({
+      id: request.id,
+      ok: false,
+      timeout: err instanceof TimeoutError,
+      error: String(err && err.message || err),
+    });
+  }
+}
+
+const rl = createInterface({ input: process.stdin, crlfDelay: Infinity });
+
+rl.on('line', (line) => {
+  const task = handle(line);
+  inflight.add(task);
+  task.finally(() => inflight.delete(task));
+});
+
+rl.on('close', async () => {
+  await Promise.allSettled([...inflight]);
+  await browser.close();
+  process.exit(0);
+});
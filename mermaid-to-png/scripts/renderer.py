@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Mermaid Renderer Backends
+Rendering backends for mermaid-to-png: a long-lived mermaid-cli worker and
+the per-diagram npx fallback.
+"""
+
+import base64
+import functools
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+WORKER_SCRIPT = Path(__file__).with_name('render_worker.mjs')
+RENDER_TIMEOUT = 60
+STARTUP_TIMEOUT = 120
+
+BACKENDS = ['auto', 'persistent', 'cli']
+
+
+class RenderError(Exception):
+    """Raised when a diagram cannot be rendered."""
+
+
+class RenderTimeout(RenderError):
+    """Raised when rendering a diagram exceeds its time limit."""
+
+
+class Renderer:
+    """Base class for Mermaid rendering backends."""
+
+    name = "base"
+    version = "unknown"
+
+    def render_bytes(
+        self,
+        code: str,
+        width: int = 1200,
+        background: str = "white",
+        fmt: str = "png"
+    ) -> bytes:
+        """Render `code` and return the image data. Raises RenderError on failure."""
+        raise NotImplementedError
+
+    def render(
+        self,
+        code: str,
+        output_path: str,
+        width: int = 1200,
+        background: str = "white",
+        fmt: str = "png"
+    ) -> None:
+        """Render `code` to `output_path`. Raises RenderError on failure."""
+        data = self.render_bytes(code, width, background, fmt)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+
+    def start(self) -> None:
+        """Start the backend ahead of the first render (no-op unless overridden)."""
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CliRenderer(Renderer):
+    """
+    Render each diagram with its own `npx @mermaid-js/mermaid-cli` process.
+    The diagram is piped to stdin and the image read back from stdout.
+    """
+
+    name = "cli"
+
+    def render_bytes(
+        self,
+        code: str,
+        width: int = 1200,
+        background: str = "white",
+        fmt: str = "png"
+    ) -> bytes:
+        cmd = [
+            'npx', '@mermaid-js/mermaid-cli',
+            '-i', '-',
+            '-o', '-',
+            '-e', fmt,
+            '-b', background,
+            '-w', str(width),
+            '-q'
+        ]
+
+        try:
+            result = subprocess.run(
+                cmd,
+                input=code.encode('utf-8'),
+                capture_output=True,
+                timeout=RENDER_TIMEOUT
+            )
+        except subprocess.TimeoutExpired:
+            raise RenderTimeout("Conversion timed out")
+        except FileNotFoundError:
+            raise RenderError("mermaid-cli not found\nInstall with: npm install -g @mermaid-js/mermaid-cli")
+
+        if result.returncode != 0:
+            raise RenderError(result.stderr.decode('utf-8', errors='replace'))
+        return result.stdout
+
+
+@functools.lru_cache(maxsize=None)
+def find_mermaid_cli() -> Optional[Path]:
+    """Locate an installed @mermaid-js/mermaid-cli package directory."""
+    env_root = os.environ.get('MERMAID_CLI_ROOT')
+    if env_root:
+        root = Path(env_root)
+        return root if (root / 'package.json').exists() else None
+
+    # The mmdc launcher links into the package, so no Node process is needed
+    mmdc = shutil.which('mmdc')
+    if mmdc:
+        for parent in Path(os.path.realpath(mmdc)).parents:
+            if parent.name == 'mermaid-cli' and (parent / 'package.json').exists():
+                return parent
+
+    try:
+        result = subprocess.run(
+            ['npm', 'root', '-g'],
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return None
+
+    if result.returncode != 0:
+        return None
+
+    root = Path(result.stdout.strip()) / '@mermaid-js' / 'mermaid-cli'
+    return root if (root / 'package.json').exists() else None
+
+
+def renderer_version() -> str:
+    """
+    Identify the installed mermaid-cli without starting Node.
+    Used to key cached renders so a mermaid-cli upgrade invalidates them.
+    """
+    cli_root = find_mermaid_cli()
+    if cli_root is None:
+        return "mermaid-cli@npx"
+    try:
+        with open(cli_root / 'package.json', 'r', encoding='utf-8') as f:
+            return f"mermaid-cli@{json.load(f).get('version', 'unknown')}"
+    except (OSError, json.JSONDecodeError):
+        return "mermaid-cli@unknown"
+
+
+class PersistentRenderer(Renderer):
+    """
+    Render diagrams through one long-lived Node worker.
+
+    The worker (render_worker.mjs) imports mermaid-cli, launches a single
+    headless Chromium and then answers newline-delimited JSON requests on
+    stdin/stdout, so Node and browser startup is paid once per run.
+    """
+
+    name = "persistent"
+
+    def __init__(self, cli_root: Path, timeout: int = RENDER_TIMEOUT):
+        self.cli_root = cli_root
+        self.timeout = timeout
+        self._proc: Optional[subprocess.Popen] = None
+        self._ready: Future = Future()
+        self._pending: Dict[int, Future] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._start()
+
+    def _start(self) -> None:
+        self._ready = Future()
+        self._proc = subprocess.Popen(
+            ['node', str(WORKER_SCRIPT), str(self.cli_root), str(self.timeout * 1000)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            bufsize=1
+        )
+        threading.Thread(target=self._read_responses, args=(self._proc,), daemon=True).start()
+
+        try:
+            hello = self._ready.result(timeout=STARTUP_TIMEOUT)
+        except FutureTimeoutError:
+            self.close()
+            raise RuntimeError("mermaid-cli worker did not start in time")
+
+        if not hello.get('ready'):
+            self.close()
+            raise RuntimeError(hello.get('error', 'mermaid-cli worker failed to start'))
+
+        self.version = hello.get('version', 'unknown')
+
+    def _read_responses(self, proc: subprocess.Popen) -> None:
+        for line in proc.stdout:
+            try:
+                message = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+            if 'id' not in message:
+                if not self._ready.done():
+                    self._ready.set_result(message)
+                continue
+
+            with self._lock:
+                future = self._pending.pop(message['id'], None)
+            if future is not None:
+                future.set_result(message)
+
+        # Worker exited: fail everything still waiting on it
+        if not self._ready.done():
+            self._ready.set_result({'ready': False, 'error': 'mermaid-cli worker exited'})
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_result({'ok': False, 'error': 'mermaid-cli worker exited'})
+
+    def render_bytes(
+        self,
+        code: str,
+        width: int = 1200,
+        background: str = "white",
+        fmt: str = "png"
+    ) -> bytes:
+        request_id = next(self._ids)
+        future: Future = Future()
+        request = json.dumps({
+            'id': request_id,
+            'code': code,
+            'format': fmt,
+            'width': width,
+            'background': background
+        }, ensure_ascii=False)
+
+        with self._write_lock:
+            proc = self._proc
+            if proc is None or proc.poll() is not None:
+                raise RenderError("mermaid-cli worker is not running")
+            with self._lock:
+                self._pending[request_id] = future
+            try:
+                proc.stdin.write(request + '\n')
+                proc.stdin.flush()
+            except (BrokenPipeError, OSError):
+                with self._lock:
+                    self._pending.pop(request_id, None)
+                raise RenderError("mermaid-cli worker is not running")
+
+        try:
+            # The worker enforces its own per-diagram timeout; this is a backstop
+            response = future.result(timeout=self.timeout + 10)
+        except FutureTimeoutError:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise RenderTimeout("Conversion timed out")
+
+        if not response.get('ok'):
+            if response.get('timeout'):
+                raise RenderTimeout(response.get('error', 'Conversion timed out'))
+            raise RenderError(response.get('error', 'unknown error'))
+
+        return base64.b64decode(response['data'])
+
+    def close(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+            proc.wait()
+
+
+def create_renderer(backend: str = "auto") -> Renderer:
+    """
+    Create a renderer for the requested backend.
+    'auto' uses the persistent worker when mermaid-cli is installed locally
+    and falls back to per-diagram npx otherwise.
+    """
+    if backend == "cli":
+        return CliRenderer()
+
+    cli_root = find_mermaid_cli()
+    if cli_root is not None:
+        try:
+            return PersistentRenderer(cli_root)
+        except (OSError, RuntimeError) as e:
+            if backend == "persistent":
+                raise
+            print(f"Warning: persistent renderer unavailable ({e}), falling back to npx")
+    elif backend == "persistent":
+        raise RuntimeError("mermaid-cli not found (install with: npm install -g @mermaid-js/mermaid-cli)")
+
+    return CliRenderer()
+
+
+class LazyRenderer(Renderer):
+    """
+    Create the real backend on first use.
+    Safe to share between threads; lets fully cached runs skip starting Node.
+    `factory` replaces create_renderer(backend), e.g. for a stub backend.
+    """
+
+    def __init__(self, backend: str = "auto", factory: Optional[Callable[[], Renderer]] = None):
+        self.backend = backend
+        self.factory = factory
+        self.startup: Optional[Tuple[float, float]] = None  # (perf_counter start, seconds)
+        self._renderer: Optional[Renderer] = None
+        self._error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _get(self) -> Renderer:
+        with self._lock:
+            if self._renderer is None and self._error is None:
+                start = time.perf_counter()
+                try:
+                    self._renderer = self.factory() if self.factory else create_renderer(self.backend)
+                except RuntimeError as e:
+                    self._error = str(e)
+                self.startup = (start, time.perf_counter() - start)
+            if self._error is not None:
+                raise RenderError(self._error)
+            return self._renderer
+
+    def start(self) -> None:
+        """Start the backend now rather than on the first render. Raises RenderError."""
+        self._get()
+
+    def render_bytes(
+        self,
+        code: str,
+        width: int = 1200,
+        background: str = "white",
+        fmt: str = "png"
+    ) -> bytes:
+        return self._get().render_bytes(code, width, background, fmt)
+
+    def close(self) -> None:
+        with self._lock:
+            renderer, self._renderer = self._renderer, None
+        if renderer is not None:
+            renderer.close()
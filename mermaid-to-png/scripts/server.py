@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Mermaid Render Server
+Serve diagram renders over local HTTP (TCP or a Unix socket) with warm
+renderer workers behind a bounded queue. Identical requests in flight at the
+same time are rendered once.
+
+Usage:
+    python3 convert.py serve --port 8765
+    python3 convert.py serve --socket /tmp/mermaid.sock --jobs 4 --queue-size 64
+
+Endpoints:
+    POST /render   {"code": "...", "style", "chart_type", "width", "background", "format"}
+                   -> image bytes (X-Mermaid-Cached / X-Render-Seconds headers)
+    POST /render   {"markdown": "...", ...same options}
+                   -> JSON list of diagrams with base64 data or errors
+    GET  /metrics  queue depth, in-flight renders, counters, latency percentiles
+    GET  /styles   available style themes
+    GET  /healthz
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import queue
+import signal
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from api import MermaidConverter, RenderedDiagram
+from cache import DEFAULT_MAX_SIZE_MB, make_cache_key, open_cache
+from fences import scan_mermaid_blocks
+from renderer import BACKENDS, RENDER_TIMEOUT, RenderError, RenderTimeout
+from styles import add_theme_dir, get_available_styles, get_style_config, get_style_info
+from validate import validate_diagram
+
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE_SIZE = 64
+MAX_BODY_BYTES = 5 * 1024 * 1024
+LATENCY_SAMPLES = 1000
+EVICT_INTERVAL = 60  # seconds between render cache size checks
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+CHART_TYPES = ['flowchart', 'sequence', 'gantt', 'class', 'state']
+
+
+class QueueFull(Exception):
+    """Raised when the render queue has no room; answered with 503."""
+
+
+class BadRequest(Exception):
+    """Raised for invalid request bodies; answered with 400."""
+
+    def __init__(self, message: str, errors: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.errors = errors
+
+
+class RenderJob(NamedTuple):
+    key: str
+    source: str
+    width: int
+    background: str
+    fmt: str
+    future: Future
+    queued_at: float
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99 in milliseconds."""
+    if not samples:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    ordered = sorted(samples)
+
+    def pick(pct: float) -> float:
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] * 1000
+
+    return {'p50_ms': pick(50), 'p95_ms': pick(95), 'p99_ms': pick(99)}
+
+
+class RenderService:
+    """
+    Bounded render queue in front of a MermaidConverter.
+
+    `jobs` worker threads take renders off a queue of at most `queue_size`
+    entries; when it is full new renders are rejected instead of piling up.
+    Requests for a render that is already queued or running share its result.
+    """
+
+    def __init__(self, converter: MermaidConverter, jobs: int, queue_size: int, timeout: float):
+        self.converter = converter
+        self.jobs = jobs
+        self.timeout = timeout
+        self._queue: 'queue.Queue[Optional[RenderJob]]' = queue.Queue(maxsize=queue_size)
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._latency = deque(maxlen=LATENCY_SAMPLES)
+        self._queue_wait = deque(maxlen=LATENCY_SAMPLES)
+        self._render_time = deque(maxlen=LATENCY_SAMPLES)
+        self.started = time.time()
+        self._last_evict = time.monotonic()
+        self.counters = {
+            'requests': 0,
+            'diagrams': 0,
+            'rendered': 0,
+            'cached': 0,
+            'coalesced': 0,
+            'rejected': 0,
+            'invalid': 0,
+            'failed': 0,
+            'timeouts': 0
+        }
+        self._workers = [
+            threading.Thread(target=self._work, name=f"render-{i + 1}", daemon=True)
+            for i in range(jobs)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._latency.append(seconds)
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self._queue_wait.append(time.perf_counter() - job.queued_at)
+
+            start = time.perf_counter()
+            try:
+                result = self.converter.render_source(
+                    job.source, job.width, job.background, job.fmt, check_cache=False
+                )
+            except RenderError as e:
+                error = e
+                result = None
+            except Exception as e:
+                # Anything else still has to reach the waiting requests
+                error = RenderError(str(e))
+                result = None
+            else:
+                error = None
+
+            with self._lock:
+                self._render_time.append(time.perf_counter() - start)
+                self._inflight.pop(job.key, None)
+                self.counters['rendered' if error is None else 'failed'] += 1
+                if isinstance(error, RenderTimeout):
+                    self.counters['timeouts'] += 1
+
+            if error is None:
+                job.future.set_result(result)
+                self._maybe_evict()
+            else:
+                job.future.set_exception(error)
+
+    def _maybe_evict(self) -> None:
+        """Keep the render cache within its size limit while the server runs."""
+        cache = self.converter.cache
+        if cache is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_evict < EVICT_INTERVAL:
+                return
+            self._last_evict = now
+        cache.evict()
+
+    def submit(self, code: str, options: Dict[str, Any]) -> Future:
+        """
+        Queue one diagram, or join an identical render already in flight.
+        Cache hits resolve immediately without using a queue slot.
+        Raises BadRequest for invalid diagrams and QueueFull under backpressure.
+        """
+        source = self.converter.prepare(code, options['style'], options['chart_type'])
+        errors = validate_diagram(code, 1, source)
+        if errors:
+            self.count('invalid')
+            raise BadRequest("invalid diagram", [e._asdict() for e in errors])
+
+        width = options['width']
+        fmt = options['format']
+        background = self.converter.resolve_background(options['style'], options['background'])
+
+        self.count('diagrams')
+        hit = self.converter.lookup(source, width, background, fmt)
+        if hit is not None:
+            self.count('cached')
+            future = Future()
+            future.set_result(hit)
+            return future
+
+        key = make_cache_key(source, width, background, fmt, self.converter.version)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.counters['coalesced'] += 1
+                return future
+
+            future = Future()
+            try:
+                self._queue.put_nowait(RenderJob(key, source, width, background, fmt, future, time.perf_counter()))
+            except queue.Full:
+                self.counters['rejected'] += 1
+                raise QueueFull("render queue is full")
+            self._inflight[key] = future
+            return future
+
+    def wait(self, future: Future) -> RenderedDiagram:
+        """Result of a submitted render. Raises RenderError/RenderTimeout."""
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise RenderTimeout("Conversion timed out")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            latency = list(self._latency)
+            queue_wait = list(self._queue_wait)
+            render_time = list(self._render_time)
+            counters = dict(self.counters)
+            inflight = len(self._inflight)
+
+        cache = self.converter.cache
+        return {
+            'uptime_seconds': time.time() - self.started,
+            'workers': self.jobs,
+            'queue_depth': self._queue.qsize(),
+            'queue_capacity': self._queue.maxsize,
+            'in_flight': inflight,
+            'counters': counters,
+            'cache': {'hits': cache.hits, 'misses': cache.misses} if cache else None,
+            'request_latency': percentiles(latency),
+            'queue_wait': percentiles(queue_wait),
+            'render_time': percentiles(render_time)
+        }
+
+    def close(self) -> None:
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+
+def parse_options(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate render options from a request body, applying the CLI defaults."""
+    for name in ('style', 'chart_type', 'format', 'background'):
+        if body.get(name) is not None and not isinstance(body[name], str):
+            raise BadRequest(f"invalid {name}: {body[name]!r} (expected a string)")
+
+    style = body.get('style') or None
+    if style and get_style_config(style) is None:
+        raise BadRequest(f"unknown style '{style}' (available: {', '.join(get_available_styles())})")
+
+    chart_type = body.get('chart_type') or 'flowchart'
+    if chart_type not in CHART_TYPES:
+        raise BadRequest(f"invalid chart_type '{chart_type}' (choose from {', '.join(CHART_TYPES)})")
+
+    fmt = (body.get('format') or 'png').lower()
+    if fmt not in CONTENT_TYPES:
+        raise BadRequest(f"invalid format '{fmt}' (choose from {', '.join(CONTENT_TYPES)})")
+
+    width = body.get('width', 1200)
+    if not isinstance(width, int) or isinstance(width, bool) or width <= 0:
+        raise BadRequest(f"invalid width: {width!r}")
+
+    background = body.get('background') or 'white'
+
+    return {'style': style, 'chart_type': chart_type, 'format': fmt, 'width': width, 'background': background}
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """HTTP front end for a RenderService (set as `server.service`)."""
+
+    server_version = "mermaid-to-png"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self) -> RenderService:
+        return self.server.service
+
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_body(status, body, 'application/json; charset=utf-8', headers)
+
+    def do_GET(self) -> None:
+        if self.path == '/metrics':
+            self.send_json(200, self.service.metrics())
+        elif self.path == '/styles':
+            self.send_json(200, {name: get_style_info(name) for name in get_available_styles()})
+        elif self.path == '/healthz':
+            self.send_json(200, {'ok': True})
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self) -> None:
+        if self.path != '/render':
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        start = time.perf_counter()
+        self.service.count('requests')
+        try:
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+            except ValueError:
+                length = -1
+            if length < 0:
+                # The body can't be skipped without a valid length, so the connection can't be reused
+                self.close_connection = True
+                raise BadRequest("invalid Content-Length")
+            if length > MAX_BODY_BYTES:
+                self.close_connection = True
+                self.send_json(413, {'error': f'request body over {MAX_BODY_BYTES} bytes'})
+                return
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError as e:
+                raise BadRequest(f"invalid JSON: {e}")
+            if not isinstance(body, dict):
+                raise BadRequest("request body must be a JSON object")
+
+            options = parse_options(body)
+            if isinstance(body.get('code'), str):
+                self.render_code(body['code'], options)
+            elif isinstance(body.get('markdown'), str):
+                self.render_markdown(body['markdown'], options)
+            else:
+                raise BadRequest("request needs 'code' or 'markdown'")
+        except BadRequest as e:
+            payload = {'error': str(e)}
+            if e.errors:
+                payload['errors'] = e.errors
+            self.send_json(400, payload)
+        except QueueFull as e:
+            self.send_json(503, {'error': str(e)}, {'Retry-After': '1'})
+        except RenderTimeout as e:
+            self.send_json(504, {'error': str(e)})
+        except RenderError as e:
+            self.send_json(422, {'error': str(e)})
+        finally:
+            self.service.record_latency(time.perf_counter() - start)
+
+    def render_code(self, code: str, options: Dict[str, Any]) -> None:
+        result = self.service.wait(self.service.submit(code, options))
+        self.send_body(200, result.data, CONTENT_TYPES[result.format], {
+            'X-Mermaid-Cached': 'true' if result.cached else 'false',
+            'X-Render-Seconds': f"{result.seconds:.3f}"
+        })
+
+    def render_markdown(self, markdown: str, options: Dict[str, Any]) -> None:
+        blocks = list(scan_mermaid_blocks(io.BytesIO(markdown.encode('utf-8'))))
+
+        # Queue every diagram before waiting on any of them
+        submitted: List[Tuple[Any, Optional[Future], Optional[Dict[str, Any]]]] = []
+        for block in blocks:
+            try:
+                submitted.append((block, self.service.submit(block.code, options), None))
+            except BadRequest as e:
+                errors = [
+                    {'line': error['line'] + block.line - 1, 'message': error['message']}
+                    for error in e.errors or []
+                ]
+                submitted.append((block, None, {'error': str(e), 'errors': errors}))
+
+        diagrams = []
+        for block, future, failure in submitted:
+            entry = {'index': block.index, 'title': block.title}
+            if future is not None:
+                try:
+                    result = self.service.wait(future)
+                except RenderError as e:
+                    entry['error'] = str(e)
+                else:
+                    entry.update({
+                        'format': result.format,
+                        'cached': result.cached,
+                        'data': base64.b64encode(result.data).decode('ascii')
+                    })
+            else:
+                entry.update(failure)
+            diagrams.append(entry)
+
+        self.send_json(200, {'diagrams': diagrams})
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """ThreadingHTTPServer equivalent listening on a Unix domain socket."""
+
+    daemon_threads = True
+
+
+def create_server(args: argparse.Namespace, service: RenderService) -> socketserver.BaseServer:
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        server = UnixHTTPServer(args.socket, RenderHandler)
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), RenderHandler)
+    server.service = service
+    server.quiet = args.quiet
+    return server
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='convert.py serve', description='Serve Mermaid renders over local HTTP')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'TCP port (default: {DEFAULT_PORT})')
+    parser.add_argument('--socket', help='Listen on this Unix socket path instead of TCP')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='Concurrent renders (default: CPU count)')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, help='Renders allowed to wait before requests get 503')
+    parser.add_argument('--timeout', type=float, default=RENDER_TIMEOUT + 30, help='Seconds a request waits for its render, queueing included')
+    parser.add_argument('--renderer', default='auto', choices=BACKENDS, help='Rendering backend')
+    parser.add_argument('--theme-dir', action='append', default=[], help='Extra directory of JSON/YAML theme files (repeatable)')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the render cache')
+    parser.add_argument('--cache-dir', help='Render cache directory (default: ~/.cache/mermaid-to-png)')
+    parser.add_argument('--cache-max-size', type=int, default=DEFAULT_MAX_SIZE_MB, help='Render cache size limit in MB')
+    parser.add_argument('--quiet', action='store_true', help='Do not log each request')
+
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.queue_size < 1:
+        parser.error("--queue-size must be at least 1")
+
+    for theme_dir in args.theme_dir:
+        add_theme_dir(theme_dir)
+
+    cache = open_cache(args.cache_dir, args.cache_max_size, enabled=not args.no_cache)
+    converter = MermaidConverter(renderer=args.renderer, cache=cache, validate=False, jobs=args.jobs)
+
+    with converter:
+        # Start Node and the browser now so the first request doesn't pay for it
+        try:
+            converter.start()
+        except RenderError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        service = RenderService(converter, args.jobs, args.queue_size, args.timeout)
+        server = create_server(args, service)
+        where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+        print(f"Serving Mermaid renders on {where} ({args.jobs} worker(s), queue {args.queue_size})")
+
+        # Clean up the same way on SIGTERM (service managers) as on Ctrl+C
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nStopping server.")
+        finally:
+            server.server_close()
+            service.close()
+            if args.socket and os.path.exists(args.socket):
+                os.unlink(args.socket)
+            if cache:
+                cache.evict()
+
+
+if __name__ == '__main__':
+    main()
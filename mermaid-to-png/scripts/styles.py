@@ -4,8 +4,18 @@ Mermaid Style Themes Configuration
 Built-in professional themes for mermaid-to-png.
 """
 
+import functools
+import json
+import os
+from pathlib import Path
 from typing import Dict, Any, Optional, List
 
+try:
+    import yaml
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
 # =============================================================================
 # Style Theme Definitions
 # =============================================================================
@@ -183,21 +193,117 @@ CHART_TYPE_CONFIGS: Dict[str, Dict[str, Any]] = {
     }
 }
 
+# =============================================================================
+# User Theme Files
+# =============================================================================
+
+REQUIRED_STYLE_KEYS = ("name", "description", "theme_variables")
+
+_theme_dirs: List[Path] = []
+_user_styles: Optional[Dict[str, Dict[str, Any]]] = None
+
+
+def get_default_theme_dirs() -> List[Path]:
+    """
+    Theme directories searched for *.json / *.yaml files.
+    MERMAID_THEME_PATH (os.pathsep-separated) first, then
+    ~/.config/mermaid-to-png/themes.
+    """
+    dirs = [Path(p) for p in os.environ.get('MERMAID_THEME_PATH', '').split(os.pathsep) if p]
+
+    xdg_config = os.environ.get('XDG_CONFIG_HOME')
+    if xdg_config:
+        dirs.append(Path(xdg_config) / 'mermaid-to-png' / 'themes')
+    else:
+        dirs.append(Path.home() / '.config' / 'mermaid-to-png' / 'themes')
+
+    return dirs
+
+
+def add_theme_dir(path: str) -> None:
+    """Search an extra directory for theme files."""
+    global _user_styles
+    _theme_dirs.append(Path(path))
+    _user_styles = None
+    compile_style_header.cache_clear()
+
+
+def validate_style(name: str, style: Any) -> Dict[str, Any]:
+    """Check a theme definition and return it. Raises ValueError if invalid."""
+    if not isinstance(style, dict):
+        raise ValueError(f"theme '{name}' must be an object")
+
+    missing = [key for key in REQUIRED_STYLE_KEYS if key not in style]
+    if missing:
+        raise ValueError(f"theme '{name}' is missing: {', '.join(missing)}")
+
+    for key in ("theme_variables", "flowchart"):
+        if key in style and not isinstance(style[key], dict):
+            raise ValueError(f"theme '{name}': '{key}' must be an object")
+
+    try:
+        json.dumps(style)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"theme '{name}' is not JSON-serializable: {e}")
+
+    return style
+
+
+def load_theme_file(path: Path) -> Dict[str, Any]:
+    """Load one theme definition from a JSON or YAML file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix == '.json':
+            return json.load(f)
+        if not HAS_YAML:
+            raise ValueError("PyYAML is required for YAML themes (pip install pyyaml)")
+        return yaml.safe_load(f)
+
+
+def _load_user_styles() -> Dict[str, Dict[str, Any]]:
+    """Read theme files once; the file stem is the style name."""
+    global _user_styles
+    if _user_styles is not None:
+        return _user_styles
+
+    styles: Dict[str, Dict[str, Any]] = {}
+    for theme_dir in _theme_dirs + get_default_theme_dirs():
+        if not theme_dir.is_dir():
+            continue
+        for path in sorted(theme_dir.iterdir()):
+            if path.suffix not in ('.json', '.yaml', '.yml') or path.stem in styles:
+                continue
+            try:
+                styles[path.stem] = validate_style(path.stem, load_theme_file(path))
+            except (OSError, ValueError) as e:
+                print(f"Warning: Skipping theme file {path}: {e}")
+
+    _user_styles = styles
+    return styles
+
+
+def _all_styles() -> Dict[str, Dict[str, Any]]:
+    """Built-in styles plus user themes (user themes win on name clashes)."""
+    user_styles = _load_user_styles()
+    if not user_styles:
+        return STYLES
+    return {**STYLES, **user_styles}
+
+
 # =============================================================================
 # Utility Functions
 # =============================================================================
 
 def get_style_config(style_name: str) -> Optional[Dict[str, Any]]:
     """Get style configuration by name."""
-    return STYLES.get(style_name)
+    return _all_styles().get(style_name)
 
 def get_available_styles() -> List[str]:
     """Get list of available style names."""
-    return list(STYLES.keys())
+    return list(_all_styles().keys())
 
 def get_style_info(style_name: str) -> Optional[Dict[str, str]]:
     """Get style human-readable info."""
-    style = STYLES.get(style_name)
+    style = _all_styles().get(style_name)
     if style:
         return {
             "name": style["name"],
@@ -205,61 +311,100 @@ def get_style_info(style_name: str) -> Optional[Dict[str, str]]:
         }
     return None
 
-def generate_mermaid_config(style_name: Optional[str] = None, chart_type: str = "flowchart") -> str:
+def build_mermaid_config(
+    style_name: Optional[str] = None,
+    chart_type: str = "flowchart",
+    html_labels: bool = True
+) -> Dict[str, Any]:
     """
-    Generate Mermaid configuration JSON for the given style and chart type.
-    Returns the config as a string to be injected into the diagram.
+    Build the Mermaid init config object for the given style and chart type.
+    html_labels=False makes Mermaid draw labels as SVG text instead of HTML
+    in <foreignObject>, which SVG rasterizers other than browsers can't draw.
     """
-    config_parts = []
+    config: Dict[str, Any] = {}
 
-    # Add init directive
-    config_parts.append('%%{init: {')
-
-    settings = []
-
-    # Add theme variables if style is specified
-    if style_name and style_name in STYLES:
-        style = STYLES[style_name]
+    style = get_style_config(style_name) if style_name else None
+    if style:
         theme_vars = style.get("theme_variables", {})
-
         if theme_vars:
-            settings.append(f"  'themeVariables': {str(theme_vars).replace(chr(39), chr(34))}")
+            config["themeVariables"] = dict(theme_vars)
 
         # Add flowchart-specific settings
         flowchart_config = style.get("flowchart", {})
         if flowchart_config:
-            settings.append(f"  'flowchart': {str(flowchart_config).replace(chr(39), chr(34))}")
+            config["flowchart"] = dict(flowchart_config)
 
-        # Add chart type specific config
+        # Chart type settings are applied last and take precedence
         chart_config = CHART_TYPE_CONFIGS.get(chart_type, {})
         if chart_config:
-            settings.append(f"  '{chart_type}': {str(chart_config).replace(chr(39), chr(34))}")
+            config[chart_type] = {**config.get(chart_type, {}), **chart_config}
+
+    if not html_labels:
+        config["htmlLabels"] = False
+        config["flowchart"] = {**config.get("flowchart", {}), "htmlLabels": False}
+
+    return config
+
+@functools.lru_cache(maxsize=None)
+def compile_style_header(
+    style_name: Optional[str] = None,
+    chart_type: str = "flowchart",
+    html_labels: bool = True
+) -> str:
+    """
+    Serialize the init directive for a (style, chart_type) pair once.
+    The config is emitted as real JSON, so values with quotes survive.
+    """
+    config = build_mermaid_config(style_name, chart_type, html_labels)
+    return '%%{init: ' + json.dumps(config, ensure_ascii=False) + '}%%'
 
-    config_parts.append(','.join(settings))
-    config_parts.append('}}%%')
+def generate_mermaid_config(style_name: Optional[str] = None, chart_type: str = "flowchart") -> str:
+    """
+    Generate Mermaid configuration JSON for the given style and chart type.
+    Returns the config as a string to be injected into the diagram.
+    """
+    return compile_style_header(style_name, chart_type)
 
-    return '\n'.join(config_parts)
+def strip_init_directives(diagram_code: str) -> str:
+    """Remove existing %%{init: ...}%% directives and the whitespace after them."""
+    parts = []
+    pos = 0
+    while True:
+        start = diagram_code.find('%%{init:', pos)
+        if start < 0:
+            break
+        end = diagram_code.find('}%%', start)
+        if end < 0:
+            break
+        parts.append(diagram_code[pos:start])
+        pos = end + 3
+        while pos < len(diagram_code) and diagram_code[pos].isspace():
+            pos += 1
+    parts.append(diagram_code[pos:])
+    return ''.join(parts)
 
-def inject_style_into_diagram(diagram_code: str, style_name: Optional[str] = None, chart_type: str = "flowchart") -> str:
+def inject_style_into_diagram(
+    diagram_code: str,
+    style_name: Optional[str] = None,
+    chart_type: str = "flowchart",
+    html_labels: bool = True
+) -> str:
     """
     Inject style configuration into Mermaid diagram code.
     """
-    if not style_name or style_name not in STYLES:
-        return diagram_code
+    if not style_name or get_style_config(style_name) is None:
+        if html_labels:
+            return diagram_code
+        # No style to replace the diagram's own directives; Mermaid merges them
+        return compile_style_header(None, chart_type, html_labels) + '\n' + diagram_code
 
-    # Generate config
-    config = generate_mermaid_config(style_name, chart_type)
+    header = compile_style_header(style_name, chart_type, html_labels)
 
-    # Check if diagram already has init directive
+    # Any existing init directive is replaced by the style's
     if "%%{init:" in diagram_code:
-        # Replace existing init directive
-        pattern = r'%%\{init:.*?\}%%\s*'
-        diagram_code = re.sub(pattern, config + '\n', diagram_code, flags=re.DOTALL)
-    else:
-        # Add config at the beginning
-        diagram_code = config + '\n' + diagram_code
+        diagram_code = strip_init_directives(diagram_code)
 
-    return diagram_code
+    return header + '\n' + diagram_code
 
 
 if __name__ == "__main__":
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Mermaid Syntax Validation
+Cheap Python-side checks that reject malformed diagrams before a renderer
+(and its browser) is started.
+"""
+
+import json
+import re
+from typing import List, NamedTuple, Optional
+
+# First keyword of every diagram type mermaid-cli understands
+DIAGRAM_TYPES = (
+    "graph", "flowchart", "flowchart-elk", "flowchart-v2", "sequenceDiagram",
+    "classDiagram", "classDiagram-v2", "stateDiagram", "stateDiagram-v2", "erDiagram",
+    "journey", "gantt", "pie", "quadrantChart", "requirementDiagram", "requirement",
+    "gitGraph", "mindmap", "timeline", "info",
+    "C4Context", "C4Container", "C4Component", "C4Dynamic", "C4Deployment",
+    "sankey", "sankey-beta", "xychart", "xychart-beta", "block", "block-beta",
+    "packet", "packet-beta", "architecture", "architecture-beta",
+    "kanban", "radar-beta", "treemap-beta", "zenuml"
+)
+
+# Block keywords that must be closed by `end`
+BLOCK_OPENERS = {
+    "flowchart": ("subgraph",),
+    "sequence": ("loop", "alt", "opt", "par", "critical", "break", "rect", "box"),
+}
+
+DANGLING_EDGE_RE = re.compile(r'(?:--+>|==+>|-\.+->|---+|===+|--+[ox])\s*$')
+ASYMMETRIC_NODE_RE = re.compile(r'\w>')
+BRACKETS = {')': '(', ']': '[', '}': '{'}
+ACC_BLOCK_RE = re.compile(r'accDescr\s*\{')
+
+
+class ValidationError(NamedTuple):
+    """A problem found in a diagram; `line` is 1-based in the Markdown file."""
+    line: int
+    message: str
+
+
+class ValidationFailed(Exception):
+    """Raised in --strict mode when any diagram fails validation."""
+
+    def __init__(self, problems: List[str]):
+        super().__init__(f"{len(problems)} Mermaid syntax problem(s)")
+        self.problems = problems
+
+
+def _content_lines(code: str, first_line: int):
+    """
+    Yield (line number, stripped line) for lines that aren't blank, comments,
+    front matter, %%{...}%% directives or accessibility text.
+    """
+    lines = code.split('\n')
+    start = 0
+    # Optional YAML front matter (--- title: ... ---)
+    if lines and lines[0].strip() == '---':
+        for i in range(1, len(lines)):
+            if lines[i].strip() == '---':
+                start = i + 1
+                break
+
+    skip_until = None  # closing marker of a directive or accDescr block spanning lines
+    for i in range(start, len(lines)):
+        stripped = lines[i].strip()
+        if skip_until is not None:
+            if skip_until in stripped:
+                skip_until = None
+            continue
+        if not stripped:
+            continue
+        if stripped.startswith('%%{'):
+            if '}%%' not in stripped:
+                skip_until = '}%%'
+            continue
+        if stripped.startswith('%%'):
+            continue
+        if stripped.startswith(('accTitle', 'accDescr')):
+            # accDescr { ... } may span lines; accTitle: / accDescr: are single lines
+            if ACC_BLOCK_RE.match(stripped) and '}' not in stripped:
+                skip_until = '}'
+            continue
+        yield first_line + i, stripped
+
+
+def _statements(lines):
+    """
+    Join lines that continue a string (multi-line "`markdown`" labels) into
+    one statement, yielding (first line number, text, string closed).
+    """
+    pending = None
+    for line_no, line in lines:
+        if pending is not None:
+            pending = (pending[0], pending[1] + '\n' + line)
+        else:
+            pending = (line_no, line)
+        if pending[1].count('"') % 2 == 0:
+            yield pending[0], pending[1], True
+            pending = None
+    if pending is not None:
+        yield pending[0], pending[1], False
+
+
+def _diagram_family(header: str) -> Optional[str]:
+    keyword = header.split()[0].rstrip(':;') if header.split() else ''
+    if keyword in ("graph", "flowchart", "flowchart-elk", "flowchart-v2"):
+        return "flowchart"
+    if keyword == "sequenceDiagram":
+        return "sequence"
+    return None
+
+
+def _check_brackets(line: str) -> Optional[str]:
+    """Unbalanced brackets on one flowchart statement; text in quotes is ignored."""
+    stack = []
+    in_quotes = False
+    asymmetric = len(ASYMMETRIC_NODE_RE.findall(line))
+    for ch in line:
+        if ch == '"':
+            in_quotes = not in_quotes
+        elif in_quotes:
+            continue
+        elif ch in '([{':
+            stack.append(ch)
+        elif ch in BRACKETS:
+            if stack and stack[-1] == BRACKETS[ch]:
+                stack.pop()
+            elif ch == ']' and asymmetric:
+                # `A>label]` node shape opens with '>'
+                asymmetric -= 1
+            else:
+                return f"unexpected '{ch}'"
+
+    if stack:
+        return f"unclosed '{stack[-1]}'"
+    return None
+
+
+def validate_directives(code: str, first_line: int = 1, raw_code: Optional[str] = None) -> List[ValidationError]:
+    """
+    Check that every %%{init: ...}%% directive holds valid JSON.
+    `raw_code` is the diagram before style injection; directives not found
+    there were injected and are reported at the diagram's first line.
+    """
+    errors = []
+    pos = 0
+    while True:
+        start = code.find('%%{', pos)
+        if start < 0:
+            break
+        end = code.find('}%%', start)
+        if end < 0:
+            errors.append(ValidationError(first_line, "unterminated %%{...}%% directive"))
+            break
+        directive = code[start:end + 3]
+        pos = end + 3
+
+        body = code[start + 3:end].strip()
+        name, _, args = body.partition(':')
+        if name.strip() not in ("init", "initialize"):
+            continue
+
+        injected = raw_code is not None and directive not in raw_code
+        line = first_line
+        if raw_code is not None and not injected:
+            line = first_line + raw_code[:raw_code.index(directive)].count('\n')
+
+        try:
+            json.loads(args)
+        except ValueError:
+            # Mermaid also accepts single-quoted JSON in directives
+            try:
+                json.loads(args.replace("'", '"'))
+            except ValueError as e:
+                where = " (injected style)" if injected else ""
+                errors.append(ValidationError(line, f"invalid JSON in init directive{where}: {e}"))
+    return errors
+
+
+def validate_diagram(code: str, first_line: int = 1, styled_code: Optional[str] = None) -> List[ValidationError]:
+    """
+    Validate one diagram. `code` is the diagram as written in the Markdown file,
+    starting at `first_line`; `styled_code` is the same diagram after style
+    injection, whose init directives are checked instead when given.
+    """
+    errors = []
+    lines = list(_content_lines(code, first_line))
+
+    if not lines:
+        return [ValidationError(first_line, "empty diagram")]
+
+    header_line, header = lines[0]
+    diagram_type = header.split()[0].rstrip(':;')
+    if diagram_type not in DIAGRAM_TYPES:
+        errors.append(ValidationError(
+            header_line, f"unknown diagram type '{diagram_type}'"
+        ))
+        return errors
+
+    errors.extend(validate_directives(styled_code if styled_code is not None else code, first_line, raw_code=code))
+
+    family = _diagram_family(header)
+    openers = BLOCK_OPENERS.get(family, ())
+    open_blocks = []
+    # Only flowchart labels are quoted strings; elsewhere a lone '"' is plain text
+    if family == "flowchart":
+        statements = _statements(lines[1:])
+    else:
+        statements = ((line_no, line, True) for line_no, line in lines[1:])
+
+    for line_no, line, closed in statements:
+        keyword = line.split()[0]
+        if not closed:
+            errors.append(ValidationError(line_no, "unterminated string (odd number of '\"')"))
+            continue
+
+        if keyword in openers:
+            open_blocks.append((line_no, keyword))
+        elif keyword == 'end' and openers:
+            if not open_blocks:
+                errors.append(ValidationError(line_no, "'end' without a matching block"))
+            else:
+                open_blocks.pop()
+
+        if family == "flowchart" and keyword not in ("subgraph", "end", "classDef", "class", "style", "linkStyle", "click"):
+            problem = _check_brackets(line)
+            if problem:
+                errors.append(ValidationError(line_no, problem))
+            elif DANGLING_EDGE_RE.search(line):
+                errors.append(ValidationError(line_no, "edge has no target node"))
+
+    for line_no, keyword in open_blocks:
+        errors.append(ValidationError(line_no, f"'{keyword}' block is never closed with 'end'"))
+
+    return errors
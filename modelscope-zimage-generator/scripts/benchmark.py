@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+ModelScope Generation Benchmark
+Measure generate_image.py throughput against the local mock server, without
+API quota or network access.
+
+Usage:
+    python3 benchmark.py                                  # concurrency 1, 4 and 16
+    python3 benchmark.py --concurrency 8,32 --images 64 --delay 3 --rate-limit 0.1
+    python3 benchmark.py --concurrency 16 --max-tasks 4 --max-inflight 4
+    python3 benchmark.py --base-url http://127.0.0.1:8000/ --json run.json
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+import generate_image
+from generate_image import GenerationError, PollPolicy, PollStats, create_session, percentile
+from mock_server import MockState, create_server, make_jpeg
+from ratelimit import RateLimiter
+
+API_KEY = 'ms-benchmark'
+
+
+def run_level(concurrency: int, args: argparse.Namespace) -> Dict[str, Optional[float]]:
+    """Generate `args.images` images, `concurrency` at a time, against a fresh mock server."""
+    state = None
+    server = None
+    if args.base_url:
+        generate_image.set_base_url(args.base_url)
+    else:
+        state = MockState(
+            args.delay, args.jitter, args.failure_rate, args.rate_limit, args.retry_after,
+            make_jpeg(args.image_size, args.image_size, args.image_kb * 1024), args.max_tasks
+        )
+        server = create_server(state=state)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        generate_image.set_base_url('http://%s:%d/' % server.server_address[:2])
+
+    policy = PollPolicy(
+        initial=args.poll_interval,
+        max_interval=max(args.poll_interval, args.max_poll_interval),
+        deadline=args.timeout
+    )
+    session = create_session(concurrency)
+    limiter = RateLimiter(args.submit_rate, args.poll_rate, args.max_inflight)
+    run_id = time.time_ns()
+
+    with tempfile.TemporaryDirectory(prefix='modelscope-bench-') as tmp:
+        def run_one(index: int):
+            stats = PollStats()
+            t0 = time.perf_counter()
+            try:
+                generate_image.generate_image(
+                    f"benchmark {run_id} image {index}",
+                    output_path=str(Path(tmp) / f"image_{index:04d}.jpg"),
+                    api_key=API_KEY,
+                    session=session,
+                    verbose=False,
+                    poll_policy=policy,
+                    stats=stats,
+                    limiter=limiter
+                )
+                ok = True
+            except GenerationError:
+                ok = False
+            return ok, time.perf_counter() - t0, stats
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(run_one, range(args.images)))
+        elapsed = time.perf_counter() - start
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    latencies = [latency for ok, latency, _ in results if ok]
+    polls = sum(stats.polls for _, _, stats in results)
+    lags = state.detection_lags() if state is not None else []
+    p50 = percentile(latencies, 50)
+    p90 = percentile(latencies, 90)
+    p99 = percentile(latencies, 99)
+    return {
+        'images': len(latencies),
+        'failed': len(results) - len(latencies),
+        'seconds': elapsed,
+        'images_per_min': len(latencies) / elapsed * 60 if elapsed > 0 else None,
+        'p50_s': p50,
+        'p90_s': p90,
+        'p99_s': p99,
+        'polls_per_image': polls / len(results) if results else None,
+        'poll_errors': sum(stats.errors for _, _, stats in results),
+        # Time between the server finishing a task and a poll noticing it
+        'mean_poll_lag_s': sum(lags) / len(lags) if lags else None,
+        'rate_limited': state.counters['rate_limited'] if state is not None else None,
+        'throttled': limiter.throttled,
+        'paused_s': limiter.paused
+    }
+
+
+def format_value(value: Optional[float], fmt: str) -> str:
+    if value is not None:
+        return format(value, fmt)
+    width = int(fmt.split('.')[0].lstrip('+') or 0)
+    return '-'.rjust(width)
+
+
+def print_report(report: Dict[str, Dict[str, Optional[float]]]) -> None:
+    header = (
+        f"{'conc':>5} {'ok':>5} {'failed':>6} {'img/min':>9} {'p50 s':>7} {'p90 s':>7} {'p99 s':>7} "
+        f"{'polls/img':>9} {'poll lag s':>10} {'429s':>5} {'paused s':>8}"
+    )
+    print(header)
+    print('-' * len(header))
+    for concurrency, row in report.items():
+        print(
+            f"{concurrency:>5} {row['images']:>5} {row['failed']:>6} "
+            f"{format_value(row['images_per_min'], '9.1f')} "
+            f"{format_value(row['p50_s'], '7.2f')} "
+            f"{format_value(row['p90_s'], '7.2f')} "
+            f"{format_value(row['p99_s'], '7.2f')} "
+            f"{format_value(row['polls_per_image'], '9.1f')} "
+            f"{format_value(row['mean_poll_lag_s'], '10.2f')} "
+            f"{format_value(row['rate_limited'], '5d')} "
+            f"{format_value(row['paused_s'], '8.1f')}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark generate_image.py against the local mock ModelScope server')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels (default: 1,4,16)')
+    parser.add_argument('--images', type=int, default=20, help='Images generated at each level (default: 20)')
+    parser.add_argument('--base-url', help='Benchmark an already running server instead of starting the mock')
+    parser.add_argument('--delay', type=float, default=3.0, help='Mock task queue delay in seconds (default: 3)')
+    parser.add_argument('--jitter', type=float, default=0.3, help='Random +/- fraction applied to --delay (default: 0.3)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of mock tasks that fail (default: 0)')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Fraction of mock API requests answered 429 (default: 0)')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds on mock 429s (default: 1)')
+    parser.add_argument('--max-tasks', type=int, default=0, help='Mock 429s submits while this many tasks run (default: no cap)')
+    parser.add_argument('--image-size', type=int, default=1024, metavar='PX', help='Mock image width and height (default: 1024)')
+    parser.add_argument('--image-kb', type=int, default=0, help='Pad mock images to this many KB')
+    parser.add_argument('--poll-interval', type=float, default=PollPolicy().initial, help='Client first poll delay (default: 1)')
+    parser.add_argument('--max-poll-interval', type=float, default=PollPolicy().max_interval, help='Client longest poll interval (default: 10)')
+    parser.add_argument('--timeout', type=float, default=PollPolicy().deadline, help='Client task deadline in seconds (default: 300)')
+    parser.add_argument('--submit-rate', type=float, help='Client submissions per second (default: no limit)')
+    parser.add_argument('--poll-rate', type=float, help='Client status checks per second (default: no limit)')
+    parser.add_argument('--max-inflight', type=int, help='Client cap on tasks in flight (default: none)')
+    parser.add_argument('--json', help='Write results to this JSON file')
+
+    args = parser.parse_args()
+
+    report = {}
+    for concurrency in (int(c) for c in args.concurrency.split(',') if c.strip()):
+        print(f"Running {args.images} image(s) at concurrency {concurrency}...", file=sys.stderr)
+        report[str(concurrency)] = run_level(concurrency, args)
+
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'settings': vars(args), 'results': report}, f, indent=2)
+        print(f"\nResults written to: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
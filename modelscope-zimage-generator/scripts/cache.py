@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+ModelScope Result Cache
+Content-addressed on-disk cache of generated images, so re-running the same
+(prompt, model, LoRAs, ...) request costs no API task.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_MAX_SIZE_MB = 1024
+
+
+def get_default_cache_dir() -> Path:
+    """Get the cache directory (~/.cache/modelscope/images)"""
+    # Use XDG cache directory if set, otherwise ~/.cache/modelscope/
+    xdg_cache = os.environ.get('XDG_CACHE_HOME')
+    if xdg_cache:
+        return Path(xdg_cache) / 'modelscope' / 'images'
+    return Path.home() / '.cache' / 'modelscope' / 'images'
+
+
+def make_cache_key(payload: Dict[str, Any], endpoint: str) -> str:
+    """
+    Hash the generation request payload and the API it is sent to.
+    Every payload field (prompt, model, loras, and seed/size/n when given)
+    is part of the key; dict keys are sorted so their order doesn't matter.
+    """
+    inputs = json.dumps(
+        {'endpoint': endpoint, 'payload': payload},
+        sort_keys=True, ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha256(inputs.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    The images of one task stored as <cache_dir>/<key[:2]>/<key>.<i>of<count>,
+    exactly as downloaded from the server. A set missing any image is a miss.
+
+    An entry's mtime is its last use; `evict()` removes least recently used
+    entries until the cache fits in `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_SIZE_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key: str, index: int, count: int) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.{index}of{count}"
+
+    def _entries(self, key: str) -> Optional[List[Path]]:
+        """All images cached under `key` in output order, or None unless the set is complete."""
+        found = {}
+        for path in (self.cache_dir / key[:2]).glob(f"{key}.*of*"):
+            index, _, count = path.suffix[1:].partition('of')
+            if index.isdigit() and count.isdigit():
+                found[(int(index), int(count))] = path
+
+        for count in {count for _, count in found}:
+            paths = [found.get((index, count)) for index in range(1, count + 1)]
+            if all(paths):
+                return paths
+        return None
+
+    def contains(self, key: str) -> bool:
+        """Whether `key` is cached, without counting a hit or miss."""
+        return self._entries(key) is not None
+
+    def get(self, key: str) -> Optional[List[Path]]:
+        """Paths of the cached images, or None on a miss."""
+        entries = self._entries(key)
+        try:
+            for entry in entries or ():
+                os.utime(entry)
+        except FileNotFoundError:
+            entries = None  # evicted meanwhile
+        with self._lock:
+            if entries is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entries
+
+    def put(self, key: str, sources: List[str]) -> None:
+        """Copy the freshly downloaded image files of one task into the cache."""
+        temp_path = None
+        written = []
+        try:
+            for index, source in enumerate(sources, 1):
+                entry = self._entry_path(key, index, len(sources))
+                entry.parent.mkdir(parents=True, exist_ok=True)
+                # Copy to a temp file first so readers never see a partial entry
+                fd, temp_path = tempfile.mkstemp(dir=entry.parent, suffix='.tmp')
+                os.close(fd)
+                shutil.copyfile(source, temp_path)
+                os.replace(temp_path, entry)
+                temp_path = None
+                written.append(entry)
+        except OSError as e:
+            print(f"Warning: Could not write result cache entry: {e}")
+            # A partial set is never a hit, so don't leave it taking up space
+            for path in written + ([temp_path] if temp_path else []):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def evict(self) -> int:
+        """
+        Remove least recently used image sets beyond max_bytes. A set is
+        removed as a whole, since a partial one is never a hit. Returns bytes freed.
+        """
+        sets: Dict[Tuple[Path, str], List] = {}
+        total = 0
+        for path in self.cache_dir.glob('*/*'):
+            # Skip entries another process is still writing
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            # <key>.<i>of<count>: all images of one key and count form a set
+            key, _, position = path.name.partition('.')
+            group = sets.setdefault((path.parent, f"{key}.{position.partition('of')[2]}"), [0.0, 0, []])
+            group[0] = max(group[0], stat.st_mtime)
+            group[1] += stat.st_size
+            group[2].append(path)
+            total += stat.st_size
+
+        freed = 0
+        for _, size, paths in sorted(sets.values(), key=lambda group: group[0]):
+            if total - freed <= self.max_bytes:
+                break
+            for path in paths:
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+            freed += size
+        return freed
+
+
+def open_cache(cache_dir: Optional[str], max_size_mb: int, enabled: bool = True) -> Optional[ResultCache]:
+    """Build the result cache from CLI options, or None when caching is off."""
+    if not enabled:
+        return None
+    path = Path(cache_dir) if cache_dir else get_default_cache_dir()
+    return ResultCache(path, max_size_mb * 1024 * 1024)
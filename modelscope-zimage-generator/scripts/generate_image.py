@@ -2,18 +2,46 @@
 """
 ModelScope Image Generation Script
 Generates images using ModelScope API with async polling
+
+Single image:
+    python generate_image.py "A golden cat" output.jpg
+
+Several candidates from one task (saved as cat_1.jpg, cat_2.jpg, ...):
+    python generate_image.py "A golden cat" cat.jpg -n 4
+
+Thumbnail, web-size WebP and full-size JPEG next to each image, plus a JSON manifest:
+    python generate_image.py "A golden cat" cat.png --variants
+
+Batch (one prompt or JSON object per line, '-' for stdin):
+    python generate_image.py --batch prompts.txt --output-dir out --concurrency 8
 """
 
 import requests
+import random
+import threading
 import time
 import json
 import sys
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Optional, Dict, Any
-from io import BytesIO
+from typing import Optional, Dict, Any, Iterator, List, NamedTuple, Tuple
 
-from PIL import Image
+from requests.adapters import HTTPAdapter
+
+from cache import DEFAULT_MAX_SIZE_MB, ResultCache, make_cache_key, open_cache
+from journal import SUBMITTED, SUCCEEDED, JobJournal, JournalEntry
+from ratelimit import RateLimiter
+from variants import DEFAULT_VARIANTS, VariantSpec, build_variants, is_current, parse_variants
+
+# Pillow is only needed to change format or resize
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
 
 # Check if we can use getpass for secure input
 try:
@@ -23,7 +51,80 @@ except ImportError:
     HAS_GETPASS = False
 
 # Configuration
-BASE_URL = 'https://api-inference.modelscope.cn/'
+DEFAULT_BASE_URL = 'https://api-inference.modelscope.cn/'
+BASE_URL = (os.environ.get('MODELSCOPE_BASE_URL') or DEFAULT_BASE_URL).rstrip('/') + '/'
+DEFAULT_MODEL = "Tongyi-MAI/Z-Image-Turbo"
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 300  # seconds
+REQUEST_TIMEOUT = 30  # seconds per status request or download read
+SUBMIT_ATTEMPTS = 6  # tries per task when submission is throttled (429/5xx)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Output extension -> Pillow format name
+IMAGE_FORMATS = {
+    ".jpg": "JPEG",
+    ".jpeg": "JPEG",
+    ".png": "PNG",
+    ".webp": "WEBP",
+}
+
+CONTENT_TYPES = {
+    "image/jpeg": "JPEG",
+    "image/png": "PNG",
+    "image/webp": "WEBP",
+}
+
+_convert_pool: Optional[ProcessPoolExecutor] = None
+_convert_pool_lock = threading.Lock()
+
+class GenerationError(Exception):
+    """Raised when a generation task cannot be submitted, fails or times out."""
+
+class TaskFailed(GenerationError):
+    """Raised when the server reports a task as FAILED."""
+
+class TaskNotFound(GenerationError):
+    """Raised when the server no longer knows a task id."""
+
+class PollPolicy(NamedTuple):
+    """
+    How to poll a task: the first check comes after `initial` seconds, then
+    the interval grows by `multiplier` up to `max_interval`, each randomised
+    by +/- `jitter`. A server Retry-After hint replaces the next interval.
+    Polling gives up `deadline` seconds after submission.
+    """
+    initial: float = 1.0
+    multiplier: float = 1.5
+    max_interval: float = 10.0
+    jitter: float = 0.2
+    deadline: float = DEFAULT_TIMEOUT
+
+class PollStats:
+    """Polling counters for one task, filled in by generate_image()"""
+
+    def __init__(self):
+        self.polls = 0
+        self.errors = 0
+        self.time_to_success: Optional[float] = None  # seconds from submit to first SUCCEED
+        self.elapsed = 0.0
+        self.cached = False  # served from the result cache, no task submitted
+        self.skipped = False  # already done according to the job journal
+        self.resumed = False  # polled a task submitted by an earlier run
+
+class BatchJob(NamedTuple):
+    """One prompt of a batch run."""
+    prompt: str
+    output_path: str
+    model: str = DEFAULT_MODEL
+    loras: Optional[str | Dict[str, float]] = None
+    n: int = 1
+
+class BatchResult(NamedTuple):
+    """Outcome of one batch job: `paths` on success, `error` on failure."""
+    job: BatchJob
+    paths: Optional[List[str]]
+    error: Optional[Exception]
+    stats: PollStats
 
 def get_config_path() -> Path:
     """Get the config file path (~/.config/modelscope/config.json)"""
@@ -110,15 +211,339 @@ def get_api_key() -> str:
 
     return api_key
 
+def set_base_url(url: str) -> None:
+    """Point API calls at another server, e.g. scripts/mock_server.py"""
+    global BASE_URL
+    BASE_URL = url if url.endswith('/') else url + '/'
+
+def create_session(pool_size: int = DEFAULT_CONCURRENCY) -> requests.Session:
+    """HTTP session that keeps connections open across submit, poll and download calls"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delay or HTTP date), if any"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def poll_task(
+    session: requests.Session,
+    task_id: str,
+    headers: Dict[str, str],
+    policy: PollPolicy,
+    stats: PollStats,
+    log=print,
+    limiter: Optional[RateLimiter] = None
+) -> Dict[str, Any]:
+    """
+    Poll a task until it succeeds and return its status data.
+    Each request waits for the shared poll budget when a limiter is given.
+
+    Raises:
+        TaskFailed: If the task fails
+        TaskNotFound: If the server doesn't know the task
+        GenerationError: If the deadline passes
+    """
+    start = time.monotonic()
+    deadline = start + policy.deadline
+    interval = policy.initial
+    delay = interval
+
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise GenerationError(f"Timeout: Image generation took longer than {policy.deadline:g}s")
+            time.sleep(min(delay, remaining))
+
+            if limiter is not None:
+                limiter.before_poll()
+            interval = min(interval * policy.multiplier, policy.max_interval)
+            delay = interval * random.uniform(1 - policy.jitter, 1 + policy.jitter)
+            stats.polls += 1
+            try:
+                result = session.get(
+                    f"{BASE_URL}v1/tasks/{task_id}",
+                    headers={**headers, "X-ModelScope-Task-Type": "image_generation"},
+                    timeout=max(0.1, min(deadline - time.monotonic(), REQUEST_TIMEOUT)),
+                )
+            except requests.RequestException as e:
+                # Dropped or hung connections are retried like error responses
+                stats.errors += 1
+                log(f"Error checking status: {e}")
+                continue
+
+            hint = retry_after_seconds(result)
+            if limiter is not None:
+                limiter.record(result.status_code, hint)
+            if hint is not None:
+                delay = hint
+
+            if result.status_code == 404:
+                raise TaskNotFound(f"Task not found: {task_id}")
+
+            if result.status_code != 200:
+                stats.errors += 1
+                log(f"Error checking status: {result.status_code}")
+                continue
+
+            data = result.json()
+            status = data.get("task_status", "UNKNOWN")
+            log(f"Status: {status}")
+
+            if status == "SUCCEED":
+                stats.time_to_success = time.monotonic() - start
+                return data
+
+            elif status == "FAILED":
+                message = "Image Generation Failed."
+                if "error" in data:
+                    message += f"\nError: {data['error']}"
+                raise TaskFailed(message)
+    finally:
+        stats.elapsed = time.monotonic() - start
+
+def sniff_format(head: bytes, content_type: str = "") -> Optional[str]:
+    """Image format from the first bytes of a file, falling back to its Content-Type"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    return CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+
+def parse_size(value: str) -> Tuple[int, int]:
+    """Parse a WxH size such as 1024x768"""
+    width, sep, height = value.lower().partition("x")
+    if not sep or not width.isdigit() or not height.isdigit() or int(width) < 1 or int(height) < 1:
+        raise ValueError(f"invalid size {value!r}, expected WIDTHxHEIGHT")
+    return int(width), int(height)
+
+def convert_image(source: str, output_path: str, fmt: str, resize: Optional[Tuple[int, int]] = None) -> None:
+    """Re-encode an image file as `fmt`, optionally resized. Runs in a worker process."""
+    with Image.open(source) as image:
+        if resize:
+            image = image.resize(resize, Image.LANCZOS)
+        if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(output_path, format=fmt, quality=95)
+
+def get_convert_pool() -> ProcessPoolExecutor:
+    """Worker processes for image conversion, started on first use"""
+    global _convert_pool
+    with _convert_pool_lock:
+        if _convert_pool is None:
+            _convert_pool = ProcessPoolExecutor()
+        return _convert_pool
+
+def download_file(session: requests.Session, url: str, path: str) -> Optional[str]:
+    """
+    Stream an image to `path` in chunks as it arrives.
+
+    Returns:
+        The image format (from magic bytes, then Content-Type), or None if unknown
+
+    Raises:
+        GenerationError: If the download fails
+    """
+    try:
+        with session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            if response.status_code != 200:
+                raise GenerationError(f"Error downloading image: {response.status_code}")
+
+            source_format = None
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    if source_format is None:
+                        source_format = sniff_format(chunk, response.headers.get("Content-Type", ""))
+                    f.write(chunk)
+            return source_format
+    except requests.RequestException as e:
+        raise GenerationError(f"Error downloading image: {e}")
+
+def save_image(
+    source: str,
+    source_format: Optional[str],
+    output_path: str,
+    resize: Optional[Tuple[int, int]] = None
+) -> None:
+    """
+    Move a downloaded image file to `output_path`.
+
+    The file is kept byte-for-byte when its format matches the output
+    extension. Only a format change or a resize decodes and re-encodes it
+    (in a worker process, needs Pillow); `source` is left in place then.
+
+    Raises:
+        GenerationError: If a needed conversion is impossible
+    """
+    target_format = IMAGE_FORMATS.get(Path(output_path).suffix.lower())
+
+    # Unknown formats on either side are kept as downloaded
+    needs_convert = resize is not None or (
+        target_format is not None and source_format is not None and source_format != target_format
+    )
+    if not needs_convert:
+        os.replace(source, output_path)
+        return
+
+    if not HAS_PIL:
+        raise GenerationError(
+            f"Pillow is required to save a {source_format} image as {Path(output_path).name}"
+            f"{' with --resize' if resize else ''}: pip install pillow"
+        )
+
+    get_convert_pool().submit(
+        convert_image, source, output_path, target_format or source_format, resize
+    ).result()
+
+def make_variants(paths: List[str], specs: List[VariantSpec]) -> List[str]:
+    """
+    Build the variants of every image in the conversion worker processes,
+    skipping images whose manifest is already up to date.
+
+    Returns:
+        Paths of the written manifests
+    """
+    if not HAS_PIL:
+        raise GenerationError("Pillow is required for --variants: pip install pillow")
+    try:
+        futures = [get_convert_pool().submit(build_variants, path, specs) for path in paths if not is_current(path)]
+        return [future.result() for future in futures]
+    except (OSError, ValueError) as e:
+        raise GenerationError(f"Error building variants: {e}")
+
+def build_payload(
+    prompt: str,
+    model: str = DEFAULT_MODEL,
+    loras: Optional[str | Dict[str, float]] = None,
+    n: int = 1
+) -> Dict[str, Any]:
+    """Request body for POST /v1/images/generations"""
+    payload = {
+        "model": model,
+        "prompt": prompt
+    }
+
+    if loras is not None:
+        payload["loras"] = loras
+
+    if n > 1:
+        payload["n"] = n
+
+    return payload
+
+def finished_outputs(entry: Optional[JournalEntry], output_path: str) -> Optional[List[str]]:
+    """Saved images of a job the journal records as done, if they all still exist"""
+    if entry is None or entry.state != SUCCEEDED:
+        return None
+    # Journals written before multi-image tasks only know the output path
+    outputs = entry.outputs or [output_path]
+    return outputs if all(map(os.path.exists, outputs)) else None
+
+def indexed_path(output_path: str, index: int) -> str:
+    """cat.jpg -> cat_2.jpg for the second image of a task"""
+    path = Path(output_path)
+    return str(path.with_name(f"{path.stem}_{index}{path.suffix}"))
+
+def output_paths(output_path: str, count: int, n: int = 1) -> List[str]:
+    """Where the `count` images of a task go: `output_path` itself for single-image requests"""
+    if n == 1 and count == 1:
+        return [output_path]
+    return [indexed_path(output_path, index) for index in range(1, count + 1)]
+
+def save_images(
+    sources: List[str],
+    source_formats: List[Optional[str]],
+    output_path: str,
+    n: int = 1,
+    resize: Optional[Tuple[int, int]] = None
+) -> List[str]:
+    """save_image() for every image of a task, concurrently. Returns the saved paths."""
+    paths = output_paths(output_path, len(sources), n)
+    if len(sources) == 1:
+        save_image(sources[0], source_formats[0], paths[0], resize)
+        return paths
+
+    with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+        list(pool.map(lambda args: save_image(*args, resize), zip(sources, source_formats, paths)))
+    return paths
+
+def submit_task(
+    session: requests.Session,
+    payload: Dict[str, Any],
+    headers: Dict[str, str],
+    limiter: Optional[RateLimiter] = None,
+    log=print
+) -> str:
+    """
+    Submit an async generation task and return its task id.
+    429, 5xx and connection errors are retried after the limiter's shared backoff.
+    """
+    if limiter is None:
+        limiter = RateLimiter()
+
+    for attempt in range(1, SUBMIT_ATTEMPTS + 1):
+        limiter.before_submit()
+        try:
+            response = session.post(
+                f"{BASE_URL}v1/images/generations",
+                headers={**headers, "X-ModelScope-Async-Mode": "true"},
+                data=json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+                timeout=REQUEST_TIMEOUT
+            )
+        except requests.RequestException as e:
+            # Dropped or hung connections back off and retry like a 503
+            limiter.record(503)
+            if attempt == SUBMIT_ATTEMPTS:
+                raise GenerationError(f"Error submitting task: {e}")
+            log(f"Submit failed ({e}), retrying")
+            continue
+
+        if response.status_code == 200:
+            limiter.record(200)
+            try:
+                return response.json()["task_id"]
+            except (ValueError, KeyError, TypeError):
+                raise GenerationError(f"Error submitting task: unexpected response\n{response.text}")
+
+        retry = limiter.record(response.status_code, retry_after_seconds(response))
+        if not retry or attempt == SUBMIT_ATTEMPTS:
+            raise GenerationError(f"Error submitting task: {response.status_code}\n{response.text}")
+        log(f"Submit throttled ({response.status_code}), retrying")
+
 def generate_image(
     prompt: str,
-    model: str = "Tongyi-MAI/Z-Image-Turbo",
+    model: str = DEFAULT_MODEL,
     loras: Optional[str | Dict[str, float]] = None,
     output_path: Optional[str] = None,
-    api_key: Optional[str] = None
-) -> str:
+    api_key: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+    verbose: bool = True,
+    poll_policy: Optional[PollPolicy] = None,
+    stats: Optional[PollStats] = None,
+    resize: Optional[Tuple[int, int]] = None,
+    cache: Optional[ResultCache] = None,
+    journal: Optional[JobJournal] = None,
+    limiter: Optional[RateLimiter] = None,
+    n: int = 1,
+    variants: Optional[List[VariantSpec]] = None
+) -> List[str]:
     """
-    Generate an image using Model ModelScope API
+    Generate images using Model ModelScope API
 
     Args:
         prompt: Text prompt for image generation
@@ -126,99 +551,442 @@ def generate_image(
         loras: Optional LoRA config - either string (single) or dict (multiple)
         output_path: Optional output file path (default: result_image.jpg)
         api_key: Optional API key (default: from env or config)
+        session: Optional shared HTTP session (default: a new one for this call)
+        verbose: Print progress (task id, status, download)
+        poll_policy: Optional polling intervals and deadline (default: PollPolicy())
+        stats: Optional PollStats to record poll count and time to success in
+        resize: Optional (width, height) to resize the image to (needs Pillow)
+        cache: Optional result cache; a hit needs no API key or network
+        journal: Optional job journal; finished jobs are skipped and tasks
+            submitted by an interrupted run are polled instead of resubmitted
+        limiter: Optional request budgets and in-flight cap, shared across
+            threads (default: no limits, backoff on 429/5xx only)
+        n: Images to request from the one task; with n > 1 they are saved as
+            output_1.jpg, output_2.jpg, ... (the server may return fewer)
+        variants: Optional sizes/formats to derive from each image, with a
+            sidecar manifest (needs Pillow; runs in worker processes)
 
     Returns:
-        Path to generated image
+        Paths of the generated images
+
+    Raises:
+        GenerationError: If the task cannot be submitted, fails or times out
     """
-    if api_key is None:
-        api_key = get_api_key()
+    log = print if verbose else (lambda *args, **kwargs: None)
+
+    if stats is None:
+        stats = PollStats()
 
     if output_path is None:
         output_path = "result_image.jpg"
 
-    common_headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
+    payload = build_payload(prompt, model, loras, n)
+    job_key = make_cache_key(payload, BASE_URL)
+
+    entry = journal.get(job_key, output_path) if journal is not None else None
+    done = finished_outputs(entry, output_path)
+    if done is not None:
+        stats.skipped = True
+        log(f"Already done: {', '.join(done)}")
+        if variants:
+            for manifest in make_variants(done, variants):
+                log(f"Variants: {manifest}")
+        return done
+
+    # A cached result needs no API key, task or download
+    cached = cache.get(job_key) if cache is not None else None
+    if cached is not None:
+        stats.cached = True
+        partial_paths = [f"{path}.part" for path in output_paths(output_path, len(cached), n)]
+        try:
+            source_formats = []
+            for cached_path, partial_path in zip(cached, partial_paths):
+                shutil.copyfile(cached_path, partial_path)
+                with open(partial_path, "rb") as f:
+                    source_formats.append(sniff_format(f.read(16)))
+            paths = save_images(partial_paths, source_formats, output_path, n, resize)
+        finally:
+            for partial_path in partial_paths:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+        if journal is not None:
+            journal.succeeded(job_key, output_path, payload, paths)
+        log(f"Cache hit: {', '.join(paths)}")
+        if variants:
+            for manifest in make_variants(paths, variants):
+                log(f"Variants: {manifest}")
+        return paths
 
-    # Build request payload
-    payload = {
-        "model": model,
-        "prompt": prompt
-    }
+    if api_key is None:
+        api_key = get_api_key()
 
-    if loras is not None:
-        payload["loras"] = loras
+    if session is None:
+        session = create_session(n)
 
-    # Submit generation task
-    response = requests.post(
-        f"{BASE_URL}v1/images/generations",
-        headers={**common_headers, "X-ModelScope-Async-Mode": "true"},
-        data=json.dumps(payload, ensure_ascii=False).encode('utf-8')
-    )
+    if poll_policy is None:
+        poll_policy = PollPolicy()
 
-    if response.status_code != 200:
-        print(f"Error submitting task: {response.status_code}")
-        print(response.text)
-        sys.exit(1)
+    if limiter is None:
+        limiter = RateLimiter()
 
-    task_id = response.json()["task_id"]
-    print(f"Task submitted: {task_id}")
+    common_headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
 
-    # Poll for completion
-    max_attempts = 60  # 5 minutes max
-    for attempt in range(max_attempts):
-        result = requests.get(
-            f"{BASE_URL}v1/tasks/{task_id}",
-            headers={**common_headers, "X-ModelScope-Task-Type": "image_generation"},
-        )
+    try:
+        # One in-flight slot from submission until the server is done with the task
+        with limiter.task_slot():
+            data = None
+            if entry is not None and entry.state == SUBMITTED:
+                # Submitted by an earlier run that didn't finish: poll it again
+                stats.resumed = True
+                log(f"Resuming task: {entry.task_id}")
+                try:
+                    data = poll_task(session, entry.task_id, common_headers, poll_policy, stats, log, limiter)
+                except TaskNotFound:
+                    log("Task expired, submitting again")
+
+            if data is None:
+                task_id = submit_task(session, payload, common_headers, limiter, log)
+                log(f"Task submitted: {task_id}")
+                if journal is not None:
+                    journal.submitted(job_key, output_path, payload, task_id)
+
+                # Poll for completion
+                data = poll_task(session, task_id, common_headers, poll_policy, stats, log, limiter)
+    except TaskFailed as e:
+        if journal is not None:
+            journal.failed(job_key, output_path, payload, str(e))
+        raise
+    log(f"Ready after {stats.time_to_success:.1f}s ({stats.polls} polls)")
+
+    image_urls = data.get("output_images") or []
+    if not image_urls:
+        raise GenerationError("Task succeeded but returned no images")
+    for image_url in image_urls:
+        log(f"Downloading from: {image_url}")
+
+    # All images of the task download at once over the shared connection pool
+    partial_paths = [f"{path}.part" for path in output_paths(output_path, len(image_urls), n)]
+    try:
+        with ThreadPoolExecutor(max_workers=len(image_urls)) as pool:
+            source_formats = list(pool.map(
+                lambda args: download_file(session, *args), zip(image_urls, partial_paths)
+            ))
+        if cache is not None:
+            cache.put(job_key, partial_paths)
+        paths = save_images(partial_paths, source_formats, output_path, n, resize)
+    finally:
+        for partial_path in partial_paths:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+    if journal is not None:
+        journal.succeeded(job_key, output_path, payload, paths)
+    for path in paths:
+        log(f"Image saved to: {path}")
+    if variants:
+        for manifest in make_variants(paths, variants):
+            log(f"Variants: {manifest}")
+    return paths
+
+def read_batch_file(
+    path: str,
+    output_dir: str,
+    model: str = DEFAULT_MODEL,
+    extension: str = ".jpg",
+    n: int = 1
+) -> List[BatchJob]:
+    """
+    Read batch jobs from a file ('-' for stdin).
+
+    Each non-empty line is either a plain prompt or a JSON object with
+    "prompt" and optional "output", "model", "loras" and "n" keys. Lines
+    starting with '#' are skipped. Outputs default to
+    <output_dir>/image_0001.jpg etc.
+    """
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
 
-        if result.status_code != 200:
-            print(f"Error checking status: {result.status_code}")
-            time.sleep(5)
+    jobs = []
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
             continue
 
-        data = result.json()
-        status = data.get("task_status", "UNKNOWN")
-        print(f"Status: {status}")
+        default_output = os.path.join(output_dir, f"image_{len(jobs) + 1:04d}{extension}")
+        if line.startswith('{'):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON: {e}")
+            if not entry.get('prompt'):
+                raise ValueError(f"{path}:{line_no}: missing \"prompt\"")
+            jobs.append(BatchJob(
+                entry['prompt'],
+                entry.get('output') or default_output,
+                entry.get('model') or model,
+                entry.get('loras'),
+                int(entry.get('n') or n)
+            ))
+        else:
+            jobs.append(BatchJob(line, default_output, model, None, n))
+
+    return jobs
+
+def generate_batch(
+    jobs: List[BatchJob],
+    api_key: Optional[str] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    session: Optional[requests.Session] = None,
+    poll_policy: Optional[PollPolicy] = None,
+    resize: Optional[Tuple[int, int]] = None,
+    cache: Optional[ResultCache] = None,
+    journal: Optional[JobJournal] = None,
+    limiter: Optional[RateLimiter] = None,
+    variants: Optional[List[VariantSpec]] = None
+) -> Iterator[BatchResult]:
+    """
+    Generate many images over one pooled session, at most `concurrency` at a time.
+
+    Yields a BatchResult as each job finishes, in completion order; one
+    failed job does not stop the others. The API key is only looked up if
+    some job is neither finished in the journal nor in the cache. All jobs
+    share one limiter, so a 429 on one task slows down every task.
+    Variants are built in worker processes while other tasks keep polling.
+    """
+    def needs_api(job: BatchJob) -> bool:
+        job_key = make_cache_key(build_payload(job.prompt, job.model, job.loras, job.n), BASE_URL)
+        if journal is not None and finished_outputs(journal.get(job_key, job.output_path), job.output_path):
+            return False
+        return cache is None or not cache.contains(job_key)
 
-        if status == "SUCCEED":
-            image_url = data["output_images"][0]
-            print(f"Downloading from: {image_url}")
+    if api_key is None and any(needs_api(job) for job in jobs):
+        api_key = get_api_key()
 
-            img_response = requests.get(image_url)
-            image = Image.open(BytesIO(img_response.content))
-            image.save(output_path)
-            print(f"Image saved to: {output_path}")
-            return output_path
+    if session is None:
+        # Room for every image of every concurrent task to download at once
+        session = create_session(concurrency * max(job.n for job in jobs))
+
+    if limiter is None:
+        limiter = RateLimiter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {}
+        for job in jobs:
+            stats = PollStats()
+            future = pool.submit(
+                generate_image, job.prompt, job.model, job.loras, job.output_path,
+                api_key=api_key,
+                session=session,
+                verbose=False,
+                poll_policy=poll_policy,
+                stats=stats,
+                resize=resize,
+                cache=cache,
+                journal=journal,
+                limiter=limiter,
+                n=job.n,
+                variants=variants
+            )
+            futures[future] = (job, stats)
+
+        for future in as_completed(futures):
+            job, stats = futures[future]
+            try:
+                yield BatchResult(job, future.result(), None, stats)
+            except Exception as e:
+                yield BatchResult(job, None, e, stats)
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+def print_poll_summary(results: List[BatchResult]) -> None:
+    """Per-model polling stats, for tuning --poll-interval and --timeout"""
+    by_model: Dict[str, List[BatchResult]] = {}
+    for result in results:
+        if not result.stats.cached and not result.stats.skipped:
+            by_model.setdefault(result.job.model, []).append(result)
+    if not by_model:
+        return
+
+    print("\nPolling:")
+    for model, model_results in sorted(by_model.items()):
+        ready = [r.stats.time_to_success for r in model_results if r.stats.time_to_success is not None]
+        polls = sum(r.stats.polls for r in model_results)
+        line = f"  {model}: {polls / len(model_results):.1f} polls/task"
+        if ready:
+            line += f", ready after p50 {percentile(ready, 50):.1f}s / p90 {percentile(ready, 90):.1f}s"
+        print(line)
+
+def poll_policy_from_args(args) -> PollPolicy:
+    return PollPolicy(
+        initial=args.poll_interval,
+        max_interval=max(args.poll_interval, args.max_poll_interval),
+        deadline=args.timeout
+    )
 
-        elif status == "FAILED":
-            print("Image Generation Failed.")
-            if "error" in data:
-                print(f"Error: {data['error']}")
-            sys.exit(1)
+def limiter_from_args(args) -> RateLimiter:
+    return RateLimiter(args.submit_rate, args.poll_rate, args.max_inflight)
 
-        time.sleep(5)
+def run_batch(
+    args,
+    cache: Optional[ResultCache] = None,
+    journal: Optional[JobJournal] = None,
+    limiter: Optional[RateLimiter] = None
+) -> None:
+    """CLI batch mode: print each result as it completes, then a summary"""
+    try:
+        jobs = read_batch_file(args.batch, args.output_dir, args.model, n=args.num_images)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
 
-    print("Timeout: Image generation took too long")
-    sys.exit(1)
+    if not jobs:
+        print("No prompts found.")
+        return
+
+    for job in jobs:
+        Path(job.output_path).parent.mkdir(parents=True, exist_ok=True)
+
+    print(f"Generating {len(jobs)} prompt(s), {args.concurrency} at a time")
+    start = time.time()
+    done = 0
+    failed = 0
+    results = []
+    results_iter = generate_batch(
+        jobs,
+        concurrency=args.concurrency,
+        poll_policy=poll_policy_from_args(args),
+        resize=args.resize,
+        cache=cache,
+        journal=journal,
+        limiter=limiter,
+        variants=args.variants
+    )
+    for result in results_iter:
+        results.append(result)
+        if result.error is None:
+            done += 1
+            if result.stats.skipped:
+                label = "Done earlier"
+            elif result.stats.cached:
+                label = "Cached"
+            elif result.stats.resumed:
+                label = "Saved (resumed)"
+            else:
+                label = "Saved"
+            print(f"[{done + failed}/{len(jobs)}] {label}: {', '.join(result.paths)}")
+        else:
+            failed += 1
+            print(f"[{done + failed}/{len(jobs)}] Failed: {result.job.prompt[:60]!r}: {result.error}")
+
+    elapsed = time.time() - start
+    print_poll_summary(results)
+    if limiter is not None and limiter.throttled:
+        print(f"\nThrottled: {limiter.throttled} 429/5xx response(s), paused {limiter.paused:.1f}s in total")
+    if cache is not None:
+        print(f"\nCache: {cache.hits} hit(s), {cache.misses} miss(es)")
+    if journal is not None:
+        skipped = sum(1 for r in results if r.stats.skipped)
+        resumed = sum(1 for r in results if r.stats.resumed)
+        print(f"Journal: {skipped} done earlier, {resumed} resumed ({journal.path})")
+    images = sum(len(r.paths) for r in results if r.error is None)
+    print(f"\nDone! {done}/{len(jobs)} prompts, {images} image(s) generated in {elapsed:.1f}s")
+    if failed:
+        sys.exit(1)
 
 def main():
     """CLI entry point"""
     import argparse
 
     parser = argparse.ArgumentParser(description="Generate images using ModelScope Z-Image models")
-    parser.add_argument("prompt", help="Text prompt for image generation")
+    parser.add_argument("prompt", nargs="?", help="Text prompt for image generation")
     parser.add_argument("output_path", nargs="?", default=None, help="Output file path (default: result_image.jpg)")
-    parser.add_argument("--model", default="Tongyi-MAI/Z-Image-Turbo", help="Model ID to use (default: Tongyi-MAI/Z-Image-Turbo)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help=f"Model ID to use (default: {DEFAULT_MODEL})")
+    parser.add_argument("-n", "--num-images", type=int, default=1, help="Images per prompt, generated by one task and saved as NAME_1.jpg, NAME_2.jpg, ... (default: 1)")
+    parser.add_argument("--batch", metavar="FILE", help="Generate one image per line of FILE ('-' for stdin): a prompt or a JSON object")
+    parser.add_argument("--output-dir", default="output", help="Batch mode output directory (default: output)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"Batch mode images generated at once (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help=f"Seconds to wait for a task before giving up (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument("--poll-interval", type=float, default=PollPolicy().initial, help="Seconds before the first status check; later checks back off (default: 1)")
+    parser.add_argument("--max-poll-interval", type=float, default=PollPolicy().max_interval, help="Longest wait between status checks (default: 10)")
+    parser.add_argument("--resize", metavar="WxH", help="Resize images to WIDTHxHEIGHT (needs Pillow)")
+    parser.add_argument("--variants", nargs="?", const=DEFAULT_VARIANTS, metavar="SPEC", help=f"Also write NAME:SIZE:FORMAT variants and a .variants.json manifest per image (needs Pillow; default spec: {DEFAULT_VARIANTS})")
+    parser.add_argument("--submit-rate", type=float, help="Max task submissions per second (default: no limit)")
+    parser.add_argument("--poll-rate", type=float, help="Max status checks per second across all tasks (default: no limit)")
+    parser.add_argument("--max-inflight", type=int, help="Max tasks queued or running on the server at once, e.g. your account's cap (default: --concurrency)")
+    parser.add_argument("--base-url", help=f"API base URL (default: $MODELSCOPE_BASE_URL or {DEFAULT_BASE_URL})")
+    parser.add_argument("--journal", metavar="PATH", help="SQLite job journal: re-running resumes submitted tasks and skips finished ones")
+    parser.add_argument("--no-cache", action="store_true", help="Always submit a new task, bypassing the result cache")
+    parser.add_argument("--cache-dir", help="Result cache directory (default: ~/.cache/modelscope/images)")
+    parser.add_argument("--cache-max-size", type=int, default=DEFAULT_MAX_SIZE_MB, help=f"Result cache size limit in MB (default: {DEFAULT_MAX_SIZE_MB})")
 
     args = parser.parse_args()
 
-    generate_image(
-        args.prompt,
-        model=args.model,
-        output_path=args.output_path
-    )
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.num_images < 1:
+        parser.error("--num-images must be at least 1")
+    if args.timeout <= 0 or args.poll_interval <= 0:
+        parser.error("--timeout and --poll-interval must be positive")
+    for name in ("submit_rate", "poll_rate", "max_inflight"):
+        value = getattr(args, name)
+        if value is not None and value <= 0:
+            parser.error(f"--{name.replace('_', '-')} must be positive")
+    if args.resize:
+        try:
+            args.resize = parse_size(args.resize)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.variants:
+        if not HAS_PIL:
+            parser.error("--variants needs Pillow: pip install pillow")
+        try:
+            args.variants = parse_variants(args.variants)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.base_url:
+        set_base_url(args.base_url)
+
+    if not args.batch and not args.prompt:
+        parser.error("a prompt is required (or use --batch)")
+
+    cache = open_cache(args.cache_dir, args.cache_max_size, enabled=not args.no_cache)
+    journal = JobJournal(args.journal) if args.journal else None
+    limiter = limiter_from_args(args)
+    try:
+        if args.batch:
+            run_batch(args, cache, journal, limiter)
+            return
+
+        generate_image(
+            args.prompt,
+            model=args.model,
+            output_path=args.output_path,
+            poll_policy=poll_policy_from_args(args),
+            resize=args.resize,
+            cache=cache,
+            journal=journal,
+            limiter=limiter,
+            n=args.num_images,
+            variants=args.variants
+        )
+    except GenerationError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.evict()
+        if journal is not None:
+            journal.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+ModelScope Job Journal
+SQLite record of every submitted generation task, so an interrupted batch
+can be re-run without paying for tasks again: submitted tasks are polled
+again by task_id and finished jobs are skipped.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# Job states
+SUBMITTED = 'submitted'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_key TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    task_id TEXT,
+    state TEXT NOT NULL,
+    error TEXT,
+    outputs TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (job_key, output_path)
+)
+"""
+
+
+class JournalEntry(NamedTuple):
+    """Recorded state of one job."""
+    state: str
+    task_id: Optional[str]
+    error: Optional[str]
+    outputs: List[str]  # saved image paths once succeeded
+
+
+class JobJournal:
+    """
+    Jobs identified by (payload hash, output path). Every state change is
+    committed immediately, so the journal survives the process being killed
+    at any point. Thread-safe.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        # WAL keeps commits cheap when thousands of jobs update the journal
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        if 'outputs' not in columns:
+            # Journals written before multi-image tasks
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN outputs TEXT")
+        self._conn.commit()
+
+    def get(self, job_key: str, output_path: str) -> Optional[JournalEntry]:
+        """Recorded state of a job, or None if it was never submitted."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, task_id, error, outputs FROM jobs WHERE job_key = ? AND output_path = ?",
+                (job_key, output_path)
+            ).fetchone()
+        if not row:
+            return None
+        state, task_id, error, outputs = row
+        return JournalEntry(state, task_id, error, json.loads(outputs) if outputs else [])
+
+    def _write(self, job_key: str, output_path: str, payload: Dict[str, Any], **fields: Any) -> None:
+        fields['payload'] = json.dumps(payload, ensure_ascii=False)
+        fields['updated'] = time.time()
+        columns = ', '.join(fields)
+        placeholders = ', '.join('?' for _ in fields)
+        updates = ', '.join(f"{name} = excluded.{name}" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs (job_key, output_path, {columns}) VALUES (?, ?, {placeholders}) "
+                f"ON CONFLICT (job_key, output_path) DO UPDATE SET {updates}",
+                (job_key, output_path, *fields.values())
+            )
+            self._conn.commit()
+
+    def submitted(self, job_key: str, output_path: str, payload: Dict[str, Any], task_id: str) -> None:
+        """Record a task right after submission, before polling starts."""
+        self._write(job_key, output_path, payload, task_id=task_id, state=SUBMITTED, error=None)
+
+    def succeeded(self, job_key: str, output_path: str, payload: Dict[str, Any], outputs: List[str]) -> None:
+        self._write(job_key, output_path, payload, state=SUCCEEDED, outputs=json.dumps(outputs, ensure_ascii=False))
+
+    def failed(self, job_key: str, output_path: str, payload: Dict[str, Any], error: str) -> None:
+        self._write(job_key, output_path, payload, state=FAILED, error=error)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
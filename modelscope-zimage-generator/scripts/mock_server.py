@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Mock ModelScope Server
+Local stand-in for the ModelScope async image API, for load-testing
+generate_image.py without spending quota. Implements task submission, task
+polling and image download, with configurable queue delay, failure rate and
+429 responses (random, or once too many tasks are running).
+
+Usage:
+    python mock_server.py --port 8000 --delay 5 --failure-rate 0.05 --rate-limit 0.1 --max-tasks 8
+    MODELSCOPE_BASE_URL=http://127.0.0.1:8000/ MODELSCOPE_API_KEY=ms-mock \\
+        python generate_image.py "A cat" cat.jpg
+
+GET /stats returns request counters as JSON.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+def make_jpeg(width: int = 64, height: int = 64, size: int = 0) -> bytes:
+    """
+    A valid mid-grey baseline JPEG, built without an image library.
+    Every 8x8 block codes DC difference 0 and an immediate end-of-block
+    with one-symbol Huffman tables. Comment segments pad it to `size` bytes.
+    """
+    def segment(marker: int, body: bytes) -> bytes:
+        return struct.pack('>HH', marker, len(body) + 2) + body
+
+    blocks = -(-width // 8) * -(-height // 8)
+    bits = 2 * blocks  # '0' DC category 0, '0' end-of-block
+    scan = b'\x00' * (bits // 8)
+    if bits % 8:
+        # Pad the last byte with 1 bits
+        scan += bytes([(1 << (8 - bits % 8)) - 1])
+
+    header = b''.join([
+        b'\xff\xd8',
+        segment(0xFFE0, b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'),
+        segment(0xFFDB, b'\x00' + b'\x01' * 64),
+        segment(0xFFC0, struct.pack('>BHHB', 8, height, width, 1) + b'\x01\x11\x00'),
+        segment(0xFFC4, b'\x00' + b'\x01' + b'\x00' * 15 + b'\x00'),
+        segment(0xFFC4, b'\x10' + b'\x01' + b'\x00' * 15 + b'\x00'),
+    ])
+    trailer = segment(0xFFDA, b'\x01\x01\x00\x00\x3f\x00') + scan + b'\xff\xd9'
+
+    padding = b''
+    remaining = size - len(header) - len(trailer)
+    while remaining > 4:
+        chunk = min(remaining - 4, 65533)
+        padding += segment(0xFFFE, b' ' * chunk)
+        remaining -= chunk + 4
+    return header + padding + trailer
+
+
+class MockTask:
+    """One submitted generation task."""
+
+    def __init__(self, task_id: str, payload: Dict, ready_at: float, fail: bool):
+        self.task_id = task_id
+        self.payload = payload
+        self.ready_at = ready_at
+        self.fail = fail
+        self.detected_at: Optional[float] = None  # first poll that saw it finished
+
+
+class MockState:
+    """Tasks and counters shared by all request handler threads."""
+
+    def __init__(
+        self,
+        delay: float = 5.0,
+        jitter: float = 0.3,
+        failure_rate: float = 0.0,
+        rate_limit: float = 0.0,
+        retry_after: float = 1.0,
+        image: bytes = b'',
+        max_tasks: int = 0
+    ):
+        self.delay = delay
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.image = image or make_jpeg()
+        self.max_tasks = max_tasks
+        self.tasks: Dict[str, MockTask] = {}
+        self.counters = {'submits': 0, 'polls': 0, 'downloads': 0, 'rate_limited': 0}
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counters[name] += 1
+
+    def create_task(self, payload: Dict) -> Optional[MockTask]:
+        """New task, or None when `max_tasks` are already running."""
+        delay = self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        now = time.time()
+        with self.lock:
+            if self.max_tasks and sum(1 for t in self.tasks.values() if t.ready_at > now) >= self.max_tasks:
+                return None
+            task_id = f"mock-{next(self._ids)}-{uuid.uuid4().hex[:8]}"
+            task = MockTask(task_id, payload, time.time() + delay, random.random() < self.failure_rate)
+            self.tasks[task_id] = task
+        return task
+
+    def detection_lags(self):
+        """Seconds between each finished task becoming ready and a poll seeing it."""
+        with self.lock:
+            return [t.detected_at - t.ready_at for t in self.tasks.values() if t.detected_at is not None]
+
+    def stats(self) -> Dict:
+        lags = self.detection_lags()
+        with self.lock:
+            stats = dict(self.counters)
+            stats['tasks'] = len(self.tasks)
+        stats['mean_detection_lag'] = sum(lags) / len(lags) if lags else None
+        return stats
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockModelScope/1.0'
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def send_json(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_bytes(status, json.dumps(body).encode('utf-8'), 'application/json', headers)
+
+    def send_bytes(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorized(self) -> bool:
+        if self.headers.get('Authorization', '').startswith('Bearer '):
+            return True
+        self.send_json(401, {'errors': {'message': 'Missing API key'}})
+        return False
+
+    def rate_limited(self, force: bool = False) -> bool:
+        if not force and random.random() >= self.state.rate_limit:
+            return False
+        self.state.count('rate_limited')
+        self.send_json(
+            429, {'errors': {'message': 'Rate limit exceeded'}},
+            {'Retry-After': format(self.state.retry_after, 'g')}
+        )
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if self.path.rstrip('/') != '/v1/images/generations':
+            self.send_json(404, {'errors': {'message': 'Not found'}})
+            return
+        if not self.authorized() or self.rate_limited():
+            return
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self.send_json(400, {'errors': {'message': 'Invalid JSON'}})
+            return
+        if not payload.get('prompt') or not payload.get('model'):
+            self.send_json(400, {'errors': {'message': '"model" and "prompt" are required'}})
+            return
+
+        task = self.state.create_task(payload)
+        if task is None:
+            # Account's concurrent task cap reached
+            self.rate_limited(force=True)
+            return
+        self.state.count('submits')
+        self.send_json(200, {'task_id': task.task_id, 'request_id': uuid.uuid4().hex})
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.send_json(200, self.state.stats())
+        elif self.path.startswith('/v1/tasks/'):
+            self.poll_task(self.path[len('/v1/tasks/'):])
+        elif self.path.startswith('/images/'):
+            self.download(self.path[len('/images/'):])
+        else:
+            self.send_json(404, {'errors': {'message': 'Not found'}})
+
+    def poll_task(self, task_id: str) -> None:
+        if not self.authorized() or self.rate_limited():
+            return
+        self.state.count('polls')
+        task = self.state.tasks.get(task_id)
+        if task is None:
+            self.send_json(404, {'errors': {'message': f'Task not found: {task_id}'}})
+            return
+
+        now = time.time()
+        if now < task.ready_at:
+            self.send_json(200, {'task_id': task_id, 'task_status': 'RUNNING'})
+            return
+
+        with self.state.lock:
+            if task.detected_at is None:
+                task.detected_at = now
+
+        if task.fail:
+            self.send_json(200, {'task_id': task_id, 'task_status': 'FAILED', 'error': 'Simulated failure'})
+            return
+
+        host = self.headers.get('Host') or '%s:%d' % self.server.server_address[:2]
+        count = max(1, int(task.payload.get('n') or 1))
+        self.send_json(200, {
+            'task_id': task_id,
+            'task_status': 'SUCCEED',
+            'output_images': [f"http://{host}/images/{task_id}_{index}.jpg" for index in range(1, count + 1)]
+        })
+
+    def download(self, name: str) -> None:
+        if name.rsplit('.', 1)[0].rsplit('_', 1)[0] not in self.state.tasks:
+            self.send_json(404, {'errors': {'message': 'Not found'}})
+            return
+        self.state.count('downloads')
+        self.send_bytes(200, self.state.image, 'image/jpeg')
+
+
+def create_server(host: str = '127.0.0.1', port: int = 0, state: Optional[MockState] = None, quiet: bool = True) -> ThreadingHTTPServer:
+    """Mock server bound to (host, port); port 0 picks a free one. Call serve_forever() to run it."""
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.state = state or MockState()
+    server.quiet = quiet
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local mock of the ModelScope async image generation API')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    parser.add_argument('--delay', type=float, default=5.0, help='Seconds a task spends queued and running (default: 5)')
+    parser.add_argument('--jitter', type=float, default=0.3, help='Random +/- fraction applied to --delay (default: 0.3)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of tasks that end FAILED (default: 0)')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Fraction of API requests answered 429 (default: 0)')
+    parser.add_argument('--max-tasks', type=int, default=0, help='Answer submits with 429 while this many tasks are running (default: no cap)')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429 responses (default: 1)')
+    parser.add_argument('--image', help='Image file to serve (default: a generated JPEG)')
+    parser.add_argument('--image-size', type=int, default=1024, metavar='PX', help='Width and height of the generated JPEG (default: 1024)')
+    parser.add_argument('--image-kb', type=int, default=0, help='Pad the generated JPEG to this many KB, to simulate real download sizes')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            image = f.read()
+    else:
+        image = make_jpeg(args.image_size, args.image_size, args.image_kb * 1024)
+
+    state = MockState(args.delay, args.jitter, args.failure_rate, args.rate_limit, args.retry_after, image, args.max_tasks)
+    server = create_server(args.host, args.port, state, quiet=not args.verbose)
+    host, port = server.server_address[:2]
+    print(f"Mock ModelScope API on http://{host}:{port}/")
+    print(f"Use: MODELSCOPE_BASE_URL=http://{host}:{port}/ MODELSCOPE_API_KEY=ms-mock python generate_image.py ...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+ModelScope Rate Limiting
+Client-side request budgets shared by every task of a run: token buckets for
+submit and poll requests, a global pause after 429/5xx responses, and a cap
+on tasks in flight on the server.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+MAX_BACKOFF = 60.0  # seconds
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts of up to one
+    second's worth. Thread-safe; callers queue in arrival order.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until it is available. Returns seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve the token now; going negative queues later callers behind us
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """
+    Shared by all threads of a batch. `submit_rate` / `poll_rate` are requests
+    per second (None for no limit); `max_inflight` caps tasks submitted but
+    not yet finished (None for no cap). A 429 or 5xx response pauses every
+    request for its Retry-After, or an exponentially growing backoff.
+    """
+
+    def __init__(
+        self,
+        submit_rate: Optional[float] = None,
+        poll_rate: Optional[float] = None,
+        max_inflight: Optional[int] = None
+    ):
+        self.submit_bucket = TokenBucket(submit_rate) if submit_rate else None
+        self.poll_bucket = TokenBucket(poll_rate) if poll_rate else None
+        self.inflight = threading.BoundedSemaphore(max_inflight) if max_inflight else None
+        self.throttled = 0        # 429/5xx responses seen
+        self.paused = 0.0         # seconds of global backoff imposed
+        self._pause_until = 0.0
+        self._consecutive = 0
+        self._lock = threading.Lock()
+
+    def _wait_pause(self) -> None:
+        while True:
+            with self._lock:
+                delay = self._pause_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def before_submit(self) -> None:
+        """Block until a submit request may be sent."""
+        self._wait_pause()
+        if self.submit_bucket is not None:
+            self.submit_bucket.acquire()
+
+    def before_poll(self) -> None:
+        """Block until a poll request may be sent."""
+        self._wait_pause()
+        if self.poll_bucket is not None:
+            self.poll_bucket.acquire()
+
+    def record(self, status_code: int, retry_after: Optional[float] = None) -> bool:
+        """
+        Note a response. Returns True (and pauses all requests) if it was a
+        429 or 5xx that should be retried.
+        """
+        if status_code != 429 and status_code < 500:
+            with self._lock:
+                self._consecutive = 0
+            return False
+
+        with self._lock:
+            self.throttled += 1
+            self._consecutive += 1
+            if retry_after is None:
+                backoff = min(MAX_BACKOFF, 2 ** (self._consecutive - 1))
+                retry_after = backoff * random.uniform(0.5, 1.0)
+            now = time.monotonic()
+            until = now + retry_after
+            if until > self._pause_until:
+                self.paused += until - max(now, self._pause_until)
+                self._pause_until = until
+        return True
+
+    @contextmanager
+    def task_slot(self) -> Iterator[None]:
+        """Hold one of the `max_inflight` task slots while a task runs on the server."""
+        if self.inflight is None:
+            yield
+            return
+        self.inflight.acquire()
+        try:
+            yield
+        finally:
+            self.inflight.release()
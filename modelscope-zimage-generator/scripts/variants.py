@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+ModelScope Image Variants
+Derive a set of sizes and formats (thumbnail, web-size WebP, full-size JPEG,
+...) from a generated image, decoding it only once, and describe them in a
+sidecar JSON manifest. build_variants() runs in worker processes.
+
+Spec syntax, comma separated: NAME:SIZE:FORMAT[:QUALITY]
+    SIZE    320 (fit in 320x320), 1280x720 (fit in the box) or full
+    FORMAT  jpg, png or webp
+
+    thumb:320:jpg,web:1280:webp,full:full:jpg
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Pillow is needed to build variants
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+DEFAULT_VARIANTS = 'thumb:320:jpg,web:1280:webp,full:full:jpg'
+DEFAULT_QUALITY = 85
+
+VARIANT_FORMATS = {
+    'jpg': 'JPEG',
+    'jpeg': 'JPEG',
+    'png': 'PNG',
+    'webp': 'WEBP',
+}
+
+
+class VariantSpec(NamedTuple):
+    """One derived image: `size` is the box it must fit in, None for full size."""
+    name: str
+    size: Optional[Tuple[int, int]]
+    extension: str
+    quality: int = DEFAULT_QUALITY
+
+
+def parse_variants(spec: str) -> List[VariantSpec]:
+    """Parse a NAME:SIZE:FORMAT[:QUALITY],... spec. Raises ValueError."""
+    variants = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        parts = item.split(':')
+        if len(parts) not in (3, 4):
+            raise ValueError(f"invalid variant {item!r}, expected NAME:SIZE:FORMAT[:QUALITY]")
+        name, size, extension = parts[0], parts[1].lower(), parts[2].lower()
+
+        if not name or not name.replace('-', '').replace('_', '').isalnum():
+            raise ValueError(f"invalid variant name {name!r}")
+        if extension not in VARIANT_FORMATS:
+            raise ValueError(f"unknown variant format {extension!r} (use {', '.join(VARIANT_FORMATS)})")
+
+        if size == 'full':
+            box = None
+        else:
+            width, _, height = size.partition('x')
+            height = height or width
+            if not width.isdigit() or not height.isdigit() or int(width) < 1 or int(height) < 1:
+                raise ValueError(f"invalid variant size {parts[1]!r}")
+            box = (int(width), int(height))
+
+        quality = DEFAULT_QUALITY
+        if len(parts) == 4:
+            if not parts[3].isdigit() or not 1 <= int(parts[3]) <= 100:
+                raise ValueError(f"invalid variant quality {parts[3]!r} (1-100)")
+            quality = int(parts[3])
+
+        variants.append(VariantSpec(name, box, extension, quality))
+
+    names = [v.name for v in variants]
+    if len(set(names)) != len(names):
+        raise ValueError("variant names must be unique")
+    return variants
+
+
+def variant_path(image_path: str, spec: VariantSpec) -> str:
+    """cat.jpg -> cat.thumb.jpg"""
+    path = Path(image_path)
+    return str(path.with_name(f"{path.stem}.{spec.name}.{spec.extension}"))
+
+
+def manifest_path(image_path: str) -> str:
+    """cat.jpg -> cat.variants.json"""
+    path = Path(image_path)
+    return str(path.with_name(f"{path.stem}.variants.json"))
+
+
+def is_current(image_path: str) -> bool:
+    """Whether the image's manifest exists and is newer than the image"""
+    try:
+        return os.path.getmtime(manifest_path(image_path)) >= os.path.getmtime(image_path)
+    except OSError:
+        return False
+
+
+def build_variants(image_path: str, specs: List[VariantSpec]) -> str:
+    """
+    Decode `image_path` once, write every variant next to it and a manifest
+    listing their paths and dimensions. Returns the manifest path.
+    """
+    variants: List[Dict] = []
+    with Image.open(image_path) as image:
+        source_format = image.format
+        image.load()
+        width, height = image.size
+
+        for spec in specs:
+            output = variant_path(image_path, spec)
+            fmt = VARIANT_FORMATS[spec.extension]
+
+            if spec.size is None and fmt == source_format:
+                # Same format at full size: keep the original bytes, no re-encode
+                shutil.copyfile(image_path, output)
+                variant_size = (width, height)
+            else:
+                variant = image.copy()
+                if spec.size is not None:
+                    # Fits the box, keeps the aspect ratio, never upscales
+                    variant.thumbnail(spec.size, Image.LANCZOS)
+                if fmt == 'JPEG' and variant.mode not in ('RGB', 'L'):
+                    variant = variant.convert('RGB')
+                variant.save(output, format=fmt, quality=spec.quality)
+                variant_size = variant.size
+
+            variants.append({
+                'name': spec.name,
+                'path': output,
+                'format': spec.extension,
+                'width': variant_size[0],
+                'height': variant_size[1],
+                'bytes': os.path.getsize(output)
+            })
+
+    manifest = {
+        'source': image_path,
+        'width': width,
+        'height': height,
+        'variants': variants
+    }
+    path = manifest_path(image_path)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return path
@@ -0,0 +1,917 @@
+#!/usr/bin/env python3
+"""
+Obsidian Vault Index
+Local index of a vault's Markdown for read-only queries without the Obsidian
+app: wikilinks, backlinks, tags, frontmatter properties, tasks and an
+inverted full-text index. Every query refreshes it incrementally by file
+mtime/size; it is kept in one SQLite file outside the vault.
+
+Usage:
+    python3 vault_index.py --vault ~/Notes index
+    python3 vault_index.py --vault ~/Notes search "AI Agent" --limit 20 --context
+    python3 vault_index.py --vault ~/Notes backlinks "My Note" --counts
+    python3 vault_index.py --vault ~/Notes tasks --todo
+    python3 vault_index.py --vault ~/Notes tag "#project" --verbose
+
+Commands mirror `obsidian search/backlinks/links/unresolved/orphans/deadends/
+tags/tag/tasks/properties/property:read`. Writes still go through the CLI.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import re
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import unquote
+
+# PyYAML parses frontmatter if installed; a small built-in parser covers the common cases
+try:
+    import yaml
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
+SCHEMA_VERSION = '1'
+PARALLEL_THRESHOLD = 256  # parse changed notes in worker processes above this many
+COMPACT_RATIO = 0.25      # rewrite postings once this share of indexed note ids is stale
+SQL_CHUNK = 900           # bound parameters per IN (...) query
+
+FENCE_RE = re.compile(r'^\s*(```|~~~)')
+INLINE_CODE_RE = re.compile(r'`[^`\n]*`')
+WIKILINK_RE = re.compile(r'(!?)\[\[([^\[\]|\n]+?)(?:\|[^\[\]\n]*)?\]\]')
+MDLINK_RE = re.compile(r'(!?)\[[^\]\n]*\]\(<?([^)<>\s]+)>?(?:\s+"[^"\n]*")?\)')
+TAG_RE = re.compile(r'(?<![\w/#&])#([^\s#\[\]{}()<>,.;:!?"\'`，。；：！？、（）【】「」]+)')
+TASK_RE = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s+\[(.)\]\s?(.*)$')
+TOKEN_RE = re.compile(
+    r'([0-9a-z_\u00c0-\u024f\u0370-\u03ff\u0400-\u04ff]+)|'
+    r'([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+)'
+)
+QUERY_RE = re.compile(r'"([^"]+)"|(\S+)')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attachments (path TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS links (
+    note INTEGER NOT NULL, target TEXT NOT NULL, name TEXT NOT NULL, line INTEGER NOT NULL, embed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS links_note ON links (note);
+CREATE INDEX IF NOT EXISTS links_name ON links (name);
+CREATE TABLE IF NOT EXISTS tags (note INTEGER NOT NULL, tag TEXT NOT NULL, key TEXT NOT NULL, line INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS tags_note ON tags (note);
+CREATE INDEX IF NOT EXISTS tags_key ON tags (key);
+CREATE TABLE IF NOT EXISTS props (note INTEGER NOT NULL, name TEXT NOT NULL, value TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS props_note ON props (note);
+CREATE INDEX IF NOT EXISTS props_name ON props (name);
+CREATE TABLE IF NOT EXISTS tasks (note INTEGER NOT NULL, line INTEGER NOT NULL, status TEXT NOT NULL, text TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS tasks_note ON tasks (note);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT PRIMARY KEY, last INTEGER NOT NULL, count INTEGER NOT NULL, postings BLOB NOT NULL
+) WITHOUT ROWID;
+'''
+
+NOTE_TABLES = ('links', 'tags', 'props', 'tasks')
+
+
+class NoteData(NamedTuple):
+    """Everything indexed from one note. Lines are 1-based."""
+    links: List[Tuple[str, str, int, bool]]   # target, target file name, line, embed
+    tags: List[Tuple[str, int]]               # tag without '#', line (0 for frontmatter)
+    props: Dict[str, object]
+    tasks: List[Tuple[int, str, str]]         # line, status character, text
+    terms: Set[str]
+
+
+class RefreshStats(NamedTuple):
+    notes: int
+    added: int
+    changed: int
+    removed: int
+    seconds: float
+
+
+def get_default_index_path(vault: Path) -> Path:
+    """Get the index file (~/.cache/obsidian-cli/<vault hash>.sqlite)"""
+    # Use XDG cache directory if set, otherwise ~/.cache/obsidian-cli/
+    xdg_cache = os.environ.get('XDG_CACHE_HOME')
+    base = Path(xdg_cache) if xdg_cache else Path.home() / '.cache'
+    digest = hashlib.sha256(str(vault.resolve()).encode('utf-8')).hexdigest()[:16]
+    return base / 'obsidian-cli' / f'{digest}.sqlite'
+
+
+def encode_ids(ids: Iterable[int], last: int = 0) -> bytes:
+    """Ascending note ids as varint deltas from `last`."""
+    out = bytearray()
+    for note_id in ids:
+        delta = note_id - last
+        last = note_id
+        while delta >= 0x80:
+            out.append(delta & 0x7F | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def decode_ids(data: bytes) -> List[int]:
+    ids = []
+    value = shift = last = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        last += value
+        ids.append(last)
+        value = shift = 0
+    return ids
+
+
+def text_terms(text: str) -> Set[str]:
+    """Index terms: lowercase words, and character bigrams of CJK runs."""
+    found = set()
+    for word, cjk in TOKEN_RE.findall(text.lower()):
+        if word:
+            found.add(word)
+        elif len(cjk) == 1:
+            found.add(cjk)
+        else:
+            found.update(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return found
+
+
+def _scalar(value: str):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+        return value[1:-1]
+    if value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    if value in ('', '~', 'null'):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _simple_yaml(block: str) -> Dict[str, object]:
+    """`key: value`, `key: [a, b]` and `key:` followed by `- item` lines."""
+    data: Dict[str, object] = {}
+    key = None
+    for line in block.split('\n'):
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        stripped = line.strip()
+        if stripped.startswith('- ') and key is not None:
+            if not isinstance(data.get(key), list):
+                data[key] = []
+            data[key].append(_scalar(stripped[2:]))
+            continue
+        name, sep, value = line.partition(':')
+        if not sep or line[:1].isspace():
+            continue
+        key = name.strip()
+        value = value.strip()
+        if value.startswith('[') and value.endswith(']'):
+            data[key] = [_scalar(v) for v in value[1:-1].split(',') if v.strip()]
+        else:
+            data[key] = _scalar(value)
+    return data
+
+
+def parse_frontmatter(block: str) -> Dict[str, object]:
+    if HAS_YAML:
+        try:
+            data = yaml.load(block, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        except yaml.YAMLError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return _simple_yaml(block)
+
+
+def _link_target(raw: str, note_dir: str, markdown: bool) -> Optional[str]:
+    """Normalize a link to a vault path or note name, without heading/block and .md."""
+    target = raw.split('#', 1)[0].strip()
+    if markdown:
+        if '://' in target or target.startswith('mailto:'):
+            return None
+        target = unquote(target)
+        if target.startswith(('./', '../')):
+            target = posixpath.normpath(posixpath.join(note_dir, target))
+        target = target.lstrip('/')
+    if not target:
+        return None  # [[#Heading]] links into the same note
+    return target[:-3] if target.lower().endswith('.md') else target
+
+
+def parse_note(text: str, path: str) -> NoteData:
+    """Extract links, tags, properties, tasks and search terms from a note's text."""
+    lines = text.split('\n')
+    note_dir = posixpath.dirname(path)
+    props: Dict[str, object] = {}
+    tags: List[Tuple[str, int]] = []
+    links: List[Tuple[str, str, int, bool]] = []
+    tasks: List[Tuple[int, str, str]] = []
+
+    start = 0
+    if lines and lines[0].strip() == '---':
+        for i in range(1, len(lines)):
+            if lines[i].strip() in ('---', '...'):
+                props = parse_frontmatter('\n'.join(lines[1:i]))
+                start = i + 1
+                break
+
+    for name in ('tags', 'tag'):
+        value = props.get(name)
+        values = value if isinstance(value, list) else str(value).replace(',', ' ').split() if value else []
+        tags.extend((str(tag).lstrip('#'), 0) for tag in values if tag)
+
+    def add_link(raw: str, number: int, embed: bool, markdown: bool) -> None:
+        target = _link_target(raw, note_dir, markdown)
+        if target:
+            links.append((target, target.rsplit('/', 1)[-1].lower(), number, embed))
+
+    fence = None
+    for number in range(start + 1, len(lines) + 1):
+        line = lines[number - 1]
+        match = FENCE_RE.match(line)
+        if fence:
+            if match and match.group(1) == fence:
+                fence = None
+            continue
+        if match:
+            fence = match.group(1)
+            continue
+
+        prose = INLINE_CODE_RE.sub(' ', line)
+        for embed, raw in WIKILINK_RE.findall(prose):
+            add_link(raw, number, bool(embed), False)
+        for embed, raw in MDLINK_RE.findall(prose):
+            add_link(raw, number, bool(embed), True)
+        for tag in TAG_RE.findall(prose):
+            if not tag.replace('/', '').isdigit():
+                tags.append((tag.rstrip('/'), number))
+        task = TASK_RE.match(prose)
+        if task:
+            tasks.append((number, task.group(1), task.group(2).strip()))
+
+    return NoteData(links, tags, props, tasks, text_terms(path + '\n' + text))
+
+
+def _parse_file(args: Tuple[str, str]) -> Optional[NoteData]:
+    vault, path = args
+    try:
+        with open(os.path.join(vault, path), encoding='utf-8', errors='replace') as f:
+            return parse_note(f.read(), path)
+    except OSError:
+        return None
+
+
+def walk_vault(vault: str) -> Iterator[Tuple[str, os.stat_result]]:
+    """(vault-relative POSIX path, stat) of every file, skipping .obsidian, .trash and other dot folders."""
+    for root, dirs, files in os.walk(vault):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        rel_root = os.path.relpath(root, vault)
+        for name in files:
+            if name.startswith('.'):
+                continue
+            full = os.path.join(root, name)
+            try:
+                stat = os.stat(full)
+            except OSError:
+                continue
+            rel = name if rel_root == '.' else f'{rel_root}/{name}'
+            yield rel.replace(os.sep, '/'), stat
+
+
+class Resolver:
+    """Obsidian-style link resolution: exact path, then the shortest path with that file name."""
+
+    def __init__(self, notes: Iterable[str], attachments: Iterable[str]):
+        self.by_path: Dict[str, str] = {}
+        self.by_name: Dict[str, List[str]] = defaultdict(list)
+        for path in notes:
+            key = path[:-3].lower() if path.lower().endswith('.md') else path.lower()
+            self.by_path[key] = path
+            self.by_name[key.rsplit('/', 1)[-1]].append(path)
+        for path in attachments:
+            self.by_path[path.lower()] = path
+            self.by_name[path.lower().rsplit('/', 1)[-1]].append(path)
+        for paths in self.by_name.values():
+            paths.sort(key=lambda p: (p.count('/'), len(p), p))
+        self._cache: Dict[str, Optional[str]] = {}
+
+    def resolve(self, target: str) -> Optional[str]:
+        """Path of the file a link target points to, or None. Case-insensitive."""
+        if target in self._cache:
+            return self._cache[target]
+        key = target.lower()
+        found = self.by_path.get(key)
+        if found is None and '/' in key:
+            suffix = '/' + key
+            found = next((p for p in self.by_name.get(key.rsplit('/', 1)[-1], ())
+                          if (p[:-3] if p.lower().endswith('.md') else p).lower().endswith(suffix)), None)
+        elif found is None:
+            candidates = self.by_name.get(key)
+            found = candidates[0] if candidates else None
+        self._cache[target] = found
+        return found
+
+
+class VaultIndex:
+    """The index of one vault. Call refresh() before querying to pick up edits."""
+
+    def __init__(self, vault: Path, index_path: Optional[Path] = None):
+        self.vault = Path(vault)
+        self.index_path = Path(index_path) if index_path else get_default_index_path(self.vault)
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.index_path), timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        version = None
+        try:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+            version = row[0] if row else None
+        except sqlite3.OperationalError:
+            pass
+        if version not in (None, SCHEMA_VERSION):
+            self.conn.close()
+            self.index_path.unlink()
+            self.conn = sqlite3.connect(str(self.index_path), timeout=30)
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('schema', ?)", (SCHEMA_VERSION,))
+        self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('stale', '0')")
+        self.conn.commit()
+        self._resolver: Optional[Resolver] = None
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -- Updating --
+
+    def refresh(self, jobs: Optional[int] = None) -> RefreshStats:
+        """Re-index notes whose mtime or size changed and drop deleted ones."""
+        start = time.perf_counter()
+        known = {path: (note_id, mtime, size) for note_id, path, mtime, size
+                 in self.conn.execute('SELECT id, path, mtime, size FROM notes')}
+        notes: Dict[str, Tuple[int, int]] = {}
+        attachments = set()
+        for path, stat in walk_vault(str(self.vault)):
+            if path.lower().endswith('.md'):
+                notes[path] = (stat.st_mtime_ns, stat.st_size)
+            else:
+                attachments.add(path)
+
+        changed = sorted(p for p, state in notes.items() if p not in known or known[p][1:] != state)
+
+        if len(changed) >= PARALLEL_THRESHOLD and (jobs is None or jobs > 1):
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                parsed = list(pool.map(_parse_file, ((str(self.vault), p) for p in changed), chunksize=64))
+        else:
+            parsed = [_parse_file((str(self.vault), p)) for p in changed]
+
+        with self.conn:
+            # Another process may have refreshed since `known` was read: diff again under the write lock
+            self.conn.execute('BEGIN IMMEDIATE')
+            known = {path: (note_id, mtime, size) for note_id, path, mtime, size
+                     in self.conn.execute('SELECT id, path, mtime, size FROM notes')}
+            updates = [(path, data) for path, data in zip(changed, parsed)
+                       if path not in known or known[path][1:] != notes[path]]
+            removed = [p for p in known if p not in notes]
+            stale_ids = [known[p][0] for p, _ in updates if p in known] + [known[p][0] for p in removed]
+
+            self._delete_notes(stale_ids)
+            postings: Dict[str, List[int]] = defaultdict(list)
+            for path, data in updates:
+                if data is None:
+                    continue
+                mtime, size = notes[path]
+                note_id = self.conn.execute(
+                    'INSERT INTO notes (path, mtime, size) VALUES (?, ?, ?)', (path, mtime, size)
+                ).lastrowid
+                self._insert_note(note_id, data)
+                for term in data.terms:
+                    postings[term].append(note_id)
+            self._append_postings(postings)
+
+            stored = {row[0] for row in self.conn.execute('SELECT path FROM attachments')}
+            self.conn.executemany('DELETE FROM attachments WHERE path = ?', ((p,) for p in stored - attachments))
+            self.conn.executemany('INSERT INTO attachments VALUES (?)', ((p,) for p in attachments - stored))
+
+            stale = int(self._meta('stale')) + len(stale_ids)
+            self._set_meta('stale', str(stale))
+            if stale and stale > COMPACT_RATIO * max(len(notes), 1):
+                self._compact()
+
+        if updates or removed or stored != attachments:
+            self._resolver = None
+        added = sum(1 for p, _ in updates if p not in known)
+        return RefreshStats(len(notes), added, len(updates) - added, len(removed), time.perf_counter() - start)
+
+    def _meta(self, key: str) -> str:
+        return self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()[0]
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self.conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, value))
+
+    def _delete_notes(self, ids: List[int]) -> None:
+        # Postings keep the old ids until compaction; queries only see ids still in `notes`
+        for i in range(0, len(ids), SQL_CHUNK):
+            chunk = ids[i:i + SQL_CHUNK]
+            marks = ','.join('?' * len(chunk))
+            self.conn.execute(f'DELETE FROM notes WHERE id IN ({marks})', chunk)
+            for table in NOTE_TABLES:
+                self.conn.execute(f'DELETE FROM {table} WHERE note IN ({marks})', chunk)
+
+    def _insert_note(self, note_id: int, data: NoteData) -> None:
+        self.conn.executemany(
+            'INSERT INTO links VALUES (?, ?, ?, ?, ?)',
+            ((note_id, target, name, line, int(embed)) for target, name, line, embed in data.links)
+        )
+        self.conn.executemany(
+            'INSERT INTO tags VALUES (?, ?, ?, ?)',
+            ((note_id, tag, tag.lower(), line) for tag, line in data.tags)
+        )
+        self.conn.executemany(
+            'INSERT INTO props VALUES (?, ?, ?)',
+            ((note_id, str(name), json.dumps(value, ensure_ascii=False, default=str))
+             for name, value in data.props.items())
+        )
+        self.conn.executemany(
+            'INSERT INTO tasks VALUES (?, ?, ?, ?)',
+            ((note_id, line, status, text) for line, status, text in data.tasks)
+        )
+
+    def _append_postings(self, postings: Dict[str, List[int]]) -> None:
+        """New note ids are always larger than indexed ones, so they append to each delta list."""
+        terms = list(postings)
+        last = {}
+        for i in range(0, len(terms), SQL_CHUNK):
+            chunk = terms[i:i + SQL_CHUNK]
+            last.update(self.conn.execute(
+                f"SELECT term, last FROM terms WHERE term IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        self.conn.executemany(
+            'INSERT INTO terms VALUES (?, ?, ?, ?) ON CONFLICT (term) DO UPDATE SET '
+            'last = excluded.last, count = count + excluded.count, postings = CAST(postings || excluded.postings AS BLOB)',
+            ((term, ids[-1], len(ids), encode_ids(ids, last.get(term, 0))) for term, ids in postings.items())
+        )
+
+    def _compact(self) -> None:
+        """Rewrite every posting list without the ids of changed or deleted notes."""
+        live = {row[0] for row in self.conn.execute('SELECT id FROM notes')}
+        updates = []
+        empty = []
+        for term, data in self.conn.execute('SELECT term, postings FROM terms'):
+            ids = [i for i in decode_ids(data) if i in live]
+            if ids:
+                updates.append((ids[-1], len(ids), encode_ids(ids), term))
+            else:
+                empty.append((term,))
+        self.conn.executemany('UPDATE terms SET last = ?, count = ?, postings = ? WHERE term = ?', updates)
+        self.conn.executemany('DELETE FROM terms WHERE term = ?', empty)
+        self._set_meta('stale', '0')
+
+    # -- Queries --
+
+    @property
+    def resolver(self) -> Resolver:
+        if self._resolver is None:
+            self._resolver = Resolver(
+                (row[0] for row in self.conn.execute('SELECT path FROM notes')),
+                (row[0] for row in self.conn.execute('SELECT path FROM attachments'))
+            )
+        return self._resolver
+
+    def find_note(self, ref: str) -> Optional[Tuple[int, str]]:
+        """(id, path) of a note given its path (`path=`) or name (`file=`)."""
+        for path in (ref, ref + '.md'):
+            row = self.conn.execute('SELECT id, path FROM notes WHERE path = ?', (path,)).fetchone()
+            if row:
+                return row
+        path = self.resolver.resolve(_link_target(ref, '', False) or '')
+        if path is None:
+            return None
+        return self.conn.execute('SELECT id, path FROM notes WHERE path = ?', (path,)).fetchone()
+
+    def _postings(self, term: str) -> Set[int]:
+        row = self.conn.execute('SELECT postings FROM terms WHERE term = ?', (term,)).fetchone()
+        return set(decode_ids(row[0])) if row else set()
+
+    def _substring_postings(self, part: str) -> Set[int]:
+        ids: Set[int] = set()
+        for (data,) in self.conn.execute('SELECT postings FROM terms WHERE instr(term, ?) > 0', (part,)):
+            ids.update(decode_ids(data))
+        return ids
+
+    def _ids_for(self, word: str) -> Optional[Set[int]]:
+        """Note ids that may contain `word`, or None if the index can't narrow it down."""
+        result = None
+        for token, cjk in TOKEN_RE.findall(word.lower()):
+            if token:
+                # Any word containing the token, since Obsidian search matches substrings
+                found = [self._substring_postings(token)]
+            elif len(cjk) == 1:
+                continue  # single characters are only indexed when they stand alone
+            else:
+                found = (self._postings(cjk[i:i + 2]) for i in range(len(cjk) - 1))
+            for ids in found:
+                result = ids if result is None else result & ids
+                if not result:
+                    return result
+        return result
+
+    def _paths(self, ids: Optional[Set[int]], folder: Optional[str]) -> List[str]:
+        if ids is None:
+            paths = [row[0] for row in self.conn.execute('SELECT path FROM notes')]
+        else:
+            ordered = sorted(ids)
+            paths = []
+            for i in range(0, len(ordered), SQL_CHUNK):
+                chunk = ordered[i:i + SQL_CHUNK]
+                paths.extend(row[0] for row in self.conn.execute(
+                    f"SELECT path FROM notes WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+        if folder:
+            prefix = folder.strip('/') + '/'
+            paths = [p for p in paths if p.startswith(prefix)]
+        return sorted(paths)
+
+    def search(
+        self,
+        query: str,
+        folder: Optional[str] = None,
+        limit: Optional[int] = None,
+        case: bool = False
+    ) -> List[Tuple[str, List[Tuple[int, str]]]]:
+        """
+        Notes containing every word of `query` ("quoted phrases" stay
+        together), with their matching lines. The index narrows the candidates;
+        each candidate is then checked against the file itself.
+        """
+        words = [phrase or word for phrase, word in QUERY_RE.findall(query)]
+        if not words:
+            return []
+        candidates = None
+        for word in words:
+            ids = self._ids_for(word)
+            if ids is not None:
+                candidates = ids if candidates is None else candidates & ids
+            if candidates is not None and not candidates:
+                return []
+
+        needles = words if case else [w.lower() for w in words]
+        results = []
+        for path in self._paths(candidates, folder):
+            try:
+                with open(self.vault / path, encoding='utf-8', errors='replace') as f:
+                    text = f.read()
+            except OSError:
+                continue
+            haystack = path + '\n' + text
+            if not case:
+                haystack = haystack.lower()
+            if not all(n in haystack for n in needles):
+                continue
+            lines = []
+            for number, line in enumerate(text.split('\n'), 1):
+                check = line if case else line.lower()
+                if any(n in check for n in needles):
+                    lines.append((number, line.strip()))
+            results.append((path, lines))
+            if limit and len(results) >= limit:
+                break
+        return results
+
+    def links(self, note_id: int) -> List[Tuple[str, Optional[str], int]]:
+        """(target, resolved path or None, line) of a note's outgoing links."""
+        return [
+            (target, self.resolver.resolve(target), line)
+            for target, line in self.conn.execute('SELECT target, line FROM links WHERE note = ? ORDER BY line', (note_id,))
+        ]
+
+    def backlinks(self, path: str) -> List[Tuple[str, int]]:
+        """(source path, line) of links resolving to `path`."""
+        name = path.lower()
+        name = (name[:-3] if name.endswith('.md') else name).rsplit('/', 1)[-1]
+        rows = self.conn.execute(
+            'SELECT notes.path, links.target, links.line FROM links JOIN notes ON notes.id = links.note '
+            'WHERE links.name = ? ORDER BY notes.path, links.line', (name,)
+        )
+        return [(source, line) for source, target, line in rows if self.resolver.resolve(target) == path]
+
+    def _resolved_targets(self) -> Dict[str, Optional[str]]:
+        return {target: self.resolver.resolve(target)
+                for (target,) in self.conn.execute('SELECT DISTINCT target FROM links')}
+
+    def unresolved(self) -> List[Tuple[str, str, int]]:
+        """(target, source path, line) of links that resolve to no file."""
+        resolved = self._resolved_targets()
+        missing = [t for t, p in resolved.items() if p is None]
+        result = []
+        for i in range(0, len(missing), SQL_CHUNK):
+            chunk = missing[i:i + SQL_CHUNK]
+            result.extend(self.conn.execute(
+                'SELECT links.target, notes.path, links.line FROM links JOIN notes ON notes.id = links.note '
+                f"WHERE links.target IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return sorted(result)
+
+    def orphans(self) -> List[str]:
+        """Notes no other note links to."""
+        linked = {p for p in self._resolved_targets().values() if p}
+        return [p for (p,) in self.conn.execute('SELECT path FROM notes ORDER BY path') if p not in linked]
+
+    def deadends(self) -> List[str]:
+        """Notes without outgoing links."""
+        return [p for (p,) in self.conn.execute(
+            'SELECT path FROM notes WHERE id NOT IN (SELECT DISTINCT note FROM links) ORDER BY path'
+        )]
+
+    def tags(self, note_id: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        (tag, number of notes). Tags are case-insensitive; each is shown in its
+        first spelling in sort order (#Project before #project).
+        """
+        where = 'WHERE note = ?' if note_id is not None else ''
+        return list(self.conn.execute(
+            f'SELECT MIN(tag), COUNT(DISTINCT note) FROM tags {where} GROUP BY key ORDER BY key',
+            (note_id,) if note_id is not None else ()
+        ))
+
+    def tag(self, name: str) -> List[Tuple[str, int]]:
+        """(path, line) of every use of a tag or its nested tags (#a includes #a/b)."""
+        key = name.lstrip('#').lower()
+        return list(self.conn.execute(
+            'SELECT notes.path, tags.line FROM tags JOIN notes ON notes.id = tags.note '
+            "WHERE tags.key = ? OR tags.key LIKE ? ESCAPE '\\' ORDER BY notes.path, tags.line",
+            (key, key.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '/%')
+        ))
+
+    def tasks(self, status: Optional[str] = None, done: Optional[bool] = None, note_id: Optional[int] = None) -> List[Tuple[str, int, str, str]]:
+        """(path, line, status, text) of tasks, optionally only todo/done or one status character."""
+        clauses, params = [], []
+        if note_id is not None:
+            clauses.append('tasks.note = ?')
+            params.append(note_id)
+        if status is not None:
+            clauses.append('tasks.status = ?')
+            params.append(status)
+        elif done is True:
+            clauses.append("tasks.status IN ('x', 'X')")
+        elif done is False:
+            clauses.append("tasks.status = ' '")
+        where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        return list(self.conn.execute(
+            'SELECT notes.path, tasks.line, tasks.status, tasks.text FROM tasks JOIN notes ON notes.id = tasks.note '
+            f'{where} ORDER BY notes.path, tasks.line', params
+        ))
+
+    def properties(self, note_id: Optional[int] = None) -> List[Tuple[str, int]]:
+        where = 'WHERE note = ?' if note_id is not None else ''
+        return list(self.conn.execute(
+            f'SELECT name, COUNT(*) FROM props {where} GROUP BY name ORDER BY name',
+            (note_id,) if note_id is not None else ()
+        ))
+
+    def property(self, name: str, note_id: Optional[int] = None) -> List[Tuple[str, object]]:
+        """(path, value) of a frontmatter property."""
+        sql = 'SELECT notes.path, props.value FROM props JOIN notes ON notes.id = props.note WHERE props.name = ?'
+        params: List[object] = [name]
+        if note_id is not None:
+            sql += ' AND props.note = ?'
+            params.append(note_id)
+        return [(path, json.loads(value)) for path, value in self.conn.execute(sql + ' ORDER BY notes.path', params)]
+
+    def stats(self) -> Dict[str, int]:
+        counts = {table: self.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                  for table in ('notes', 'attachments', 'links', 'tags', 'tasks', 'terms')}
+        counts['bytes'] = sum(
+            os.path.getsize(p) for p in (self.index_path, Path(str(self.index_path) + '-wal')) if os.path.exists(p)
+        )
+        return counts
+
+
+def _output(args, rows, text_lines) -> None:
+    if args.json:
+        json.dump(rows, sys.stdout, ensure_ascii=False, indent=2, default=str)
+        print()
+    else:
+        for line in text_lines:
+            print(line)
+
+
+def _require_note(index: VaultIndex, ref: str) -> Tuple[int, str]:
+    found = index.find_note(ref)
+    if found is None:
+        print(f'Error: Note not found: {ref}', file=sys.stderr)
+        sys.exit(1)
+    return found
+
+
+def run_command(args, index: VaultIndex) -> None:
+    command = args.command
+
+    if command == 'index':
+        stats = index.stats()
+        _output(args, stats, [f'{k}: {v}' for k, v in stats.items()] + [f'index: {index.index_path}'])
+
+    elif command == 'search':
+        results = index.search(args.query, args.path, None if args.total else args.limit, args.case)
+        if args.total:
+            _output(args, len(results), [str(len(results))])
+        elif args.context:
+            _output(args, [{'path': p, 'matches': [{'line': n, 'text': t} for n, t in lines]} for p, lines in results],
+                    [f'{p}:{n}: {t}' for p, lines in results for n, t in lines])
+        else:
+            _output(args, [p for p, _ in results], [p for p, _ in results])
+
+    elif command == 'backlinks':
+        _, path = _require_note(index, args.file)
+        rows = index.backlinks(path)
+        if args.counts:
+            counts = defaultdict(int)
+            for source, _ in rows:
+                counts[source] += 1
+            _output(args, counts, [f'{p}\t{n}' for p, n in counts.items()])
+        else:
+            sources = sorted({source for source, _ in rows})
+            _output(args, sources, sources)
+
+    elif command == 'links':
+        note_id, _ = _require_note(index, args.file)
+        rows = index.links(note_id)
+        _output(args, [{'target': t, 'path': p, 'line': n} for t, p, n in rows],
+                [p if p else f'{t} (unresolved)' for t, p, _ in rows])
+
+    elif command == 'unresolved':
+        rows = index.unresolved()
+        if args.verbose:
+            _output(args, [{'target': t, 'source': s, 'line': n} for t, s, n in rows],
+                    [f'{t}\t{s}:{n}' for t, s, n in rows])
+        else:
+            counts = defaultdict(int)
+            for target, _, _ in rows:
+                counts[target] += 1
+            _output(args, counts, [f'{t}\t{n}' if args.counts else t for t, n in counts.items()])
+
+    elif command in ('orphans', 'deadends'):
+        paths = index.orphans() if command == 'orphans' else index.deadends()
+        _output(args, paths, paths)
+
+    elif command == 'tags':
+        note_id = _require_note(index, args.file)[0] if args.file else None
+        rows = index.tags(note_id)
+        if args.sort == 'count':
+            rows.sort(key=lambda r: (-r[1], r[0].lower()))
+        _output(args, dict(rows), [f'#{t}\t{n}' if args.counts else f'#{t}' for t, n in rows])
+
+    elif command == 'tag':
+        rows = index.tag(args.name)
+        notes = sorted({p for p, _ in rows})
+        if args.verbose:
+            _output(args, [{'path': p, 'line': n} for p, n in rows],
+                    [f'{args.name}\t{len(notes)} notes'] + [f'{p}:{n}' if n else f'{p} (frontmatter)' for p, n in rows])
+        else:
+            _output(args, notes, [f'{args.name}\t{len(notes)} notes'] + notes)
+
+    elif command == 'tasks':
+        note_id = _require_note(index, args.file)[0] if args.file else None
+        done = True if args.done else False if args.todo else None
+        rows = index.tasks(args.status, done, note_id)
+        if args.total:
+            _output(args, len(rows), [str(len(rows))])
+        else:
+            _output(args, [{'path': p, 'line': n, 'status': s, 'text': t} for p, n, s, t in rows],
+                    [f'{p}:{n}\t- [{s}] {t}' for p, n, s, t in rows])
+
+    elif command == 'properties':
+        note_id = _require_note(index, args.file)[0] if args.file else None
+        rows = index.properties(note_id)
+        _output(args, dict(rows), [f'{k}\t{n}' if args.counts else k for k, n in rows])
+
+    elif command == 'property':
+        note_id = _require_note(index, args.file)[0] if args.file else None
+        rows = index.property(args.name, note_id)
+        _output(args, [{'path': p, 'value': v} for p, v in rows],
+                [f'{p}\t{v if isinstance(v, str) else json.dumps(v, ensure_ascii=False, default=str)}' for p, v in rows])
+
+
+def main():
+    def add_common(p: argparse.ArgumentParser, defaults: bool) -> None:
+        # Accepted before or after the command; only the top-level parser sets defaults
+        def default(value):
+            return value if defaults else argparse.SUPPRESS
+        p.add_argument('--vault', default=default(os.environ.get('OBSIDIAN_VAULT', '.')),
+                       help='Vault folder (default: $OBSIDIAN_VAULT or the current directory)')
+        p.add_argument('--index', default=default(None), help='Index file (default: ~/.cache/obsidian-cli/<vault hash>.sqlite)')
+        p.add_argument('--no-refresh', action='store_true', default=default(False),
+                       help='Query the index as is, without checking for changed notes')
+        p.add_argument('--jobs', type=int, default=default(None), help='Worker processes for large re-indexes (default: CPU count)')
+        p.add_argument('--json', action='store_true', default=default(False), help='Print results as JSON')
+
+    common = argparse.ArgumentParser(add_help=False)
+    add_common(common, defaults=False)
+
+    parser = argparse.ArgumentParser(description='Query an Obsidian vault from a local index, without the Obsidian app')
+    add_common(parser, defaults=True)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('index', parents=[common], help='Build or refresh the index and show its size')
+    p.add_argument('--rebuild', action='store_true', help='Discard the index and re-read every note')
+
+    p = sub.add_parser('search', parents=[common], help='Notes containing every word of a query')
+    p.add_argument('query', help='Words and "quoted phrases", all of which must appear')
+    p.add_argument('--path', help='Only notes in this folder')
+    p.add_argument('--limit', type=int, help='Maximum number of notes')
+    p.add_argument('--case', action='store_true', help='Case sensitive')
+    p.add_argument('--context', action='store_true', help='Show matching lines')
+    p.add_argument('--total', action='store_true', help='Print the number of matching notes')
+
+    p = sub.add_parser('backlinks', parents=[common], help='Notes linking to a note')
+    p.add_argument('file', help='Note name or vault path')
+    p.add_argument('--counts', action='store_true', help='Number of links from each note')
+
+    p = sub.add_parser('links', parents=[common], help='Outgoing links of a note')
+    p.add_argument('file', help='Note name or vault path')
+
+    p = sub.add_parser('unresolved', parents=[common], help='Links to notes that do not exist')
+    p.add_argument('--counts', action='store_true', help='Number of links to each missing note')
+    p.add_argument('--verbose', action='store_true', help='List every link with its source')
+
+    sub.add_parser('orphans', parents=[common], help='Notes nothing links to')
+    sub.add_parser('deadends', parents=[common], help='Notes without outgoing links')
+
+    p = sub.add_parser('tags', parents=[common], help='All tags, or the tags of one note')
+    p.add_argument('--file', help='Only this note')
+    p.add_argument('--counts', action='store_true', help='Number of notes per tag')
+    p.add_argument('--sort', choices=('name', 'count'), default='name', help='Sort order (default: name)')
+
+    p = sub.add_parser('tag', parents=[common], help='Notes using a tag, nested tags included')
+    p.add_argument('name', help='Tag, with or without #')
+    p.add_argument('--verbose', action='store_true', help='Show every occurrence with its line')
+
+    p = sub.add_parser('tasks', parents=[common], help='Tasks in the vault or one note')
+    p.add_argument('--file', help='Only this note')
+    group = p.add_mutually_exclusive_group()
+    group.add_argument('--todo', action='store_true', help='Incomplete tasks only')
+    group.add_argument('--done', action='store_true', help='Completed tasks only')
+    group.add_argument('--status', help='Tasks with this status character, e.g. "-"')
+    p.add_argument('--total', action='store_true', help='Print the number of tasks')
+
+    p = sub.add_parser('properties', parents=[common], help='Frontmatter property names')
+    p.add_argument('--file', help='Only this note')
+    p.add_argument('--counts', action='store_true', help='Number of notes per property')
+
+    p = sub.add_parser('property', parents=[common], help='Values of one frontmatter property')
+    p.add_argument('name', help='Property name')
+    p.add_argument('--file', help='Only this note')
+
+    args = parser.parse_args()
+
+    vault = Path(args.vault).expanduser()
+    if not vault.is_dir():
+        print(f'Error: Vault folder not found: {vault}', file=sys.stderr)
+        sys.exit(1)
+
+    index_path = Path(args.index).expanduser() if args.index else None
+    if args.command == 'index' and args.rebuild:
+        target = index_path or get_default_index_path(vault)
+        for suffix in ('', '-wal', '-shm'):
+            Path(str(target) + suffix).unlink(missing_ok=True)
+
+    with VaultIndex(vault, index_path) as index:
+        if not args.no_refresh:
+            stats = index.refresh(args.jobs)
+            if args.command == 'index' or (stats.added + stats.changed + stats.removed > PARALLEL_THRESHOLD):
+                print(
+                    f'Indexed {stats.notes} note(s): {stats.added} added, {stats.changed} changed, '
+                    f'{stats.removed} removed in {stats.seconds:.2f}s', file=sys.stderr
+                )
+        run_command(args, index)
+
+
+if __name__ == '__main__':
+    main()